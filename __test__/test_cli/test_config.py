@@ -8,6 +8,8 @@ from handshake.services.DBService.lifecycle import (
     TestConfigManager,
     db_path,
     DB_VERSION,
+    pick_profile,
+    connect_with_profile,
 )
 
 
@@ -24,7 +26,8 @@ async def test_default_config_file(root_dir):
     assert target.exists()
     loaded = loads(target.read_text())
     assert loaded[ConfigKeys.maxRunsPerProject] == "10"
-    assert len(loaded.keys()) == 1
+    assert loaded[ConfigKeys.sqliteProfile] == "auto"
+    assert len(loaded.keys()) == 2
 
 
 async def test_import_from_handshake_file(root_dir):
@@ -85,3 +88,42 @@ async def test_init_script(root_dir):
     assert (
         await ConfigBase.filter(key=ConfigKeys.reset_test_run).first()
     ).readonly == 1
+
+
+async def test_pick_sqlite_profile(root_dir, tmp_path):
+    saved_db = db_path(root_dir)
+    record = await ConfigBase.filter(key=ConfigKeys.sqliteProfile).first()
+    assert record.value == "auto" and not record.readonly
+    # resolved one is noted, refer: clean_close
+    used = await ConfigBase.filter(key=ConfigKeys.sqliteProfileUsed).first()
+    assert used.value == "safe" and used.readonly
+
+    # left to the command
+    assert pick_profile(saved_db, fallback="fast-ingest") == "fast-ingest"
+
+    config_file = tmp_path / "handshake.json"
+    config_file.write_text(dumps({ConfigKeys.sqliteProfile: "read-mostly"}))
+    assert pick_profile(saved_db, config_file, "fast-ingest") == "read-mostly"
+
+    config_file.write_text(dumps({ConfigKeys.sqliteProfile: "turbo"}))
+    assert pick_profile(saved_db, config_file, "safe") == "safe"
+
+    record.value = "safe"
+    await record.save()
+    try:
+        assert pick_profile(saved_db, fallback="fast-ingest") == "safe"
+        with connect_with_profile(saved_db) as connection:
+            # FULL
+            assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2
+            assert connection.execute("PRAGMA mmap_size").fetchone()[0] == 0
+    finally:
+        record.value = "auto"
+        await record.save()
+
+    connection = connect_with_profile(saved_db)
+    try:
+        # NORMAL
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert connection.execute("PRAGMA mmap_size").fetchone()[0] == 256 << 20
+    finally:
+        connection.close()
@@ -0,0 +1,75 @@
+from subprocess import run
+from sqlite3 import connect
+from uuid import uuid4
+from datetime import datetime
+from shutil import rmtree
+from handshake.reporters.journal import JournalWriter, read_journal
+from handshake.services.DBService.shared import db_path
+
+
+def sample_journal(path):
+    session, suite = str(uuid4()), str(uuid4())
+    started = datetime.now().isoformat()
+    journal = JournalWriter(path, "test-ingest")
+    journal.put(
+        dict(event="create/Session", payload=dict(started=started, sessionID=session))
+    )
+    journal.put(
+        dict(
+            event="create/Suite",
+            payload=dict(
+                suiteID=suite,
+                title="sample test",
+                suiteType="TEST",
+                session_id=session,
+                file="test_sample.py",
+                parent="",
+            ),
+        )
+    )
+    journal.put(
+        dict(event="save/PunchInSuite", payload=dict(suiteID=suite, started=started))
+    )
+    journal.close()
+    return session, suite
+
+
+def test_read_journal_with_incomplete_record(tmp_path):
+    journal = tmp_path / "handshake.journal"
+    sample_journal(journal)
+    assert len(list(read_journal(journal))) == 4
+
+    # runner was killed while writing the last record
+    with journal.open("ab") as to_corrupt:
+        to_corrupt.write(b"\x00\x00\x01\x00{")
+
+    records = list(read_journal(journal))
+    assert len(records) == 4
+    assert records[0]["projectName"] == "test-ingest"
+
+
+def test_ingest_journal(tmp_path, root_dir):
+    journal = tmp_path / "handshake.journal"
+    session, suite = sample_journal(journal)
+    results = root_dir / "TestIngestResults"
+    rmtree(results, ignore_errors=True)
+
+    try:
+        result = run(
+            f'handshake ingest "{journal}" "{results}" "{root_dir}"',
+            shell=True,
+        )
+        assert result.returncode == 0
+
+        with connect(db_path(results)) as connection:
+            assert connection.execute(
+                "select count(*) from runbase where projectName = 'test-ingest'"
+            ).fetchone() == (1,)
+            assert connection.execute(
+                "select count(*) from sessionbase where sessionID = ?", (session,)
+            ).fetchone() == (1,)
+            assert connection.execute(
+                "select standing from suitebase where suiteID = ?", (suite,)
+            ).fetchone() == ("PROCESSING",)
+    finally:
+        rmtree(results, ignore_errors=True)
@@ -0,0 +1,42 @@
+from handshake.reporters.dispatcher import Dispatcher
+from threading import Event
+from time import sleep
+
+
+class TestDispatcher:
+    def test_order_per_key(self):
+        dispatcher = Dispatcher(4)
+        sent = []
+
+        for index in range(20):
+            for key in ("a", "b", "c"):
+                dispatcher.submit(sent.append, (key, index), key=key)
+        dispatcher.shutdown()
+
+        for key in ("a", "b", "c"):
+            assert [_ for __, _ in sent if __ == key] == list(range(20))
+
+    def test_unrelated_keys_are_not_blocked(self):
+        dispatcher = Dispatcher(2)
+        release = Event()
+        blocked, free = "a", "d"
+        assert dispatcher.lane_of(blocked) != dispatcher.lane_of(free)
+
+        dispatcher.submit(release.wait, 5, key=blocked)
+        # would have waited for the blocked request, if we had a single lane
+        assert dispatcher.submit(lambda: True, key=free).result(timeout=1)
+
+        release.set()
+        dispatcher.shutdown()
+
+    def test_barrier(self):
+        dispatcher = Dispatcher(4)
+        sent = []
+
+        dispatcher.submit(sleep, 0.2, key="a")
+        dispatcher.submit(sent.append, "a", key="a")
+        dispatcher.submit(sent.append, "barrier")
+        dispatcher.submit(sent.append, "b", key="b")
+        dispatcher.shutdown()
+
+        assert sent == ["a", "barrier", "b"]
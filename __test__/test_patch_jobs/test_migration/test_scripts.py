@@ -9,6 +9,7 @@ from handshake.services.DBService.models import (
     SuiteBase,
     SessionBase,
     RunBase,
+    StaticBase,
 )
 from .conftest import get_version, get_config_value
 from handshake.services.DBService.models.enums import (
@@ -286,6 +287,89 @@ class TestMigrationScripts:
             == run_record.xpassedSuites
         )
 
+    async def test_bump_v14(
+        self,
+        get_vth_connection,
+        scripts,
+        db_path,
+        helper_to_create_test_and_session,
+        create_suite,
+    ):
+        connection = await get_vth_connection(db_path, 14)
+        test_id, sample_session = await helper_to_create_test_and_session(
+            manual_insert_test_run=True, connection=connection, return_id=True
+        )
+        suite = await create_suite(sample_session, manual_insert=True)
+        await connection.execute_query(
+            "insert into staticbase(attachmentID, entity_id, description, value, title, type, extraValues, tags)"
+            " values(?, ?, '', 'sample.png', 'sample', 'PNG', '{}', '[]')",
+            ("a2d3b4c6-0f83-4d59-9d8c-7d4e6c3c9a01", suite[0]),
+        )
+
+        assert migration(
+            db_path, do_once=True
+        ), "it should now be in the latest version"
+        await assert_migration(
+            14, 15, MigrationStatus.PASSED, MigrationTrigger.AUTOMATIC
+        )
+
+        attachment = await StaticBase.filter(entity_id=suite[0]).first()
+        assert attachment.size == 0
+        assert attachment.hash == ""
+
+    async def test_bump_v15(self, get_vth_connection, scripts, db_path):
+        await get_vth_connection(db_path, 15)
+        assert not await ConfigBase.filter(key=ConfigKeys.sqliteProfile).exists()
+
+        assert migration(
+            db_path, do_once=True
+        ), "it should now be in the latest version"
+        await assert_migration(
+            15, 16, MigrationStatus.PASSED, MigrationTrigger.AUTOMATIC
+        )
+
+        record = await ConfigBase.filter(key=ConfigKeys.sqliteProfile).first()
+        assert record.value == "auto"
+        assert not record.readonly
+
+    async def test_bump_v16(
+        self,
+        get_vth_connection,
+        scripts,
+        db_path,
+        helper_to_create_test_and_session,
+        create_suite,
+    ):
+        connection = await get_vth_connection(db_path, 16)
+        test_id, sample_session = await helper_to_create_test_and_session(
+            manual_insert_test_run=True, connection=connection, return_id=True
+        )
+        suite = await create_suite(sample_session, manual_insert=True)
+        await connection.execute_query(
+            'INSERT INTO "taskbase" ("ticketID","type","dropped","meta","picked","processed","test_id")'
+            " VALUES (?,?,?,?,?,?,?)",
+            [suite[0], "fix-suite", "2024-02-07 19:46:39", "{}", 1, 0, str(test_id)],
+        )
+
+        assert migration(
+            db_path, do_once=True
+        ), "it should now be in the latest version"
+        await assert_migration(
+            16, 17, MigrationStatus.PASSED, MigrationTrigger.AUTOMATIC
+        )
+
+        task = await TaskBase.filter(ticketID=suite[0]).first()
+        assert task.picked and task.leased_till is None and task.leased_by is None
+        assert task.attempts == 0
+        assert task.priority == 0
+
+        _, indexes = await connection.execute_query(
+            "select name from sqlite_master where type = 'index' and tbl_name = 'taskbase'"
+        )
+        assert {"idx_taskbase_process_48532e", "idx_taskbase_test_id_da3f5a"} <= {
+            index["name"] for index in indexes
+        }
+
     # say you are in v8 and have reverted your python build to an older version which uses v7
     # question: how does migrate function work?
 
@@ -18,7 +18,25 @@ from handshake.services.SchedularService.constants import JobType
 from handshake.services.SchedularService.modifySuites import patchTestSuite
 from handshake.services.SchedularService.register import register_patch_suite
 from handshake.services.SchedularService.handlePending import patch_jobs
+from handshake.services.SchedularService.task_queue import (
+    Budget,
+    claim_tasks_of_run,
+    release_tasks,
+)
+from handshake.services.SchedularService.patchTestRunSuites import (
+    patchSuitesOfTestRun,
+    patchSuitesOfTestRuns,
+)
+from handshake.services.DBService.ingest import (
+    register_suites,
+    update_suite,
+    lineage,
+    lineage_of,
+    ingest_transaction,
+    Lineage,
+)
 from datetime import datetime, timedelta
+from uuid import uuid4
 
 
 async def helper_test_many_retries(
@@ -573,6 +591,71 @@ class TestPatchSuiteJob:
         assert not await retried_later(parent_suite.suiteID)
         assert not await retried_later(test_case.suiteID)
 
+    async def test_chain_of_retries(
+        self, sample_test_session, attach_config, create_suite
+    ):
+        session = await sample_test_session
+        test = await session.test
+        await attach_config(str(test.testID), 4)
+
+        started = datetime.now()
+        attempts = []
+        for retried in range(4):
+            parent_suite = await create_suite(
+                session.sessionID,
+                started=started + timedelta(seconds=20 * retried),
+                duration=timedelta(seconds=10),
+                retried=retried,
+            )
+            test_case = await create_suite(
+                session.sessionID,
+                standing=Status.FAILED if retried < 3 else Status.PASSED,
+                parent=parent_suite.suiteID,
+                is_test=True,
+                started=parent_suite.started,
+                duration=timedelta(seconds=5),
+                retried=retried,
+            )
+            # hooks of the tests are two levels below the suite
+            setup_case = await create_suite(
+                session.sessionID,
+                standing=Status.PASSED,
+                parent=test_case.suiteID,
+                hook=SuiteType.SETUP,
+                started=parent_suite.started,
+                duration=timedelta(seconds=1),
+                retried=retried,
+            )
+            attempts.append((parent_suite, test_case, setup_case))
+
+        # same suite in another file, which is not a retry of the ones above
+        other_suite = await create_suite(
+            session.sessionID,
+            started=started + timedelta(seconds=20),
+            duration=timedelta(seconds=10),
+            file="test-2.js",
+        )
+
+        for parent_suite in [parent for parent, *_ in attempts] + [other_suite]:
+            await register_patch_suite(parent_suite.suiteID, test.testID)
+        await session.update_from_dict(dict(passed=1, failed=0, skipped=0, tests=1))
+        await session.save()
+
+        for parent_suite, *_ in attempts:
+            assert await patchTestSuite(parent_suite.suiteID, test.testID)
+        assert await patchTestSuite(other_suite.suiteID, test.testID)
+
+        # only the last attempt is left unmarked
+        for index, attempt in enumerate(attempts):
+            for entity in attempt:
+                assert await retried_later(entity.suiteID) == (index < 3), index
+        assert not await retried_later(other_suite.suiteID)
+
+        record = await RetriedBase.filter(suite_id=attempts[-1][0].suiteID).get()
+        assert record.tests == [str(parent.suiteID) for parent, *_ in attempts]
+        assert record.length == 4
+        assert await RetriedBase.filter(suite_id=other_suite.suiteID).get()
+
 
 @mark.usefixtures("sample_test_session")
 class TestPatchSuiteScheduler:
@@ -851,3 +934,430 @@ class TestPatchSuiteScheduler:
         )
 
         assert before_params == unchanged_values
+
+    @mark.parametrize("duplicated", (False, True))
+    async def test_patch_rolled_up_suites(self, sample_test_session, duplicated):
+        test_id = str(sample_test_session.test_id)
+        hierarchy = dict(
+            parent=("", SuiteType.SUITE),
+            suite=("parent", SuiteType.SUITE),
+            skipped=("parent", SuiteType.TEST),
+            passed=("suite", SuiteType.TEST),
+            failed=("suite", SuiteType.TEST),
+            setup=("passed", SuiteType.SETUP),
+        )
+        ids = {title: str(uuid4()) for title in hierarchy} | {"": ""}
+        await register_suites(
+            [
+                dict(
+                    suiteID=ids[title],
+                    title=title,
+                    suiteType=suite_type,
+                    parent=ids[parent],
+                    session_id=str(sample_test_session.sessionID),
+                    file="test.py",
+                    started=datetime.now().isoformat(),
+                    is_processing=False,
+                )
+                for title, (parent, suite_type) in hierarchy.items()
+            ]
+        )
+
+        ended = datetime.now().isoformat()
+        for title, standing in (
+            ("skipped", Status.SKIPPED),
+            ("setup", Status.PASSED),
+            ("passed", Status.FAILED),
+            # updated again with its final result
+            ("passed", Status.PASSED),
+            ("failed", Status.FAILED),
+            ("suite", Status.FAILED),
+            ("parent", Status.FAILED),
+        ):
+            await update_suite(
+                dict(suiteID=ids[title], duration=5, ended=ended, standing=standing),
+                test_id,
+            )
+
+        # results were rolled up as they arrived
+        suite = await SuiteBase.filter(suiteID=ids["suite"]).first()
+        assert (suite.passed, suite.failed, suite.tests) == (1, 1, 2)
+        assert suite.setup_duration == 5
+
+        if duplicated:
+            # rollup noted in two rows, they are summed up and merged into one
+            rollup = await RollupBase.filter(suite_id=ids["suite"]).get()
+            await RollupBase.create(suite_id=ids["suite"], failed=1, tests=1)
+            rollup.failed -= 1
+            rollup.tests -= 1
+            await rollup.save()
+
+        await patch_jobs()
+
+        suite = await SuiteBase.filter(suiteID=ids["suite"]).first()
+        assert suite.standing == Status.FAILED
+        assert (suite.passed, suite.failed, suite.skipped, suite.tests) == (1, 1, 0, 2)
+
+        parent = await SuiteBase.filter(suiteID=ids["parent"]).first()
+        assert parent.standing == Status.FAILED
+        assert (parent.failed, parent.skipped, parent.tests) == (1, 1, 2)
+        assert parent.setup_duration == 5
+
+        suite_rollup, parent_rollup = [
+            await RollupBase.filter(suite_id=ids[title]).get()
+            for title in ("suite", "parent")
+        ]
+        assert (suite_rollup.passed, suite_rollup.failed, suite_rollup.tests) == (
+            1,
+            2,
+            2,
+        )
+        assert (
+            parent_rollup.passed,
+            parent_rollup.failed,
+            parent_rollup.skipped,
+            parent_rollup.tests,
+        ) == (1, 2, 1, 3)
+
+    async def test_rolled_up_suite_missing_a_test(self, sample_test_session):
+        test_id = str(sample_test_session.test_id)
+        patched = []
+        # same suite, with and without its results rolled up as they arrived
+        for rolled_up in (True, False):
+            ids = {
+                title: str(uuid4()) for title in ("suite", "passed", "failed", "late")
+            }
+            await register_suites(
+                [
+                    dict(
+                        suiteID=ids[title],
+                        title=title,
+                        suiteType=(
+                            SuiteType.SUITE if title == "suite" else SuiteType.TEST
+                        ),
+                        parent="" if title == "suite" else ids["suite"],
+                        session_id=str(sample_test_session.sessionID),
+                        file="test.py",
+                        started=datetime.now().isoformat(),
+                        is_processing=False,
+                    )
+                    for title in ids
+                ]
+            )
+            if not rolled_up:
+                await RollupBase.filter(suite_id=ids["suite"]).delete()
+
+            ended = datetime.now().isoformat()
+            for title, standing in (
+                ("passed", Status.PASSED),
+                ("failed", Status.FAILED),
+            ):
+                await update_suite(
+                    dict(
+                        suiteID=ids[title], duration=5, ended=ended, standing=standing
+                    ),
+                    test_id,
+                )
+            # result of this test was not rolled up, so the counters of the suite miss it
+            await SuiteBase.filter(suiteID=ids["late"]).update(
+                standing=Status.SKIPPED, skipped=1, tests=1, ended=ended
+            )
+            await update_suite(
+                dict(
+                    suiteID=ids["suite"],
+                    duration=5,
+                    ended=ended,
+                    standing=Status.FAILED,
+                ),
+                test_id,
+            )
+            await register_patch_suite(ids["suite"], test_id)
+            assert await patchTestSuite(ids["suite"], test_id)
+
+            suite = await SuiteBase.filter(suiteID=ids["suite"]).get()
+            rollup = await RollupBase.filter(suite_id=ids["suite"]).get()
+            patched.append(
+                (
+                    suite.standing,
+                    suite.passed,
+                    suite.failed,
+                    suite.skipped,
+                    suite.tests,
+                    rollup.skipped,
+                    rollup.tests,
+                )
+            )
+
+        assert patched[0] == patched[1] == (Status.FAILED, 1, 1, 1, 3, 1, 3)
+
+    async def test_lineage_noted_after_commit(self, sample_test_session):
+        suite_id = str(uuid4())
+        await register_suites(
+            [
+                dict(
+                    suiteID=suite_id,
+                    title="suite",
+                    suiteType=SuiteType.SUITE,
+                    parent="",
+                    session_id=str(sample_test_session.sessionID),
+                    file="test.py",
+                    started=datetime.now().isoformat(),
+                    is_processing=False,
+                )
+            ]
+        )
+
+        # read inside a transaction which was rolled back
+        try:
+            async with ingest_transaction() as connection:
+                assert await lineage_of(suite_id, connection) == (
+                    "",
+                    SuiteType.SUITE,
+                    True,
+                )
+                assert lineage.get(suite_id)
+                raise ValueError()
+        except ValueError:
+            ...
+        assert lineage.get(suite_id) is None
+
+        async with ingest_transaction() as connection:
+            await lineage_of(suite_id, connection)
+        assert lineage.get(suite_id) == ("", SuiteType.SUITE, True)
+
+    def test_lineage_is_bounded(self):
+        known = Lineage(limit=2)
+        known.update(dict(first=("", "SUITE", False), second=("first", "TEST", False)))
+        # recently used are kept
+        assert known.get("first")
+        known.note("third", ("first", "TEST", False))
+        assert list(known.known) == ["first", "third"]
+
+    async def test_patch_suites_of_test_run(
+        self,
+        helper_to_create_test_and_session,
+        create_session,
+        create_hierarchy,
+        create_suite,
+        attach_config,
+    ):
+        # same hierarchy with a retry, patched one suite at a time and then all at once
+        results = []
+        for patch_all in (False, True):
+            session = await helper_to_create_test_and_session()
+            test_id = str(session.test_id)
+            await attach_config(test_id, 1)
+
+            to_patch = []
+            started = datetime.now()
+            for retried in range(2):
+                if retried:
+                    session = await create_session(test_id)
+                parent = await create_suite(
+                    session.sessionID, retried=retried, started=started
+                )
+                _, suites = await create_hierarchy(
+                    session.sessionID,
+                    parent.suiteID,
+                    test_id,
+                    retried=retried,
+                    started=parent.started,
+                )
+                await register_patch_suite(parent.suiteID, test_id)
+                to_patch.extend((*suites, parent.suiteID))
+                started = parent.ended
+
+            if patch_all:
+                assert await patchSuitesOfTestRun(test_id)
+            else:
+                for suite_id in to_patch:
+                    assert await patchTestSuite(suite_id, test_id)
+
+            assert not await TaskBase.filter(test_id=test_id, processed=False).exists()
+            results.append(
+                (
+                    await SuiteBase.filter(session__test_id=test_id)
+                    .order_by("retried", "title")
+                    .values_list(
+                        "title",
+                        "retried",
+                        "standing",
+                        "passed",
+                        "failed",
+                        "skipped",
+                        "tests",
+                        "setup_duration",
+                        "retried_later",
+                        "errors",
+                    ),
+                    await RollupBase.filter(suite__session__test_id=test_id)
+                    .order_by("suite__retried", "suite__title")
+                    .values_list(
+                        "suite__title", "passed", "failed", "skipped", "tests"
+                    ),
+                    await RetriedBase.filter(
+                        suite__session__test_id=test_id
+                    ).values_list("length", flat=True),
+                )
+            )
+
+        def without_ids(errors):
+            return [
+                {**error, "mailedFrom": len(error.get("mailedFrom", []))}
+                for error in errors
+            ]
+
+        one_by_one, all_at_once = [
+            (
+                [(*row[:-1], without_ids(row[-1])) for row in suites],
+                rollups,
+                retries,
+            )
+            for suites, rollups, retries in results
+        ]
+        assert one_by_one == all_at_once
+        # parent suite and its child suites were retried once
+        assert all_at_once[2] == [2, 2, 2, 2]
+
+    async def test_patch_test_runs_in_parallel(
+        self,
+        helper_to_create_test_and_session,
+        create_hierarchy,
+        create_suite,
+        attach_config,
+    ):
+        test_ids = []
+        for _ in range(3):
+            session = await helper_to_create_test_and_session()
+            test_id = str(session.test_id)
+            await attach_config(test_id, 0)
+
+            parent = await create_suite(session.sessionID)
+            await create_hierarchy(session.sessionID, parent.suiteID, test_id)
+            await register_patch_suite(parent.suiteID, test_id)
+            test_ids.append(test_id)
+
+        # first one is patched in this process, rest of them in a pool
+        assert await patchSuitesOfTestRun(test_ids[0])
+        await patchSuitesOfTestRuns(test_ids[1:], 2)
+
+        results = []
+        for test_id in test_ids:
+            assert not await TaskBase.filter(test_id=test_id, processed=False).exists()
+            results.append(
+                (
+                    await SuiteBase.filter(
+                        session__test_id=test_id, suiteType=SuiteType.SUITE
+                    )
+                    .order_by("title")
+                    .values_list("title", "standing", "passed", "failed", "tests"),
+                    await RollupBase.filter(suite__session__test_id=test_id)
+                    .order_by("suite__title")
+                    .values_list("suite__title", "passed", "failed", "tests"),
+                )
+            )
+        assert results[0] == results[1] == results[2]
+        assert all(row[1] != Status.YET_TO_CALCULATE for row in results[0][0])
+
+    async def test_patch_within_budget(
+        self,
+        helper_to_create_test_and_session,
+        create_hierarchy,
+        create_suite,
+        attach_config,
+    ):
+        test_ids = []
+        for _ in range(3):
+            session = await helper_to_create_test_and_session()
+            test_id = str(session.test_id)
+            await attach_config(test_id, 0)
+
+            parent = await create_suite(session.sessionID)
+            await create_hierarchy(session.sessionID, parent.suiteID, test_id)
+            await register_patch_suite(parent.suiteID, test_id)
+            test_ids.append(test_id)
+
+        tasks = await TaskBase.filter(test_id=test_ids[0], processed=False).count()
+
+        # suites of a test run are patched at once, newest test run first
+        budget = Budget(max_tasks=tasks)
+        await patch_jobs(budget=budget)
+        assert budget.spent == tasks
+        assert [
+            await TaskBase.filter(test_id=test_id, processed=False).exists()
+            for test_id in test_ids
+        ] == [True, True, False]
+
+        # test runs with more tasks than what is left of the budget are not picked,
+        # their suites are patched one by one instead
+        budget = Budget(max_tasks=tasks - 1)
+        await patch_jobs(budget=budget)
+        assert budget.spent == tasks - 1
+        assert await TaskBase.filter(processed=False).count() == tasks + 1
+        assert not await TaskBase.filter(picked=True, processed=False).exists()
+
+        # nothing is picked, once the time is up
+        await patch_jobs(budget=Budget(time_budget=0))
+        assert await TaskBase.filter(test_id=test_ids[0], processed=False).exists()
+
+        # rest of them are picked in the next patch
+        await patch_jobs()
+        assert not await TaskBase.filter(processed=False).exists()
+
+    async def test_claim_tasks_of_test_run(
+        self, sample_test_session, create_suite, create_hierarchy, attach_config
+    ):
+        session = await sample_test_session
+        test_id = str(session.test_id)
+        await attach_config(test_id, 0)
+        parent = await create_suite(session.sessionID)
+        await create_hierarchy(session.sessionID, parent.suiteID, test_id)
+        await register_patch_suite(parent.suiteID, test_id)
+        tasks = await TaskBase.filter(test_id=test_id).count()
+
+        # none of them are picked, if there are more than asked for
+        assert not await claim_tasks_of_run(test_id, JobType.MODIFY_SUITE, tasks - 1)
+
+        claimed = await claim_tasks_of_run(test_id, JobType.MODIFY_SUITE, tasks)
+        assert len(claimed) == tasks
+        assert claimed[-1] == str(parent.suiteID), "oldest first"
+
+        # so another patch running at the same time does not pick them
+        assert not await claim_tasks_of_run(test_id, JobType.MODIFY_SUITE)
+        assert not await patchSuitesOfTestRun(test_id)
+        assert not await TaskBase.filter(processed=True).exists()
+
+        await release_tasks(test_id, JobType.MODIFY_SUITE, claimed)
+        assert await patchSuitesOfTestRun(test_id)
+        assert not await TaskBase.filter(processed=False).exists()
+
+    async def test_leave_suites_with_child_picked_elsewhere(
+        self, sample_test_session, create_suite
+    ):
+        session = await sample_test_session
+        parent_suite = await create_suite(session.sessionID)
+        child_suite = await create_suite(session.sessionID, parent=parent_suite.suiteID)
+        await register_patch_suite(parent_suite.suiteID, session.test_id)
+        child = await register_patch_suite(child_suite.suiteID, session.test_id)
+
+        # child suite is being patched by another patch
+        await TaskBase.filter(ticketID=child.ticketID).update(
+            picked=True, leased_by="another-host:1"
+        )
+        await patch_jobs()
+
+        # so its parent suite is left for the next patch
+        assert not await TestLogBase.filter(
+            test_id=session.test_id, type=LogType.ERROR
+        ).exists()
+        parent = await TaskBase.filter(ticketID=parent_suite.suiteID).get()
+        assert not (parent.picked or parent.processed)
+
+        await TaskBase.filter(ticketID=child.ticketID).update(
+            picked=False, leased_by=None
+        )
+        await patch_jobs()
+        assert not await TaskBase.filter(processed=False).exists()
+        assert (
+            await SuiteBase.filter(suiteID=parent_suite.suiteID).get()
+        ).standing != Status.YET_TO_CALCULATE
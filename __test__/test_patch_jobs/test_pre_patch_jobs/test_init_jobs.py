@@ -1,13 +1,34 @@
+import json
 from pytest import mark
-from handshake.services.DBService.models import ConfigBase, TaskBase, RunBase
-from handshake.services.DBService.models.enums import ConfigKeys
+from handshake.services.DBService.models import (
+    ConfigBase,
+    TaskBase,
+    RunBase,
+    TestLogBase,
+)
+from handshake.services.DBService.models.enums import ConfigKeys, LogType
 from handshake.services.SchedularService.start import Scheduler
 from handshake.services.SchedularService.completeTestRun import patchTestRun
-from subprocess import run
+from subprocess import run, Popen
+from socket import gethostname
+from sys import executable
 from handshake.services.SchedularService.register import (
     register_patch_suite,
     register_patch_test_run,
+    JobType,
+)
+from handshake.services.SchedularService.task_queue import (
+    claim_task,
+    LEASE,
+    MAX_ATTEMPTS,
 )
+from handshake.services.SchedularService.constants import (
+    exportAttachmentFolderName,
+    EXPORT_RUNS_PAGE_FILE_NAME,
+    EXPORT_RUN_PAGE_FILE_NAME,
+    EXPORT_OVERVIEW_PAGE,
+)
+from tortoise import timezone
 
 
 @mark.usefixtures()
@@ -120,3 +141,126 @@ class TestPickTasks:
         ticket = await TaskBase.filter(ticketID=test.testID).first()
         assert ticket.dropped != updated, "dropped timestamp is updated"
         assert ticket.processed and ticket.picked
+
+    async def test_if_leased_tasks_are_picked_after_expiry(
+        self, db_path, sample_test_session, create_suite
+    ):
+        """
+        tasks picked by a patch which is still running are not picked,
+        until their lease expires if it was leased from another host
+        """
+        session = await sample_test_session
+        test = await session.test
+        leased = await register_patch_suite(
+            (await create_suite(session.sessionID)).suiteID, test.testID
+        )
+        expired = await register_patch_suite(
+            (await create_suite(session.sessionID)).suiteID, test.testID
+        )
+        assert await claim_task(leased) and await claim_task(expired)
+        assert not await claim_task(leased), "it was already picked"
+
+        expired.leased_till = timezone.now() - LEASE
+        expired.leased_by = "another-host:1"
+        await expired.save()
+
+        await Scheduler(db_path.parent).init_jobs()
+
+        leased = await TaskBase.filter(ticketID=leased.ticketID).first()
+        assert leased.picked and leased.attempts == 0
+
+        expired = await TaskBase.filter(ticketID=expired.ticketID).first()
+        assert not (expired.picked or expired.processed)
+        assert expired.leased_till is None and expired.leased_by is None
+        assert expired.attempts == 1
+
+    async def test_if_tasks_of_killed_patch_are_picked(
+        self, db_path, sample_test_session, create_suite
+    ):
+        """
+        tasks picked by a patch which was killed are picked again, even if their lease is not expired
+        """
+        session = await sample_test_session
+        test = await session.test
+        task = await register_patch_suite(
+            (await create_suite(session.sessionID)).suiteID, test.testID
+        )
+        assert await claim_task(task)
+
+        killed = Popen([executable, "-c", "pass"])
+        killed.wait()
+        task.leased_by = f"{gethostname()}:{killed.pid}"
+        await task.save()
+
+        await Scheduler(db_path.parent).init_jobs()
+
+        task = await TaskBase.filter(ticketID=task.ticketID).first()
+        assert not (task.picked or task.processed)
+        assert task.attempts == 1
+
+    async def test_give_up_on_unfinished_task(
+        self, db_path, sample_test_session, create_suite
+    ):
+        """
+        task which was left unfinished for MAX_ATTEMPTS times is not picked again,
+        and the patch of its test run is cancelled
+        """
+        session = await sample_test_session
+        test = await session.test
+        task = await register_patch_suite(
+            (await create_suite(session.sessionID)).suiteID, test.testID
+        )
+        task.picked = True
+        task.attempts = MAX_ATTEMPTS - 1
+        await task.save()
+
+        await Scheduler(db_path.parent).init_jobs()
+
+        task = await TaskBase.filter(ticketID=task.ticketID).first()
+        assert task.picked and not task.processed
+
+        log = await TestLogBase.filter(test_id=test.testID, type=LogType.ERROR).first()
+        assert log.generatedBy == "task-queue"
+        assert await TaskBase.filter(type=JobType.PRUNE_TASKS).exists()
+
+
+class TestWatermark:
+    async def test_skip_unchanged_runs(self, db_path, helper_create_test_run, tmp_path):
+        """
+        patch is skipped if nothing was changed since the previous patch,
+        else only the changed test runs are exported again
+        """
+        exported = tmp_path / exportAttachmentFolderName
+        first = await helper_create_test_run(add_test_config=True)
+        await register_patch_test_run(first.testID)
+
+        await Scheduler(db_path.parent, out_dir=str(tmp_path)).start()
+        assert (exported / str(first.testID) / EXPORT_OVERVIEW_PAGE).exists()
+        assert await ConfigBase.filter(key=ConfigKeys.patchWatermark).exists()
+
+        (exported / EXPORT_RUNS_PAGE_FILE_NAME).unlink()
+        await Scheduler(db_path.parent, out_dir=str(tmp_path)).start()
+        assert not (exported / EXPORT_RUNS_PAGE_FILE_NAME).exists(), "it was skipped"
+
+        (exported / str(first.testID) / EXPORT_OVERVIEW_PAGE).unlink()
+        second = await helper_create_test_run(add_test_config=True)
+        await register_patch_test_run(second.testID)
+
+        await Scheduler(db_path.parent, out_dir=str(tmp_path)).start()
+        runs = json.loads((exported / EXPORT_RUNS_PAGE_FILE_NAME).read_text())
+        assert len(runs) == 2
+        assert (exported / str(second.testID) / EXPORT_OVERVIEW_PAGE).exists()
+        # summary of each run is exported
+        assert (exported / str(first.testID) / EXPORT_RUN_PAGE_FILE_NAME).exists()
+        assert not (exported / str(first.testID) / EXPORT_OVERVIEW_PAGE).exists()
+
+        # all of them are exported, if exported at a different place
+        await Scheduler(db_path.parent, out_dir=str(tmp_path / "other")).start()
+        for run_id in (first.testID, second.testID):
+            assert (
+                tmp_path
+                / "other"
+                / exportAttachmentFolderName
+                / str(run_id)
+                / EXPORT_OVERVIEW_PAGE
+            ).exists()
@@ -0,0 +1,86 @@
+from pytest import mark
+from handshake.services.DBService.models import TestLogBase
+from handshake.services.DBService.models.enums import LogType, LogGeneratedBy
+from handshake.services.Endpoints.audit import AuditSink
+from __test__.test_patch_jobs.test_server.commons import set_config
+
+
+@mark.usefixtures("sample_test_session")
+class TestAuditSink:
+    async def test_failures_are_written_in_background(
+        self, client, app, sample_test_session
+    ):
+        session = await set_config(app, sample_test_session)
+        test_id = str((await session.test).testID)
+        app.ctx.audit = AuditSink(window=60)
+
+        try:
+            for _ in range(3):
+                request, response = await client.post(
+                    "/create/RunLog", json=dict(title="missing type")
+                )
+                assert response.status == 400
+            request, response = await client.post(
+                "/create/RunLog", json=dict(title="missing type, again")
+            )
+            assert response.status == 400
+
+            # not yet written
+            assert not await TestLogBase.filter(
+                test_id=test_id, generatedByGroup=LogGeneratedBy.API
+            ).exists()
+        finally:
+            await app.ctx.audit.close()
+            del app.ctx.audit
+
+        logs = await TestLogBase.filter(
+            test_id=test_id, generatedByGroup=LogGeneratedBy.API
+        )
+        assert len(logs) == 2
+        assert sorted(log.feed.get("repeated", 1) for log in logs) == [1, 3]
+        assert all(log.type == LogType.ERROR for log in logs)
+
+    async def test_logs_are_rate_limited(self, app, sample_test_session):
+        session = await set_config(app, sample_test_session)
+        test_id = str((await session.test).testID)
+        sink = AuditSink(window=60, limit=2)
+
+        for index in range(5):
+            sink.note(
+                test_id, dict(url=f"/save/{index}", status=404), LogType.WARN, "sample"
+            )
+        await sink.close()
+
+        logs = await TestLogBase.filter(
+            test_id=test_id, generatedByGroup=LogGeneratedBy.API
+        )
+        assert len(logs) == 3
+        limited = next(log for log in logs if log.title == "API logs were rate limited")
+        assert limited.feed["dropped"] == 3
+
+    async def test_similar_logs_keep_a_sample_payload(self, app, sample_test_session):
+        session = await set_config(app, sample_test_session)
+        test_id = str((await session.test).testID)
+        sink = AuditSink(window=60)
+
+        for index in range(3):
+            sink.note(
+                test_id,
+                dict(
+                    url="http://127.0.0.1:6969/write/Attachment/" + "a" * 80,
+                    payload=dict(index=index),
+                    status=404,
+                    reason="entity was not found",
+                ),
+                LogType.WARN,
+                "sample",
+            )
+        await sink.close()
+
+        logs = await TestLogBase.filter(
+            test_id=test_id, generatedByGroup=LogGeneratedBy.API
+        )
+        assert len(logs) == 1
+        assert logs[0].feed["payload"] == dict(index=0)
+        assert logs[0].feed["repeated"] == 3
+        assert len(logs[0].generatedBy) == 80
@@ -1,13 +1,20 @@
 import datetime
 import json
+import uuid
 from pytest import mark
 from handshake.services.DBService.models import (
     RunBase,
     SuiteBase,
+    SessionBase,
+    AssertBase,
+    TestLogBase,
 )
 from handshake.services.DBService.models.enums import Status, SuiteType
 from sanic import Sanic
 from __test__.test_patch_jobs.test_server.commons import set_config
+from handshake.services.Endpoints.encoding import gzip_encode
+from handshake.services.DBService.ingest import register_suite
+from asyncio import gather
 
 
 @mark.usefixtures("sample_test_session")
@@ -21,6 +28,25 @@ class TestRegisterSession:
         request, response = await client.post("/create/Session", json=payload)
         assert response.status == 201
 
+    async def test_register_session_with_provided_id(
+        self, client, app, sample_test_session
+    ):
+        await set_config(app, sample_test_session)
+        session_id = str(uuid.uuid4())
+        payload = dict(
+            started=datetime.datetime.now().isoformat(),
+            sessionID=session_id,
+        )
+        request, response = await client.post("/create/Session", json=payload)
+        assert response.status == 201, response.text
+        assert response.text == session_id
+
+        # retried requests must not create another session
+        request, response = await client.post("/create/Session", json=payload)
+        assert response.status == 200, response.text
+        assert response.text == session_id
+        assert await SessionBase.filter(sessionID=session_id).count() == 1
+
     # async def test_register_suite
 
 
@@ -69,3 +95,258 @@ class TestRegisterSuite:
         assert test_record.suiteType == SuiteType.TEST
         assert test_record.standing == Status.PENDING
         assert test_record.title == "Sample Test"
+
+    async def test_register_suite_with_provided_id(
+        self, client, app, sample_test_session
+    ):
+        await set_config(app, sample_test_session)
+        suite_id = str(uuid.uuid4())
+        payload = dict(
+            suiteID=suite_id,
+            title="Sample Suite",
+            suiteType=SuiteType.SUITE,
+            session_id=str(sample_test_session.sessionID),
+            file="test.spec.js",
+            started=datetime.datetime.now().isoformat(),
+            parent="",
+        )
+        request, response = await client.post("/create/Suite", json=payload)
+        assert response.status == 201, response.text
+        assert response.text == suite_id
+
+        # retried requests must not create another suite
+        request, response = await client.post("/create/Suite", json=payload)
+        assert response.status == 200, response.text
+        assert response.text == suite_id
+        assert await SuiteBase.filter(suiteID=suite_id).count() == 1
+
+    async def test_register_suite_concurrently(self, sample_test_session):
+        suite_id = str(uuid.uuid4())
+        payload = dict(
+            suiteID=suite_id,
+            title="Shared Suite",
+            suiteType=SuiteType.SUITE,
+            session_id=str(sample_test_session.sessionID),
+            file="test.spec.js",
+            started=datetime.datetime.now().isoformat(),
+            parent="",
+        )
+        # workers registering the parent suite shared by them, at the same time
+        registered = await gather(*(register_suite(dict(payload)) for _ in range(4)))
+
+        assert [created for _, created in registered].count(True) == 1
+        assert {str(record.suiteID) for record, _ in registered} == {suite_id}
+        assert await SuiteBase.filter(suiteID=suite_id).count() == 1
+
+    async def test_register_suites(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+        suite_id = str(uuid.uuid4())
+        common = dict(session_id=str(sample_test_session.sessionID), file="test.py")
+        payload = [
+            dict(
+                suiteID=suite_id,
+                title="Sample Suite",
+                suiteType=SuiteType.SUITE,
+                parent="",
+                **common,
+            ),
+            *(
+                dict(
+                    title=f"Sample Test {index}",
+                    suiteType=SuiteType.TEST,
+                    parent=suite_id,
+                    is_processing=False,
+                    **common,
+                )
+                for index in range(3)
+            ),
+        ]
+        request, response = await client.post("/create/Suites", json=payload)
+        assert response.status == 201, response.text
+
+        registered = response.json
+        assert len(registered) == 4
+        assert registered[0] == suite_id
+        assert await SuiteBase.filter(parent=suite_id).count() == 3
+        assert (
+            await SuiteBase.filter(suiteID=registered[1]).first()
+        ).standing == Status.PENDING
+
+        # registered ones are skipped
+        payload[0]["title"] = "Renamed Suite"
+        payload[1]["suiteID"] = registered[1]
+        request, response = await client.post("/create/Suites", json=payload[:2])
+        assert response.status == 201, response.text
+        assert (
+            await SuiteBase.filter(suiteID=suite_id).first()
+        ).title == "Sample Suite"
+        assert await SuiteBase.filter(parent=suite_id).count() == 3
+
+        request, response = await client.post(
+            "/create/Suites", json=[dict(title="missing the suite type")]
+        )
+        assert response.status == 400
+
+
+@mark.usefixtures("sample_test_session")
+class TestRegisterBatch:
+    @staticmethod
+    def as_ndjson(*events):
+        return "\n".join(json.dumps(event) for event in events)
+
+    async def test_register_batch(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+        started = datetime.datetime.now().isoformat()
+
+        events = self.as_ndjson(
+            dict(
+                event="create/Session",
+                payload=dict(started=started),
+                save_as="Session",
+            ),
+            dict(
+                event="create/Suite",
+                payload=dict(
+                    title="Sample Suite",
+                    suiteType=SuiteType.SUITE,
+                    file="test.spec.js",
+                    parent="",
+                ),
+                save_as="suite",
+                refer=dict(session_id="Session"),
+            ),
+            dict(
+                event="create/Suite",
+                payload=dict(
+                    title="Sample Test",
+                    suiteType=SuiteType.TEST,
+                    file="test.spec.js",
+                ),
+                save_as="test",
+                refer=dict(session_id="Session", parent="suite"),
+            ),
+            dict(
+                event="save/PunchInSuite",
+                payload=dict(started=started),
+                refer=dict(suiteID="test"),
+            ),
+            dict(
+                event="create/Attachments",
+                payload=[
+                    dict(
+                        entity_id="test",
+                        type="ASSERT",
+                        title="sample assertion",
+                        value=dict(passed=True),
+                    )
+                ],
+                map_value="entity_id",
+            ),
+        )
+
+        request, response = await client.post(
+            "/create/Batch",
+            content=events,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status == 201, response.text
+
+        refs = response.json["refs"]
+        assert set(refs.keys()) == {"Session", "suite", "test"}
+        assert response.json["results"] == [201, 201, 201, 200, 201]
+
+        test_record = await SuiteBase.filter(suiteID=refs["test"]).first()
+        assert test_record.parent == refs["suite"]
+        assert str(test_record.session_id) == refs["Session"]
+        assert test_record.standing == Status.PROCESSING
+        assert await AssertBase.filter(entity_id=refs["test"]).count() == 1
+
+    async def test_batch_is_rolled_back(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+
+        events = self.as_ndjson(
+            dict(
+                event="create/Suite",
+                payload=dict(
+                    title="Rolled back suite",
+                    suiteType=SuiteType.SUITE,
+                    file="test.spec.js",
+                    parent="",
+                    session_id=str(sample_test_session.sessionID),
+                ),
+                save_as="suite",
+            ),
+            # invalid, as suiteType is missing
+            dict(
+                event="create/Suite",
+                payload=dict(title="Sample Test", file="test.spec.js", parent=""),
+                refer=dict(session_id="Session"),
+            ),
+        )
+
+        request, response = await client.post("/create/Batch", content=events)
+        assert response.status == 400, response.text
+        # error responses are wrapped with the request details
+        assert json.loads(response.json["reason"])["index"] == 1
+
+        assert not await SuiteBase.filter(title="Rolled back suite").exists()
+
+
+@mark.usefixtures("sample_test_session")
+class TestRegisterRunLog:
+    async def test_add_run_log(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+        payload = dict(
+            type="INFO",
+            title="Overhead of the Handshake reporter",
+            message="sample summary",
+            feed=dict(requests=1),
+        )
+        request, response = await client.post("/create/RunLog", json=payload)
+        assert response.status == 201, response.text
+
+        log = await TestLogBase.filter(
+            test_id=sample_test_session.test_id, title=payload["title"]
+        ).first()
+        assert log.feed == dict(requests=1)
+        assert log.generatedBy == "reporter"
+
+        request, response = await client.post(
+            "/create/RunLog", json=dict(title="missing type")
+        )
+        assert response.status == 400
+
+
+@mark.usefixtures("sample_test_session")
+class TestCompressedRequests:
+    async def test_gzip_body(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+        session_id = str(uuid.uuid4())
+        payload = dict(
+            started=datetime.datetime.now().isoformat(), sessionID=session_id
+        )
+
+        request, response = await client.post(
+            "/create/Session",
+            content=gzip_encode(json.dumps(payload).encode("utf-8")),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        assert response.status == 201, response.text
+        assert await SessionBase.filter(sessionID=session_id).exists()
+
+    async def test_invalid_encoded_body(self, client, app, sample_test_session):
+        await set_config(app, sample_test_session)
+
+        request, response = await client.post(
+            "/create/Session",
+            content=b"not gzipped",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        assert response.status == 400
+
+        request, response = await client.post(
+            "/create/Session",
+            content=b"{}",
+            headers={"Content-Type": "application/json", "Content-Encoding": "br"},
+        )
+        assert response.status == 415
@@ -30,13 +30,16 @@ async def shakes(get_db_path, root_dir_server):
 
     first_sock = find_free_port()
     second_sock = find_free_port()
+    # workers write the results themselves, so we can read them right after the response
     result = Popen(
-        f'handshake run-app test-app-1 "{root_dir_server}" -p {first_sock}', shell=True
+        f'handshake run-app test-app-1 "{root_dir_server}" -p {first_sock} --no-write-behind',
+        shell=True,
     )
     sleep(0.2)
 
     result_2 = Popen(
-        f'handshake run-app test-app-1 "{root_dir_server}" -p {second_sock}', shell=True
+        f'handshake run-app test-app-1 "{root_dir_server}" -p {second_sock} --no-write-behind',
+        shell=True,
     )
 
     _session = Session()
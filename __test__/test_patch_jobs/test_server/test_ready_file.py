@@ -0,0 +1,35 @@
+from subprocess import Popen
+from httpx import Client
+from shutil import rmtree
+from pathlib import Path
+from time import sleep
+
+
+def test_run_app_writes_ready_file(tmp_path):
+    results = Path(__file__).parent / "TestReadyResults"
+    ready = tmp_path / "handshake.ready"
+    server = Popen(
+        f'handshake run-app test-ready-file "{results}" -p 6980 -r "{ready}"',
+        shell=True,
+    )
+
+    client = Client()
+    try:
+        for _ in range(300):
+            if ready.exists() or server.poll() is not None:
+                break
+            sleep(0.1)
+        else:
+            assert False, "server did not write the ready file"
+
+        assert ready.read_text() == "http://127.0.0.1:6980"
+        # no retries needed, server is ready once the file is written
+        assert client.get("http://127.0.0.1:6980/").text == "1"
+
+        assert client.post("http://127.0.0.1:6980/bye").text == "1"
+        assert server.wait(timeout=30) == 0
+        assert not ready.exists()
+    finally:
+        client.close()
+        server.poll() is None and server.kill()
+        rmtree(results, ignore_errors=True)
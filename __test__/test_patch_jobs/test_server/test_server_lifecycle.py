@@ -17,8 +17,10 @@ session: Session
 
 @fixture(autouse=True)
 async def open_server(root_dir):
+    # workers write the results themselves, so we can read them right after the response
     result = Popen(
-        f'handshake run-app test-life-cycle "{root_dir}" -p 6978', shell=True
+        f'handshake run-app test-life-cycle "{root_dir}" -p 6978 --no-write-behind',
+        shell=True,
     )
 
     global session
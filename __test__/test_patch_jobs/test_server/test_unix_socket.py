@@ -0,0 +1,38 @@
+from pytest import mark
+from subprocess import Popen
+from httpx import Client, HTTPTransport, HTTPError
+from shutil import rmtree
+from pathlib import Path
+from time import sleep
+from tempfile import mkdtemp
+from sys import platform
+
+
+@mark.skipif(platform == "win32", reason="unix sockets are not supported")
+def test_run_app_at_unix_socket():
+    results = Path(__file__).parent / "TestSocketResults"
+    # sanic binds at a longer temporary path first, so we keep this short
+    socket_dir = Path(mkdtemp())
+    socket = socket_dir / "hs.sock"
+    server = Popen(
+        f'handshake run-app test-unix-socket "{results}" -u "{socket}"', shell=True
+    )
+
+    client = Client(transport=HTTPTransport(uds=str(socket), retries=5))
+    try:
+        for _ in range(30):
+            try:
+                assert client.get("http://localhost/").text == "1"
+                break
+            except HTTPError:
+                sleep(0.5)
+        else:
+            assert False, "server did not listen at the unix socket"
+
+        assert client.post("http://localhost/bye").text == "1"
+        assert server.wait(timeout=30) == 0
+    finally:
+        client.close()
+        server.poll() is None and server.kill()
+        rmtree(results, ignore_errors=True)
+        rmtree(socket_dir, ignore_errors=True)
@@ -14,6 +14,7 @@ from handshake.services.DBService.models.enums import SuiteType, Status
 from sanic import Sanic
 from asyncio import gather
 from __test__.test_patch_jobs.test_server.commons import set_config
+from handshake.services.Endpoints.audit import audit_sink
 from handshake.services.DBService.models.enums import (
     LogType,
     AttachmentType,
@@ -362,6 +363,7 @@ class TestUpdateEndpoints:
             )
 
             test_id = str((await session.test).testID)
+            await audit_sink().close()
             assert await TestLogBase.filter(test_id=test_id).count() == 2
 
             first, second = await TestLogBase.filter(
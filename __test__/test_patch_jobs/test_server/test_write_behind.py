@@ -0,0 +1,228 @@
+from subprocess import Popen
+from httpx import Client
+from shutil import rmtree
+from pathlib import Path
+from time import sleep
+from sqlite3 import connect
+from datetime import datetime
+from multiprocessing import get_context
+from threading import Thread
+from base64 import b64encode
+from uuid import uuid4
+from handshake.services.Endpoints.write_behind import WriteBehind
+from handshake.services.DBService.ingest import IngestEvent
+
+
+def test_events_are_written_by_single_writer(tmp_path):
+    results = Path(__file__).parent / "TestWriteBehindResults"
+    ready = tmp_path / "handshake.ready"
+    # write-behind is the default
+    server = Popen(
+        f'handshake run-app test-write-behind "{results}" -p 6981 -r "{ready}"',
+        shell=True,
+    )
+
+    url = "http://127.0.0.1:6981"
+    client = Client(base_url=url)
+    try:
+        for _ in range(300):
+            if ready.exists() or server.poll() is not None:
+                break
+            sleep(0.1)
+        else:
+            assert False, "server did not write the ready file"
+
+        started = datetime.now().astimezone().isoformat()
+        response = client.post("/create/Session", json=dict(started=started))
+        assert response.status_code == 202, response.text
+        session_id = response.text
+
+        response = client.post(
+            "/create/Suite",
+            json=dict(
+                title="Queued Test",
+                suiteType="TEST",
+                file="test.spec.js",
+                parent="",
+                session_id=session_id,
+                started=started,
+            ),
+        )
+        assert response.status_code == 202, response.text
+        suite_id = response.text
+
+        # invalid events are still rejected by the workers
+        response = client.post("/create/Suite", json=dict(title="no suite type"))
+        assert response.status_code == 400
+
+        response = client.put(
+            "/save/PunchInSuite", json=dict(suiteID=suite_id, started=started)
+        )
+        assert response.status_code == 202, response.text
+
+        # streamed files are noted by the writer
+        response = client.put(
+            f"/write/Attachment/{suite_id}",
+            params=dict(type="VIDEO", title="queued-video"),
+            content=bytes(1 << 16),
+        )
+        assert response.status_code == 201, response.text
+        attachment_id = response.text
+
+        # file streamed for a missing entity is removed
+        missing = uuid4()
+        response = client.put(
+            f"/write/Attachment/{missing}",
+            params=dict(type="VIDEO", title="missing-video"),
+            content=bytes(1 << 10),
+        )
+        assert response.status_code == 404, response.text
+        assert not list(results.glob(f"**/{missing}/*"))
+
+        # endpoints which respond with what they wrote, wait for the writer
+        response = client.put(
+            "/save/currentRun",
+            json=dict(
+                maxInstances=1,
+                fileRetries=0,
+                framework="pytest",
+                exitCode=0,
+                bail=0,
+                platformName="linux",
+                tags=[],
+                avoidParentSuitesInCount=False,
+            ),
+        )
+        assert response.status_code == 200, response.text
+        with connect(results / "TeStReSuLtS.db") as db:
+            assert db.execute("select count(*) from testconfigbase").fetchone() == (1,)
+
+        response = client.put(
+            "/save/registerParentEntities",
+            json=[
+                suite_id,
+                dict(
+                    title="Parent Suite",
+                    retried=0,
+                    suiteType="SUITE",
+                    file="test.spec.js",
+                    parent="",
+                    session_id=session_id,
+                    started=started,
+                ),
+            ],
+        )
+        assert response.status_code == 201, response.text
+        parents = response.json()
+        assert parents[0] == suite_id
+        with connect(results / "TeStReSuLtS.db") as db:
+            assert db.execute(
+                "select parent from suitebase where suiteID = ?", (parents[1],)
+            ).fetchone() == (suite_id,)
+
+        # files are written once their records are
+        response = client.put(
+            "/write/addAttachmentForEntity",
+            json=dict(
+                entity_id=suite_id, type="PNG", value=b64encode(b"png").decode("utf-8")
+            ),
+        )
+        assert response.status_code == 201, response.text
+        written_file = next(results.glob(f"**/{response.text}.png"))
+        assert written_file.read_bytes() == b"png"
+
+        response = client.put(
+            "/write/addAttachmentForEntity",
+            json=dict(
+                entity_id=str(uuid4()),
+                type="PNG",
+                value=b64encode(b"png").decode("utf-8"),
+            ),
+        )
+        assert response.status_code == 404, response.text
+        assert len(list(results.glob("**/*.png"))) == 1
+
+        # events accepted before bye, are written before the server stops
+        assert client.post("/bye").text == "1"
+        assert server.wait(timeout=60) == 0
+
+        with connect(results / "TeStReSuLtS.db") as db:
+            assert db.execute(
+                "select standing from suitebase where suiteID = ?", (suite_id,)
+            ).fetchone() == ("PROCESSING",)
+            assert db.execute(
+                "select count(*) from sessionbase where sessionID = ?", (session_id,)
+            ).fetchone() == (1,)
+            assert db.execute(
+                "select title, size from staticbase where attachmentID = ?",
+                (attachment_id,),
+            ).fetchone() == ("queued-video", 1 << 16)
+            # logs of the rejected event and of the missing entities were queued too
+            assert db.execute(
+                "select count(*) from testlogbase where generatedByGroup = 1"
+            ).fetchone() == (3,)
+    finally:
+        client.close()
+        server.poll() is None and server.kill()
+        rmtree(results, ignore_errors=True)
+
+
+async def test_writer_is_stopped_by_last_worker():
+    context = get_context("spawn")
+    queue, written, workers = (
+        context.SimpleQueue(),
+        context.Event(),
+        context.Value("i", 0),
+    )
+    first, second = WriteBehind(queue, written, workers), WriteBehind(
+        queue, written, workers
+    )
+    first.open()
+    second.open()
+
+    await first.close()
+    await first.close()
+    assert queue.empty(), "another worker can still accept the events"
+
+    written.set()
+    await second.close()
+    assert queue.get() is None
+    assert workers.value == 0
+
+
+async def test_writer_replies_to_the_worker_that_sent_the_event():
+    context = get_context("spawn")
+    queue, written, workers, slots = (
+        context.SimpleQueue(),
+        context.Event(),
+        context.Value("i", 0),
+        context.Value("i", 0),
+    )
+    replies = (context.SimpleQueue(), context.SimpleQueue())
+    first, second = WriteBehind(queue, written, workers, replies, slots), WriteBehind(
+        queue, written, workers, replies, slots
+    )
+    first.open()
+    second.open()
+    assert (first.slot, second.slot) == (0, 1)
+
+    def write():
+        # replies of a writer, refer: write_events
+        while (event := queue.get()) is not None:
+            slot, ticket = event["reply"]
+            replies[slot].put((ticket, 200, event["payload"]["platformName"]))
+
+    writer = Thread(target=write)
+    writer.start()
+    config = dict(platformName="linux", framework="pytest", exitCode=0, tags=[])
+    assert await second.apply(IngestEvent.SAVE_RUN_CONFIG, config) == (200, "linux")
+    assert await first.apply(
+        IngestEvent.SAVE_RUN_CONFIG, dict(config, platformName="win32")
+    ) == (200, "win32")
+    assert not (first.waiting or second.waiting)
+
+    written.set()
+    await first.close()
+    await second.close()
+    writer.join(5)
+    assert not writer.is_alive()
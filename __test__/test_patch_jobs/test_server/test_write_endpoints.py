@@ -4,6 +4,15 @@ from handshake.services.DBService.lifecycle import attachment_folder
 from __test__.test_patch_jobs.test_server.commons import set_config
 
 from pathlib import Path
+from hashlib import sha256
+from uuid import uuid4
+from subprocess import Popen
+from os import environ
+from httpx import Client
+from shutil import rmtree
+from time import sleep
+from sqlite3 import connect
+from datetime import datetime
 
 
 @mark.usefixtures("sample_test_session")
@@ -35,3 +44,103 @@ class TestSaveEndpoints:
         saved = await StaticBase.filter(attachmentID=path.stem).first()
         assert saved.value == path.name
         assert saved.title == "sample"
+
+    async def test_stream_attachment(
+        self, client, app, sample_test_session, create_suite, db_path
+    ):
+        session = await set_config(app, sample_test_session, db_path)
+        suite = await create_suite(session.sessionID)
+
+        async def chunks():
+            for index in range(8):
+                yield bytes([index]) * (1 << 16)
+
+        request, response = await client.put(
+            f"/write/Attachment/{suite.suiteID}",
+            params=dict(type="VIDEO", title="sample-video"),
+            content=chunks(),
+        )
+        assert response.status == 201, response.text
+
+        saved = await StaticBase.filter(attachmentID=response.text).first()
+        written = (
+            attachment_folder(db_path)
+            / str(session.test_id)
+            / str(suite.suiteID)
+            / saved.value
+        )
+        expected = b"".join(bytes([index]) * (1 << 16) for index in range(8))
+        assert written.read_bytes() == expected
+        assert saved.size == len(expected)
+        assert saved.hash == sha256(expected).hexdigest()
+        assert saved.title == "sample-video"
+
+        request, response = await client.put(
+            f"/write/Attachment/{uuid4()}", params=dict(type="VIDEO"), content=b"1"
+        )
+        assert response.status == 404
+
+
+def test_stream_attachment_within_limit(tmp_path):
+    results = Path(__file__).parent / "TestAttachmentLimitResults"
+    ready = tmp_path / "handshake.ready"
+    server = Popen(
+        f'handshake run-app test-attachment-limit "{results}" -p 6982 -r "{ready}"',
+        shell=True,
+        # attachments are limited separately from the rest of the requests
+        env=dict(
+            environ, SANIC_REQUEST_MAX_SIZE="1024", SANIC_ATTACHMENT_MAX_SIZE="65536"
+        ),
+    )
+
+    client = Client(base_url="http://127.0.0.1:6982")
+    try:
+        for _ in range(300):
+            if ready.exists() or server.poll() is not None:
+                break
+            sleep(0.1)
+        else:
+            assert False, "server did not write the ready file"
+
+        started = datetime.now().astimezone().isoformat()
+        session_id = client.post("/create/Session", json=dict(started=started)).text
+        suite_id = client.post(
+            "/create/Suite",
+            json=dict(
+                title="Test",
+                suiteType="TEST",
+                file="test.py",
+                parent="",
+                session_id=session_id,
+                started=started,
+            ),
+        ).text
+
+        response = client.put(
+            f"/write/Attachment/{suite_id}",
+            params=dict(type="VIDEO"),
+            content=bytes(1 << 15),
+        )
+        assert response.status_code == 201, response.text
+
+        response = client.put(
+            f"/write/Attachment/{suite_id}",
+            params=dict(type="VIDEO"),
+            content=bytes(1 << 17),
+        )
+        assert response.status_code == 413
+
+        assert client.post("/bye").text == "1"
+        assert server.wait(timeout=60) == 0
+
+        with connect(results / "TeStReSuLtS.db") as db:
+            assert db.execute("select size from staticbase").fetchall() == [(1 << 15,)]
+        assert [
+            file.name
+            for file in (results / "Attachments").rglob("*")
+            if file.suffix == ".part"
+        ] == [], "partly written file is removed"
+    finally:
+        client.close()
+        server.poll() is None and server.kill()
+        rmtree(results, ignore_errors=True)
@@ -0,0 +1,443 @@
+from handshake.reporters.reporter import CommonReporter, is_enabled
+from handshake.reporters.dispatcher import Dispatcher
+from handshake.reporters.pytest_reporter import PyTestHandshakeReporter
+from httpx import Client, MockTransport, Response
+from types import SimpleNamespace
+from pytest import mark, fixture
+from json import loads, dumps
+from uuid import uuid4
+from sqlite3 import connect
+from subprocess import run
+from typing import Dict, List
+from handshake.services.DBService.shared import db_path
+
+pytest_plugins = ("pytester",)
+
+
+class TestParseConfig:
+    @mark.parametrize(
+        "value, expected",
+        (
+            ("", True),
+            ("0", False),
+            ("false", False),
+            ("False", False),
+            ("no", False),
+            ("1", True),
+            ("true", True),
+            ("yes", True),
+        ),
+    )
+    def test_write_behind(self, pytester, value, expected):
+        pytester.makeini(f"""
+            [pytest]
+            handshake_write_behind = {value}
+            handshake_batch_size = 10
+            """)
+        reporter = CommonReporter()
+        try:
+            reporter.parse_config(SimpleNamespace(config=pytester.parseconfigure()))
+            assert reporter.write_behind is expected
+            assert reporter.batch_size == 10
+        finally:
+            reporter.postman.shutdown()
+
+    def test_flags(self):
+        assert not is_enabled(" Off ")
+        assert is_enabled("On")
+
+
+@fixture()
+def sent():
+    return []
+
+
+@fixture()
+def reporter(sent):
+    # responds to the requests sent by the reporter, as the server would
+    def respond(request):
+        events = [loads(line) for line in request.content.decode().splitlines()]
+        sent.append(events)
+        if any(
+            isinstance(event["payload"], dict) and event["payload"].get("invalid")
+            for event in events
+        ):
+            return Response(400, json=dict(index=0, errors=["not valid"]))
+        return Response(
+            201,
+            json=dict(
+                refs={
+                    event["save_as"]: str(uuid4())
+                    for event in events
+                    if event["save_as"]
+                },
+                results=[201] * len(events),
+            ),
+        )
+
+    reporter = CommonReporter()
+    reporter.batch_size = 3
+    # batches are flushed only when they are full or by the test
+    reporter.batch_linger = 60
+    reporter.client = Client(transport=MockTransport(respond))
+    reporter.postman = Dispatcher(4)
+    yield reporter
+    reporter.batch_timer and reporter.batch_timer.cancel()
+    reporter.postman.shutdown()
+
+
+class TestCoalescing:
+    @staticmethod
+    def send(reporter, key, index, **payload):
+        reporter.call(
+            "sample", True, "Suite", dict(key=key, index=index, **payload), key=key
+        )
+
+    def test_order_per_lane(self, reporter, sent):
+        for index in range(6):
+            for key in ("a", "b"):
+                self.send(reporter, key, index)
+        reporter.postman.shutdown()
+
+        # each batch is of a single lane, and was full
+        assert len(sent) == 4
+        for key in ("a", "b"):
+            batches = [events for events in sent if events[0]["payload"]["key"] == key]
+            assert all(
+                event["payload"]["key"] == key for events in batches for event in events
+            )
+            assert [
+                event["payload"]["index"] for events in batches for event in events
+            ] == list(range(6))
+
+    def test_keyless_call_is_a_barrier(self, reporter, sent):
+        self.send(reporter, "a", 0)
+        self.send(reporter, "b", 0)
+        self.send(reporter, None, 0)
+        self.send(reporter, "a", 1)
+        reporter.flush_batch()
+        reporter.postman.shutdown()
+
+        # batches queued before were flushed by the call without key, though they were not full
+        keys = [[event["payload"]["key"] for event in events] for events in sent]
+        assert sorted(keys[:2]) == [["a"], ["b"]]
+        assert keys[2:] == [[None], ["a"]]
+
+    def test_rejected_batch_is_sent_one_by_one(self, reporter, sent):
+        noted = []
+        for index in range(3):
+            reporter.call(
+                "sample",
+                True,
+                "Suite",
+                dict(key="a", index=index, invalid=index == 1),
+                save_it=f"suite-{index}",
+                key="a",
+                on_sent=lambda: noted.append(True),
+            )
+        reporter.postman.shutdown()
+
+        assert [len(events) for events in sent] == [3, 1, 1, 1]
+        # only the faulty one is missed
+        assert set(reporter.note.keys()) == {"suite-0", "suite-2"}
+        assert len(noted) == 3
+
+
+class TestAttachments:
+    @staticmethod
+    def attach(reporter, index):
+        attachment = dict(
+            entity_id="a", type="ASSERT", title=f"assertion-{index}", value="passed"
+        )
+        reporter.add_attachment(attachment)
+        return len(dumps(attachment))
+
+    def test_held_till_cap(self, reporter, sent):
+        reporter.attachments_linger = 60
+        size = self.attach(reporter, 0)
+        reporter.attachments_cap = 3 * size
+
+        for index in range(1, 3):
+            self.attach(reporter, index)
+        # held, as they are within the cap
+        assert not sent
+        assert reporter.attachments_held == 3 * size
+
+        # exceeds the cap, so the held ones are sent first
+        self.attach(reporter, 3)
+        assert [len(events[0]["payload"]) for events in sent] == [3]
+        assert reporter.attachments_held == size
+
+        # rest are sent at the end of the session
+        reporter.close_resources(bye=False)
+        assert [
+            event["payload"]
+            for events in sent
+            for event in events
+            if event["event"] == "create/Attachments"
+        ][-1][0]["title"] == "assertion-3"
+        assert reporter.attachments_held == 0
+        assert not reporter.attachments
+
+
+@fixture()
+def report(pytester):
+    # runs the tests with the reporter, which saves the results in the pytester's folder
+    def run_tests(*args, **ini):
+        options = (
+            dict(
+                save_results_in="TestResults",
+                handshake_mode="embedded",
+                # pytester's folder names are longer than what a project name can be
+                projectName="sample",
+            )
+            | ini
+        )
+        pytester.makeini(
+            "\n".join(
+                [
+                    "[pytest]",
+                    *(f"{option} = {value}" for option, value in options.items()),
+                ]
+            )
+        )
+        return pytester.runpytest_subprocess(*args)
+
+    return run_tests
+
+
+def results_of(pytester, results: str = "TestResults"):
+    return connect(db_path(pytester.path / results))
+
+
+class TestFixtures:
+    def test_module_fixture_noted_once(self, pytester, report):
+        pytester.makepyfile(test_sample="""
+            from pytest import fixture
+
+            @fixture(scope="module")
+            def shared():
+                return 1
+
+            def test_first(shared):
+                assert shared
+
+            def test_second(shared):
+                assert shared
+
+            def test_third(shared):
+                assert shared
+            """)
+        report().assert_outcomes(passed=3)
+
+        with results_of(pytester) as connection:
+            logs = connection.execute(
+                "select s.title, s.suiteType, l.feed from entitylogbase l"
+                " join suitebase s on s.suiteID = l.entity_id where l.title = 'shared'"
+            ).fetchall()
+        # noted once in the module, along with the tests which used it
+        assert len(logs) == 1
+        title, suite_type, feed = logs[0]
+        assert (title, suite_type) == ("test_sample.py", "SUITE")
+        assert loads(feed)["usedBy"] == [
+            f"test_sample.py::{test}"
+            for test in ("test_first", "test_second", "test_third")
+        ]
+
+    def test_fixtures_are_released(self, pytester, report):
+        pytester.makeconftest("""
+            from handshake.reporters.pytest_hooks import reporter
+
+            def pytest_unconfigure(config):
+                config.rootpath.joinpath("pending.txt").write_text(str(len(reporter.fixtures)))
+            """)
+        pytester.makepyfile(test_sample="""
+            from pytest import fixture
+
+            @fixture(scope="module")
+            def shared():
+                return 1
+
+            @fixture(params=(1, 2))
+            def each(request):
+                return request.param
+
+            def test_first(shared, each, request, tmp_path):
+                assert shared
+
+            def test_second(shared):
+                assert shared
+            """)
+        report().assert_outcomes(passed=3)
+        # including the ones that have no definition, like request
+        assert (pytester.path / "pending.txt").read_text() == "0"
+
+
+class TestAssertions:
+    def test_capture_policy(self):
+        reporter = PyTestHandshakeReporter()
+        reporter.assertions_per_test = 2
+        reporter.assertions_cap = 3
+
+        captured = [
+            reporter.capture_assertion(test) for test in ("a", "a", "a", "b", "b")
+        ]
+        assert captured == [True, True, False, True, False]
+        assert reporter.assertion_counts == dict(a=[3, 2], b=[2, 1])
+
+        reporter.assertions = "failures"
+        assert not reporter.capture_assertion("c")
+
+    def test_unknown_policy(self, pytester):
+        pytester.makeini("""
+            [pytest]
+            handshake_assertions = passing
+            """)
+        reporter = PyTestHandshakeReporter()
+        try:
+            reporter.parse_config(SimpleNamespace(config=pytester.parseconfigure()))
+            assert reporter.assertions == "all"
+        finally:
+            reporter.postman.shutdown()
+
+    def test_cap_is_shared_among_workers(self):
+        shares = []
+        for index in range(3):
+            reporter = PyTestHandshakeReporter()
+            reporter.assertions_cap = 7
+            reporter.share_assertions_cap(dict(workerid=f"gw{index}", workercount=3))
+            shares.append(reporter.assertions_cap)
+        assert shares == [3, 2, 2]
+
+        # workers left without a share, skip the passing assertions
+        reporter = PyTestHandshakeReporter()
+        reporter.assertions_cap = 2
+        reporter.share_assertions_cap(dict(workerid="gw2", workercount=3))
+        assert (reporter.assertions_cap, reporter.assertions) == (0, "failures")
+
+    def test_elided_assertions(self, pytester, report):
+        pytester.makepyfile(test_sample="""
+            def test_many():
+                for value in range(5):
+                    assert value < 5
+
+            def test_few():
+                assert True
+            """)
+        report(
+            enable_assertion_pass_hook="true", handshake_assertions_per_test=2
+        ).assert_outcomes(passed=2)
+
+        with results_of(pytester) as connection:
+            captured = dict(
+                connection.execute(
+                    "select s.title, count(*) from assertbase a"
+                    " join suitebase s on s.suiteID = a.entity_id group by s.title"
+                ).fetchall()
+            )
+            elided = connection.execute(
+                "select s.title, l.feed from entitylogbase l join suitebase s"
+                " on s.suiteID = l.entity_id where l.title = 'Assertions elided'"
+            ).fetchall()
+            summary = connection.execute(
+                "select feed from testlogbase where title = 'Assertions elided'"
+            ).fetchall()
+
+        assert captured == dict(test_many=2, test_few=1)
+        # noted only in the test whose assertions were elided
+        assert [(title, loads(feed)) for title, feed in elided] == [
+            ("test_many", dict(passed=5, captured=2, elided=3))
+        ]
+        assert [loads(feed) for feed, in summary] == [
+            dict(passed=6, captured=3, elided=3)
+        ]
+
+
+class TestModes:
+    sample = """
+        from pytest import fixture, mark, skip
+
+        @fixture(scope="module")
+        def shared():
+            return 1
+
+        class TestSample:
+            @mark.parametrize("value", (1, 2))
+            def test_passed(self, shared, value):
+                assert value
+
+            def test_failed(self):
+                assert False
+
+            def test_skipped(self):
+                skip("not now")
+
+        def test_outside():
+            assert True
+        """
+
+    @staticmethod
+    def snapshot(connection) -> Dict[str, List]:
+        # results without their ids and timings, so that they can be compared across the runs
+        return dict(
+            runs=connection.execute(
+                "select projectName, standing from runbase"
+            ).fetchall(),
+            sessions=connection.execute("select count(*) from sessionbase").fetchall(),
+            entities=connection.execute(
+                "select s.title, s.suiteType, s.standing, p.title from suitebase s"
+                " left join suitebase p on p.suiteID = s.parent order by 1, 2, 3, 4"
+            ).fetchall(),
+            logs=connection.execute(
+                "select title from testlogbase union all"
+                " select title from entitylogbase order by 1"
+            ).fetchall(),
+        )
+
+    def test_embedded(self, pytester, report):
+        pytester.makepyfile(test_sample=self.sample)
+        report().assert_outcomes(passed=3, failed=1, skipped=1)
+
+        with results_of(pytester) as connection:
+            results = self.snapshot(connection)
+
+        assert results["runs"] == [("sample", "PENDING")]
+        assert results["sessions"] == [(1,)]
+        tests = {
+            title: standing
+            for title, suite_type, standing, _ in results["entities"]
+            if suite_type == "TEST"
+        }
+        assert tests == {
+            "test_passed[1]": "PASSED",
+            "test_passed[2]": "PASSED",
+            "test_failed": "FAILED",
+            "test_skipped": "SKIPPED",
+            "test_outside": "PASSED",
+        }
+        assert ("TestSample", "SUITE", "YET_TO_CALC", "test_sample.py") in results[
+            "entities"
+        ]
+        assert ("shared",) in results["logs"]
+
+    def test_ingested_journal_matches_server(self, pytester, report):
+        pytester.makepyfile(test_sample=self.sample)
+        report(handshake_mode="journal", save_results_in="Journal").assert_outcomes(
+            passed=3, failed=1, skipped=1
+        )
+        ingested = run(
+            f'handshake ingest "{pytester.path / "Journal" / "handshake.journal"}"'
+            f' "{pytester.path / "Ingested"}" "{pytester.path}"',
+            shell=True,
+        )
+        assert ingested.returncode == 0
+
+        report(
+            handshake_mode="server", save_results_in="Served", handshake_port=6984
+        ).assert_outcomes(passed=3, failed=1, skipped=1)
+
+        with results_of(pytester, "Ingested") as connection:
+            from_journal = self.snapshot(connection)
+        with results_of(pytester, "Served") as connection:
+            from_server = self.snapshot(connection)
+        assert from_journal == from_server
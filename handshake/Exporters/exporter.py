@@ -1,6 +1,6 @@
 from ansitohtml.parser import Parser
 from loguru import logger
-from typing import Optional
+from typing import Optional, Set
 from abc import ABC, abstractmethod
 from handshake.services.DBService.models.attachmentBase import AssertBase
 from handshake.services.DBService.models.result_base import (
@@ -30,6 +30,8 @@ class Exporter(ABC):
         self.converter = Parser()
         self.dev_run = dev_run
         self.export_mode = dict(json=False, excel=False)
+        # if set, only these test runs are exported again, refer: Scheduler.start
+        self.changed_runs: Optional[Set[str]] = None
 
     def convert_from_ansi_to_html(self, refer_from: dict, key: str):
         refer_from[key] = self.converter.parse(refer_from[key])
@@ -52,6 +54,9 @@ class Exporter(ABC):
     @abstractmethod
     def prepare(self): ...
 
+    def needs_export(self, run_id: str) -> bool:
+        return self.changed_runs is None or run_id in self.changed_runs
+
     async def export_runs_page(
         self, run_id: Optional[str] = None, skip_project_summary=False
     ):
@@ -87,6 +92,8 @@ WHERE rb.ended <> '' order by rb.started;
                 run = dict(row)
                 test_run = SubSetOfRunBaseRequiredForProjectExport.model_validate(run)
                 runs.append(run)
+                # summary is exported for every run, as their indexes change with the new runs
+                export_run_page = self.needs_export(test_run.testID)
 
                 logger.info(
                     "Exporting runs page for {} - {}",
@@ -122,10 +129,11 @@ WHERE rb.ended <> '' order by rb.started;
                         )
                     )
 
-                exporter.create_task(
-                    self.export_run_page(test_run.testID),
-                    name="export-more-for-run-page",
-                )
+                if export_run_page:
+                    exporter.create_task(
+                        self.export_run_page(test_run.testID),
+                        name="export-more-for-run-page",
+                    )
 
             if not skip_project_summary:
                 exporter.create_task(
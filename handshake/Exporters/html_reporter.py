@@ -27,12 +27,12 @@ class HTMLExporter(JsonExporter):
         self.html_export_in = save_in
 
     def prepare(self):
-        # we reset entire export folder
-        if self.html_export_in.exists():
+        # we reset entire export folder, unless only the changed runs are exported
+        if not self.html_export_in.exists():
+            self.html_export_in.mkdir()
+        elif self.changed_runs is None:
             logger.debug("removing previous results")
             rmtree(self.save_in)
-        else:
-            self.html_export_in.mkdir()
 
         self.fetch = not self.template.exists()
         super().prepare()
@@ -33,6 +33,11 @@ class JsonExporter(Exporter):
         self.db_path: Path = db_path
 
     def prepare(self):
+        if self.changed_runs is not None and self.save_in.exists():
+            for run_id in self.changed_runs:
+                rmtree(self.save_in / run_id, ignore_errors=True)
+            return
+
         # we reset entire export folder
         if self.save_in.exists():
             logger.debug("removing previous results")
@@ -44,8 +49,13 @@ class JsonExporter(Exporter):
     def completed(self):
         logger.info("Export Completed, saved in {}", self.save_in)
 
+    def needs_export(self, run_id: str) -> bool:
+        return super().needs_export(run_id) or not (self.save_in / run_id).exists()
+
     async def export_test_run_summary(self, test_id: str, summary):
-        await mkdir(self.save_in / str(test_id))
+        not (self.save_in / str(test_id)).exists() and await mkdir(
+            self.save_in / str(test_id)
+        )
         await write_as_plain_string(
             self.save_in / str(test_id) / EXPORT_RUN_PAGE_FILE_NAME,
             dumps(summary),
@@ -0,0 +1,72 @@
+from concurrent.futures.thread import ThreadPoolExecutor
+from concurrent.futures import Future, wait
+from threading import Lock
+from typing import Optional, List, Callable
+from zlib import crc32
+
+
+class Dispatcher:
+    """
+    sends the reporter's requests through N lanes (each lane is a single thread).
+    requests submitted with the same key are sent in the order they were submitted,
+    while requests of unrelated keys are sent in parallel.
+
+    requests submitted without a key act as a barrier, they are sent after every request submitted before them
+    and every request submitted after them waits for them.
+    """
+
+    def __init__(self, lanes: int = 4):
+        self.lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"post-{lane}-")
+            for lane in range(max(lanes, 1))
+        ]
+        self.lock = Lock()
+        self.last_in_lane: List[Optional[Future]] = [None for _ in self.lanes]
+        self.barrier: Optional[Future] = None
+        # number of requests yet to be sent
+        self.pending = 0
+        self.max_pending = 0
+
+    def lane_of(self, key: str) -> int:
+        # crc32 instead of hash, so that the lanes do not change across runs
+        return crc32(key.encode()) % len(self.lanes)
+
+    @staticmethod
+    def after(waits: List[Future], fn: Callable, *args, **kwargs):
+        # NOTE: we only wait for the futures submitted before this one, so lanes cannot block each other forever
+        waits and wait(waits)
+        return fn(*args, **kwargs)
+
+    def submit(
+        self, fn: Callable, *args, key: Optional[str] = None, **kwargs
+    ) -> Future:
+        with self.lock:
+            if key is None:
+                waits = [_ for _ in self.last_in_lane if _]
+                lane = 0
+            else:
+                waits = [self.barrier] if self.barrier else []
+                lane = self.lane_of(key)
+
+            future = self.lanes[lane].submit(self.after, waits, fn, *args, **kwargs)
+            self.last_in_lane[lane] = future
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+
+            if key is None:
+                self.barrier = future
+                self.last_in_lane = [
+                    future if _ == lane else None for _ in range(len(self.lanes))
+                ]
+
+        # outside the lock, as the callback is called right away if the request was already sent
+        future.add_done_callback(self.sent)
+        return future
+
+    def sent(self, _: Future):
+        with self.lock:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        for lane in self.lanes:
+            lane.shutdown(wait=wait, cancel_futures=cancel_futures)
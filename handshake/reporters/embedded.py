@@ -0,0 +1,173 @@
+from handshake.services.DBService.lifecycle import (
+    init_tortoise_orm,
+    close_connection,
+    create_run,
+)
+from handshake.services.DBService.shared import db_path
+from handshake.services.DBService.ingest import apply_event, ingest_transaction
+from handshake.services.DBService.models.attachmentBase import (
+    LogType,
+    TestLogBase,
+    LogGeneratedBy,
+)
+from threading import Thread, Event
+from queue import SimpleQueue, Empty
+from asyncio import run
+from typing import Optional, Dict, List, Union, Callable, Tuple
+from pathlib import Path
+from loguru import logger
+
+
+class EmbeddedWriter(Thread):
+    """
+    writes the reporter's events straight into the TestResults from a background thread,
+    so that we need not start the handshake-server and send them through HTTP.
+
+    events are of form: {event, payload}, where event is the path of the endpoint it replaces, refer: IngestEvent.
+    events queued together are written in a single transaction.
+
+    NOTE: Tortoise is initialized in this process, so avoid this mode if your tests use Tortoise themselves.
+    if test_id is provided, events are written into that test run, instead of creating a new one.
+    events with a reply are passed to on_written (along with the status and the note) once they are committed,
+    refer: write_events
+    """
+
+    def __init__(
+        self,
+        project_name: str,
+        results: Union[str, Path],
+        config_path: Optional[Union[str, Path]] = None,
+        batch_size: int = 100,
+        test_id: Optional[str] = None,
+        on_written: Optional[Callable[[Tuple, int, str], None]] = None,
+    ):
+        super().__init__(name="handshake-writer", daemon=True)
+        self.project_name = project_name
+        self.results = Path(results)
+        self.config_path = config_path
+        self.batch_size = max(batch_size, 1)
+        self.queue: SimpleQueue[Optional[Dict]] = SimpleQueue()
+        self.ready = Event()
+        self.failed = False
+        self.test_id: Optional[str] = test_id
+        self.on_written = on_written
+
+    def put(self, event: Dict):
+        not self.failed and self.queue.put(event)
+
+    def close(self, timeout: Optional[float] = None):
+        self.queue.put(None)
+        self.join(timeout)
+
+    def run(self):
+        # writer has its own event loop, so it does not interfere with the tests
+        run(self.serve())
+
+    async def serve(self):
+        try:
+            self.results.mkdir(exist_ok=True)
+            await init_tortoise_orm(
+                db_path(self.results),
+                migrate=not self.test_id,
+                config_path=self.config_path,
+                avoid_config=bool(self.test_id),
+                profile="fast-ingest",
+            )
+            self.test_id = self.test_id or await create_run(self.project_name)
+        except Exception as error:
+            logger.exception("Failed to prepare the TestResults due to {}", error)
+            self.failed = True
+            return
+        finally:
+            self.ready.set()
+
+        closed = False
+        while not closed:
+            events = [self.queue.get()]
+            while events[-1] is not None and len(events) < self.batch_size:
+                try:
+                    events.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            closed = events[-1] is None
+            try:
+                await self.write([_ for _ in events if _ is not None])
+            except Exception as error:
+                logger.exception(
+                    "Failed to write {} events due to {}", len(events), error
+                )
+
+        await close_connection()
+
+    async def write(self, events: List[Dict]):
+        if not events:
+            return
+        try:
+            async with ingest_transaction() as connection:
+                written = [
+                    (event, await self.apply(event, connection)) for event in events
+                ]
+        except Exception as error:
+            if len(events) == 1:
+                self.reply(events[0], 500, repr(error))
+                return await self.note_failure(events[0], error)
+            # writing them one by one, so that we only miss the faulty one
+            for event in events:
+                await self.write([event])
+            return
+
+        for event, (status, note) in written:
+            self.reply(event, status, note)
+
+    def reply(self, event: Dict, status: int, note):
+        if self.on_written and event.get("reply"):
+            self.on_written(event["reply"], status, note)
+
+    async def apply(self, event: Dict, connection) -> Tuple[int, Union[str, List]]:
+        status, note = await apply_event(
+            event["event"], event["payload"], self.test_id, connection
+        )
+        if status // 100 != 2:
+            logger.warning(
+                "Failed to write event: {}, status: {}", event["event"], status
+            )
+
+        if isinstance(note, list):
+            for attachment, error in note:
+                await self.attach_log(
+                    dict(payload=attachment, reason=error.json()),
+                    LogType.WARN,
+                    f"Failed to write the attachment for: {event['event']}, we will miss this attachment",
+                    event["event"],
+                    connection,
+                )
+        return status, note
+
+    async def note_failure(self, event: Dict, error: Exception):
+        logger.error("Failed to write event: {} due to {}", event["event"], error)
+        await self.attach_log(
+            dict(payload=event["payload"], reason=repr(error)),
+            LogType.ERROR,
+            f"Failed to write the event: {event['event']}, will affect the test run",
+            event["event"],
+        )
+
+    async def attach_log(
+        self,
+        feed: Dict,
+        log_type: LogType,
+        description: str,
+        generated_by: str,
+        connection=None,
+    ):
+        await TestLogBase.create(
+            test_id=self.test_id,
+            type=log_type,
+            feed=feed,
+            title=f"caught {log_type} while writing the results",
+            message=description,
+            generatedByGroup=LogGeneratedBy.API,
+            generatedBy=generated_by,
+            using_db=connection,
+        )
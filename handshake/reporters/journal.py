@@ -0,0 +1,67 @@
+from json import dumps, loads
+from pathlib import Path
+from struct import Struct
+from threading import Lock
+from typing import Dict, Iterator, Union, Optional
+from loguru import logger
+
+# each record is a JSON document prefixed with its length (4 bytes, big endian)
+# first record is the header: {version, projectName}, rest are the events of form: {event, payload}
+JOURNAL_VERSION = 1
+length_prefix = Struct(">I")
+
+
+class JournalWriter:
+    """
+    appends the reporter's events to a local journal file, so the test run does not wait for any db writes.
+    it can be loaded later into the TestResults with: handshake ingest <journal> <COLLECTION_PATH>
+    """
+
+    def __init__(self, path: Union[str, Path], project_name: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.failed = False
+        self.file = self.path.open("wb", buffering=1 << 16)
+        self.append(dict(version=JOURNAL_VERSION, projectName=project_name))
+
+    def append(self, record: Dict):
+        encoded = dumps(record, default=str).encode("utf-8")
+        with self.lock:
+            self.file.write(length_prefix.pack(len(encoded)))
+            self.file.write(encoded)
+            # not syncing it, we only need the records to be with the os, if the runner crashes
+            self.file.flush()
+
+    def put(self, event: Dict):
+        try:
+            self.append(event)
+        except Exception as error:
+            logger.exception("Failed to write the event into the journal: {}", error)
+            self.failed = True
+
+    def close(self, timeout: Optional[float] = None):
+        with self.lock:
+            self.file.close()
+
+
+def read_journal(path: Union[str, Path]) -> Iterator[Dict]:
+    """
+    yields the records of the journal, header first.
+    incomplete record at the end (if the runner was killed while writing it) is skipped.
+    """
+    with Path(path).open("rb") as journal:
+        while True:
+            prefix = journal.read(length_prefix.size)
+            if not prefix:
+                return
+            if len(prefix) < length_prefix.size:
+                break
+
+            (size,) = length_prefix.unpack(prefix)
+            record = journal.read(size)
+            if len(record) < size:
+                break
+            yield loads(record)
+
+    logger.warning("Skipping the incomplete record at the end of the journal: {}", path)
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Callable
+
+
+def percentile(values: List[float], at: float) -> float:
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * at))]
+
+
+class Overhead:
+    """
+    notes the time the reporter adds to the test session (in milli-seconds) and how its requests went.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.hooks: Dict[str, List[float]] = dict()  # hook -> [calls, total]
+        self.latencies: List[float] = []
+        self.bytes_sent = 0
+        self.failed = 0
+        self.max_queue = 0
+        self.closing = 0.0
+
+    def timed(self, hook: Callable):
+        @wraps(hook)
+        def note_time(*args, **kwargs):
+            with self.measure(hook.__name__):
+                return hook(*args, **kwargs)
+
+        return note_time
+
+    @contextmanager
+    def measure(self, name: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            taken = (perf_counter() - started) * 1e3
+            with self.lock:
+                noted = self.hooks.setdefault(name, [0, 0.0])
+                noted[0] += 1
+                noted[1] += taken
+
+    def note_request(self, latency: float, sent: int, failed: bool):
+        with self.lock:
+            self.latencies.append(latency * 1e3)
+            self.bytes_sent += sent
+            self.failed += int(failed)
+
+    def note_queue(self, depth: int):
+        self.max_queue = max(self.max_queue, depth)
+
+    def summary(self) -> Dict:
+        with self.lock:
+            latencies = list(self.latencies)
+            hooks = {
+                name: dict(calls=calls, total=round(total, 3))
+                for name, (calls, total) in self.hooks.items()
+            }
+
+        return dict(
+            hooks=hooks,
+            inHooks=round(sum(_["total"] for _ in hooks.values()), 3),
+            requests=len(latencies),
+            failed=self.failed,
+            bytesSent=self.bytes_sent,
+            maxQueue=self.max_queue,
+            latency=dict(
+                p50=round(percentile(latencies, 0.5), 3),
+                p90=round(percentile(latencies, 0.9), 3),
+                p99=round(percentile(latencies, 0.99), 3),
+                max=round(max(latencies, default=0), 3),
+            ),
+            closing=round(self.closing, 3),
+        )
+
+    def describe(self) -> str:
+        summary = self.summary()
+        latency = summary["latency"]
+        return (
+            f"Handshake took {summary['inHooks']:.0f} ms inside the hooks and {summary['closing']:.0f} ms to close."
+            f" requests: {summary['requests']} (failed: {summary['failed']}), sent: {summary['bytesSent']} bytes,"
+            f" max queued: {summary['maxQueue']},"
+            f" latency (ms) p50: {latency['p50']}, p90: {latency['p90']}, p99: {latency['p99']}, max: {latency['max']}"
+        )
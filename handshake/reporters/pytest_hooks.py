@@ -1,10 +1,21 @@
-from pytest import Session, Item
+from pytest import Session, Item, hookimpl
 from _pytest.fixtures import FixtureDef, FixtureValue, SubRequest
 from datetime import datetime
 from loguru import logger
-from handshake.reporters.pytest_reporter import PyTestHandshakeReporter, PointToAtPhase
+from handshake.reporters.pytest_reporter import (
+    PyTestHandshakeReporter,
+    PointToAtPhase,
+    ini_options,
+)
 
 reporter = PyTestHandshakeReporter()
+# notes the time spent inside each of the hooks
+timed = reporter.overhead.timed
+
+
+def pytest_addoption(parser):
+    for name, about in ini_options.items():
+        parser.addini(name, about)
 
 
 def pytest_configure(config):
@@ -14,39 +25,80 @@ def pytest_configure(config):
     )
 
 
+@hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # pytest-xdist: workers report to the server started by the controller
+    reporter.share_namespace(node.workerinput)
+
+
+@timed
 def pytest_sessionstart(session: Session):
     if reporter.parse_config(session):
         return
-    reporter.start_collection(session)
-    reporter.create_session(datetime.now())
-    reporter.put_test_config()
+    if reporter.is_worker:
+        reporter.connect()
+    else:
+        reporter.start_collection(session)
+
+    # controller does not run any tests, so it has no session of its own
+    if not reporter.is_controller:
+        reporter.create_session(datetime.now())
+        if not reporter.is_worker:
+            reporter.collected = []
+    if not reporter.is_worker:
+        reporter.put_test_config()
 
 
+@timed
 def pytest_itemcollected(item: Item):
-    reporter.create_test_entity(item)
+    # every worker collects all the tests, so they register only the tests they run
+    if not reporter.is_worker:
+        reporter.create_test_entity(item)
+
 
+@timed
+def pytest_collection_finish(session: Session):
+    # tests collected are registered at once, before any of them run
+    reporter.register_collected()
 
+
+@hookimpl(tryfirst=True)
+@timed
+def pytest_runtest_protocol(item: Item, nextitem: Item):
+    if reporter.is_worker:
+        reporter.create_test_entity(item)
+
+
+@timed
 def pytest_runtest_logstart(nodeid, location):
-    reporter.update_test_entity_details(None, nodeid)
+    # controller receives the reports of its workers, which were already sent by them
+    if not reporter.is_controller:
+        reporter.update_test_entity_details(None, nodeid)
 
 
+@timed
 def pytest_runtest_setup(item: Item):
     reporter.create_test_entity(item, helper_entity=PointToAtPhase.SETUP)
 
 
+@timed
 def pytest_runtest_call(item: Item):
     reporter.func_args[item.nodeid] = item.funcargs
 
 
+@timed
 def pytest_runtest_logreport(report):
-    reporter.update_test_entity_details(report)
+    if not reporter.is_controller:
+        reporter.update_test_entity_details(report)
 
 
+@timed
 def pytest_runtest_teardown(item: Item, nextitem: Item):
     reporter.create_test_entity(item, helper_entity=PointToAtPhase.TEARDOWN)
 
 
 #
+@timed
 def pytest_assertion_pass(item, lineno, orig, expl):
     try:
         reporter.add_test_assertion(item.nodeid, orig, expl, True)
@@ -54,15 +106,24 @@ def pytest_assertion_pass(item, lineno, orig, expl):
         logger.exception("Unable to add test assertion")
 
 
+@timed
 def pytest_fixture_post_finalizer(
     fixturedef: FixtureDef[FixtureValue], request: SubRequest
 ):
     reporter.note_fixture(fixturedef, request)
 
 
+@timed
 def pytest_sessionfinish(session: Session, exitstatus: int):
+    # in case the collection was interrupted
+    reporter.register_collected()
+    reporter.note_assertions_of_session()
+    if reporter.is_worker:
+        reporter.update_session(session)
+        return reporter.close_resources(bye=False)
+
     force_call = reporter.update_test_status(session, exitstatus)
     if not force_call:
         reporter.mark_suites_for_processing()
-        reporter.update_session(session)
+        not reporter.is_controller and reporter.update_session(session)
     reporter.close_resources()
@@ -1,5 +1,9 @@
 from datetime import datetime
-from handshake.reporters.reporter import CommonReporter, to_acceptable_date_format
+from handshake.reporters.reporter import (
+    CommonReporter,
+    to_acceptable_date_format,
+    ini_options as common_ini_options,
+)
 from handshake.services.DBService.models.types import (
     PydanticModalForCreatingTestRunConfigBase,
     MarkTestRun,
@@ -15,12 +19,15 @@ from handshake.services.DBService.models.enums import (
 from handshake.reporters.markers import meta_data_mark
 from pytest import Session, Item, ExitCode, TestReport
 from platform import platform
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, List
 from threading import Lock
 from enum import StrEnum
 from _pytest.fixtures import FixtureDef, FixtureValue, SubRequest
 from _pytest.nodes import Node
 from pathlib import Path
+from loguru import logger
+from uuid import uuid4
+from random import random
 
 
 def relative_from_session_parent(session: Session, take_relative_for: Path):
@@ -35,11 +42,32 @@ class PointToAtPhase(StrEnum):
     TEARDOWN = "teardown"
 
 
+ini_options = dict(
+    common_ini_options,
+    handshake_assertions="passing assertions to capture: all or failures",
+    handshake_assertions_per_test="captures only the first N assertions of each test",
+    handshake_assertions_sample="fraction of the passing assertions to capture",
+    handshake_assertions_cap="max. number of assertions to capture in the run, shared among the xdist workers",
+)
+
+
 def key(node_id: str, method: Optional[str] = "call"):
     return node_id + "-" + method
 
 
 class PyTestHandshakeReporter(CommonReporter):
+    # passing assertions are captured as per this policy, refer: capture_assertion
+    # all: captures them, failures: skips them (failed assertions are noted as the errors of the test)
+    assertions: str = "all"
+    assertions_per_test: int = (
+        0  # captures only the first N of each test, 0 for no limit
+    )
+    assertions_sample: float = 1.0  # fraction of them to capture
+    assertions_cap: int = (
+        0  # max. number of them to capture in this session, 0 for no limit
+    )
+    assertion_policies = ("all", "failures")
+
     def __init__(self):
         super().__init__()
         self.pointing_to: Optional[Item] = None
@@ -48,9 +76,80 @@ class PyTestHandshakeReporter(CommonReporter):
         self.mark_point = Lock()
         self.passed = 0
         self.started_at = None
-        self.attachments: List[Dict[str, Any]] = []
-        self.fixtures = {}
+        # fixture -> tests that used its current instance, released once the instance is finalized
+        self.fixtures: Dict[FixtureDef, List[str]] = {}
         self.func_args = {}
+        # under pytest-xdist, controller owns the run and the server while each worker owns its session
+        self.is_worker = False
+        self.is_controller = False
+        self.max_instances = 1
+        self.tests = 0
+        # test -> [passing assertions, captured assertions], noted in the test once it is torn down
+        self.assertion_counts: Dict[str, List[int]] = {}
+        self.seen_assertions = 0
+        self.captured_assertions = 0
+        # entities noted while collecting the tests, registered at once when the collection is finished
+        self.collected: Optional[List[Dict]] = None
+
+    def parse_config(self, session: Session):
+        if super().parse_config(session):
+            return True
+
+        assertions = session.config.getini("handshake_assertions")
+        per_test = session.config.getini("handshake_assertions_per_test")
+        sample = session.config.getini("handshake_assertions_sample")
+        cap = session.config.getini("handshake_assertions_cap")
+        self.assertions = assertions if assertions else self.assertions
+        self.assertions_per_test = (
+            int(per_test) if per_test else self.assertions_per_test
+        )
+        self.assertions_sample = float(sample) if sample else self.assertions_sample
+        self.assertions_cap = int(cap) if cap else self.assertions_cap
+        if self.assertions not in self.assertion_policies:
+            logger.warning(
+                "{} is not a valid value for handshake_assertions, expected one of: {}, capturing all of them instead",
+                self.assertions,
+                ", ".join(self.assertion_policies),
+            )
+            self.assertions = "all"
+
+        worker_input = getattr(session.config, "workerinput", None)
+        self.is_worker = worker_input is not None
+        self.is_controller = session.config.pluginmanager.hasplugin("dsession")
+        if self.is_worker:
+            self.namespace = worker_input.get("handshake_namespace")
+            ready = worker_input.get("handshake_ready")
+            self.ready_file = Path(ready) if ready else None
+            self.max_instances = worker_input.get("workercount", 1)
+            self.share_assertions_cap(worker_input)
+        elif self.is_controller:
+            self.max_instances = session.config.getoption("numprocesses", 1) or 1
+
+        if (self.is_worker or self.is_controller) and self.mode != "server":
+            logger.warning(
+                "{} mode is not supported with pytest-xdist, sending results to the server instead",
+                self.mode,
+            )
+            self.mode = "server"
+
+    def share_assertions_cap(self, worker_input: Dict):
+        # cap is for the run, so each worker captures its share of it
+        if not self.assertions_cap:
+            return
+        workers = worker_input.get("workercount", 1)
+        index = int(worker_input.get("workerid", "gw0").removeprefix("gw"))
+        self.assertions_cap = self.assertions_cap // workers + (
+            index < self.assertions_cap % workers
+        )
+        if not self.assertions_cap:
+            # 0 is taken as no limit, so we skip them instead
+            self.assertions = "failures"
+
+    def share_namespace(self, worker_input: Dict):
+        # called by the controller for each of its workers
+        self.namespace = self.namespace or str(uuid4())
+        worker_input["handshake_namespace"] = self.namespace
+        worker_input["handshake_ready"] = str(self.ready_at())
 
     def create_session(self, started: datetime):
         super().create_session(started)
@@ -62,9 +161,16 @@ class PyTestHandshakeReporter(CommonReporter):
                 framework="pytest",
                 platform=platform(),
                 avoidParentSuitesInCount=False,  # since we are counting packages as suites
+                maxInstances=self.max_instances,
             )
         )
 
+    def lane_key(self, note_key: str) -> str:
+        # entities of a test file (its classes, tests and their hooks) are sent through a single lane,
+        # so the parents are registered before their children and hooks can update their parents
+        node_id = note_key.rsplit("-", 1)[0]
+        return node_id.split("::")[0]
+
     def get_key(self, node_id: str, method: Optional[str] = "call"):
         return self.note[key(node_id, method)]
 
@@ -147,16 +253,35 @@ class PyTestHandshakeReporter(CommonReporter):
         if is_suite:
             return
 
-        if hasattr(item, "fixturenames"):
-            for name in item.fixturenames:
-                add_here = self.fixtures.get(name, set())
-                add_here.add(
-                    key(
-                        item.nodeid,
-                        helper_entity if helper_entity else PointToAtPhase.CALL,
-                    )
-                )
-                self.fixtures[name] = add_here
+        if not helper_entity:
+            self.tests += 1
+
+        # tests are set up in the order they run, so they use the current instances of their fixtures
+        if helper_entity == PointToAtPhase.SETUP and hasattr(item, "_fixtureinfo"):
+            for fixturedefs in item._fixtureinfo.name2fixturedefs.values():
+                # pseudo fixtures (like request) have no definition, so they are never finalized
+                if fixturedefs:
+                    # last one is the closest to the test, which overrides the rest
+                    self.fixtures.setdefault(fixturedefs[-1], []).append(item.nodeid)
+
+    def register_test_entity(
+        self, payload: Dict, save_in: str, parent: Optional[str] = None
+    ):
+        if self.collected is None:
+            return super().register_test_entity(payload, save_in, parent)
+
+        # ids are generated by us, so the references are resolved right away
+        payload.update(
+            suiteID=self.generate_id(save_in, shared=True),
+            session_id=self.session,
+            parent=self.note[parent] if parent else "",
+        )
+        self.collected.append(payload)
+
+    def register_collected(self):
+        # parents are noted before their children, refer: create_test_entity
+        collected, self.collected = self.collected, None
+        collected and self.register_test_entities(collected)
 
     def update_test_entity_details(
         self, report: Optional[TestReport] = None, node_id: Optional[str] = None
@@ -213,6 +338,8 @@ class PyTestHandshakeReporter(CommonReporter):
         match when:
             case PointToAtPhase.CALL:
                 self.passed += int(report.passed)
+            case PointToAtPhase.TEARDOWN:
+                self.note_elided_assertions(report.nodeid)
 
         self.update_test_entity(
             payload,
@@ -221,16 +348,18 @@ class PyTestHandshakeReporter(CommonReporter):
 
     def update_session(self, session: Session):
         ended = datetime.now()
+        # workers collect every test, but they only run (and register) a few of them
+        tests = self.tests if self.is_worker else session.testscollected
         self.update_test_session(
             dict(
                 ended=to_acceptable_date_format(ended),
                 entityName="console",
                 entityVersion="-",
                 simplified="console",
-                tests=session.testscollected,
+                tests=tests,
                 failed=session.testsfailed,
                 passed=self.passed,
-                skipped=(session.testscollected - (session.testsfailed + self.passed)),
+                skipped=(tests - (session.testsfailed + self.passed)),
                 duration=(ended - self.started_at).total_seconds() * 1e3,
                 hooks=0,
             )
@@ -260,11 +389,11 @@ class PyTestHandshakeReporter(CommonReporter):
         return force_call
 
     def mark_suites_for_processing(self):
-        return self.postman.submit(
-            self.ensure_mails,
-            self.client.post,
-            self.create_postfix("ScheduleSuites"),
-            False,
+        return self.call(
+            "Marking suites for processing",
+            True,
+            "ScheduleSuites",
+            {},
         )
 
     def add_log(
@@ -274,8 +403,9 @@ class PyTestHandshakeReporter(CommonReporter):
         title: str,
         description: str,
         tags: Optional[List[Tag]] = None,
+        feed: Optional[Dict] = None,
     ):
-        self.attachments.append(
+        self.add_attachment(
             dict(
                 type=AttachmentType.LOG,
                 entity_id=entity_id,
@@ -283,10 +413,12 @@ class PyTestHandshakeReporter(CommonReporter):
                 value=dict(type=log_type),
                 title=title,
                 tags=tags or [],
+                extraValues=feed or {},
             )
         )
 
     def note_fixture(self, fixturedef: FixtureDef[FixtureValue], request: SubRequest):
+        used_by = self.fixtures.pop(fixturedef, [])
         if fixturedef.cached_result is None:
             return
 
@@ -317,29 +449,125 @@ class PyTestHandshakeReporter(CommonReporter):
             request.session.startpath if request.scope == "session" else request.path,
         )
 
-        for add_in in self.fixtures.get(request.fixturename, set()):
-            self.add_log(
+        tags = [
+            dict(  # https://docs.pytest.org/en/stable/explanation/fixtures.html
+                label="fixture",
+                desc=fixture_def,
+            ),
+            dict(label=request.scope, desc=scope_desc),
+            dict(
+                label="saved in",
+                desc=str(save_in if save_in else request.session.startpath),
+            ),
+        ]
+        # noted once per instance, in the entity of its scope (test, class or module)
+        match request.scope:
+            case "function":
+                owner = key(request.node.nodeid)
+            case "class" | "module":
+                with self.check_if_parents_are:
+                    owner = self.identified_parent.get(request.node.nodeid) and key(
+                        request.node.nodeid
+                    )
+            case _:
+                owner = None
+
+        if request.scope == "function" and not used_by:
+            # we only note the instances used by the tests we have registered
+            return
+
+        feed = {} if request.scope == "function" else dict(usedBy=used_by)
+        if owner:
+            return self.add_log(
                 LogType.INFO,
-                entity_id=add_in,
+                entity_id=owner,
                 title=request.fixturename,
-                tags=[
-                    dict(  # https://docs.pytest.org/en/stable/explanation/fixtures.html
-                        label="fixture",
-                        desc=fixture_def,
-                    ),
-                    dict(label=request.scope, desc=scope_desc),
-                    dict(
-                        label="saved in",
-                        desc=str(save_in if save_in else request.session.startpath),
-                    ),
-                ],
+                tags=tags,
                 description=note_desc,
+                feed=feed,
             )
 
-        self.fixtures.get(request.fixturename, set()).clear()
+        # package and session scoped fixtures are noted in the test run
+        return self.call(
+            "Noting the fixture",
+            True,
+            "RunLog",
+            dict(
+                type=LogType.INFO,
+                title=request.fixturename,
+                message=note_desc,
+                feed=feed,
+                tags=tags,
+                generatedBy="handshake-reporter",
+            ),
+        )
+
+    def describe_assertion_policy(self) -> str:
+        if self.assertions == "failures":
+            return "passing assertions are not captured"
+        return (
+            f"first {self.assertions_per_test or 'all'} per test,"
+            f" sampled at {self.assertions_sample},"
+            f" at most {self.assertions_cap or 'all'} per session"
+        )
+
+    def capture_assertion(self, node_id: str) -> bool:
+        # call it with mark_point
+        counts = self.assertion_counts.setdefault(node_id, [0, 0])
+        counts[0] += 1
+        self.seen_assertions += 1
+
+        if (
+            self.assertions == "failures"
+            or (self.assertions_per_test and counts[1] >= self.assertions_per_test)
+            or (self.assertions_cap and self.captured_assertions >= self.assertions_cap)
+            or (self.assertions_sample < 1 and random() >= self.assertions_sample)
+        ):
+            return False
+
+        counts[1] += 1
+        self.captured_assertions += 1
+        return True
+
+    def note_elided_assertions(self, node_id: str):
+        with self.mark_point:
+            seen, captured = self.assertion_counts.pop(node_id, (0, 0))
+        if seen == captured:
+            return
+        self.add_log(
+            LogType.INFO,
+            key(node_id),
+            "Assertions elided",
+            f"{seen - captured} of {seen} passing assertions were not captured, "
+            f"as per the policy: {self.describe_assertion_policy()}",
+            feed=dict(passed=seen, captured=captured, elided=seen - captured),
+        )
+
+    def note_assertions_of_session(self):
+        if self.seen_assertions == self.captured_assertions:
+            return
+        return self.call(
+            "Noting the assertions of this session",
+            True,
+            "RunLog",
+            dict(
+                type=LogType.INFO,
+                title="Assertions elided",
+                message=f"{self.seen_assertions - self.captured_assertions} of {self.seen_assertions} "
+                f"passing assertions were not captured, as per the policy: {self.describe_assertion_policy()}",
+                feed=dict(
+                    passed=self.seen_assertions,
+                    captured=self.captured_assertions,
+                    elided=self.seen_assertions - self.captured_assertions,
+                ),
+                generatedBy="handshake-reporter",
+            ),
+        )
 
     def add_test_assertion(self, node_id: str, title: str, message: str, passed: bool):
         with self.mark_point:
+            if passed and not self.capture_assertion(node_id or self.pointing_to):
+                return
             value = dict(
                 entity_id=key(node_id) if node_id else self.pointing_to,
                 title=title,
@@ -347,4 +575,4 @@ class PyTestHandshakeReporter(CommonReporter):
                 type=AttachmentType.ASSERT,
                 description=message,
             )
-            return self.attachments.append(value)
+            return self.add_attachment(value)
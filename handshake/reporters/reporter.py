@@ -1,7 +1,7 @@
-from httpx import Client
+from httpx import Client, HTTPTransport, Timeout
 from datetime import datetime
 from subprocess import Popen
-from typing import Union, Optional, Dict, List
+from typing import Union, Optional, Dict, List, Tuple, Callable
 from loguru import logger
 from time import sleep
 from sys import stdout, stderr
@@ -11,10 +11,48 @@ from handshake.services.DBService.models.types import (
     MarkTestRun,
     PydanticModalForCreatingTestRunConfigBase,
 )
-from threading import Lock
-from concurrent.futures.thread import ThreadPoolExecutor
+from threading import Lock, Timer, Condition
 from concurrent.futures import Future
-from httpx import Response
+from handshake.reporters.dispatcher import Dispatcher
+from handshake.reporters.embedded import EmbeddedWriter
+from handshake.reporters.journal import JournalWriter
+from handshake.reporters.overhead import Overhead
+from handshake.services.DBService.models.enums import LogType
+from time import perf_counter
+from httpx import Response, HTTPStatusError
+from json import dumps
+from uuid import uuid4, uuid5, UUID
+from functools import partial
+from tempfile import gettempdir
+from handshake.services.Endpoints.encoding import encoders
+
+# ini options read by the reporter (refer: parse_config), registered in pytest_hooks.pytest_addoption
+ini_options = dict(
+    disable_handshakes="disables the handshake reporter",
+    save_results_in="path of the TestResults, relative to the ini file",
+    save_handshake_config_dir="folder with the handshake.json, relative to the ini file",
+    projectName="name of the project, defaults to the name of the root folder",
+    handshake_port="port of the handshake-server",
+    handshake_batch_size="events sent in a single request",
+    handshake_batch_linger="seconds to wait for a batch to fill",
+    handshake_attachments_batch="attachments sent in a single request",
+    handshake_attachments_bytes="bytes worth of attachments sent in a single request",
+    handshake_attachments_linger="seconds to wait for the attachments to fill a request",
+    handshake_attachments_cap="bytes worth of unsent attachments after which the tests are blocked",
+    handshake_lanes="number of lanes the requests are sent through",
+    handshake_socket="unix socket for the handshake-server to listen at, instead of the port",
+    handshake_mode="server, embedded or journal",
+    handshake_journal="path of the journal, relative to the ini file",
+    handshake_ready_timeout="seconds to wait for the handshake-server to be ready",
+    handshake_compression="encoding of the compressed requests: gzip or zstd",
+    handshake_compress_above="requests larger than these many bytes are compressed",
+    handshake_write_behind="handshake-server responds before writing the results, enabled by default",
+)
+
+
+def is_enabled(value: str) -> bool:
+    # flags in the ini file, empty, 0, false, no and off are taken as disabled
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
 
 
 def to_acceptable_date_format(date: datetime):
@@ -26,11 +64,51 @@ class CommonReporter:
     port: str
     url: str
     client: Client
-    collector: Popen
-    postman: ThreadPoolExecutor
+    collector: Optional[Popen] = None
+    postman: Dispatcher
     started: Future
     skip: bool = False
     config_path: Optional[str] = None
+    # unix socket path for the handshake-server to listen at, instead of the port
+    # keep it short, as sanic binds at a longer temporary path before renaming it
+    socket: Optional[str] = None
+    # events are coalesced and sent through /create/Batch,
+    # when batch_size events are queued or batch_linger seconds are passed, whichever is earlier
+    # batch_size <= 1 sends each event in a separate request
+    batch_size: int = 100
+    batch_linger: float = 0.5
+    # requests are sent through these many lanes, refer: Dispatcher
+    lanes: int = 4
+    # attachments are sent when attachments_batch of them or attachments_bytes worth of them are noted,
+    # or when attachments_linger seconds are passed, whichever is earlier
+    # if attachments_cap bytes worth of them are yet to be sent, the tests are blocked until they are sent
+    attachments_batch: int = 500
+    attachments_bytes: int = 1 << 20
+    attachments_linger: float = 1.0
+    attachments_cap: int = 16 << 20
+    # max. seconds to block for the attachments to be sent
+    attachments_block: float = 30
+    # server: sends the events to handshake-server (run-app)
+    # embedded: writes the events from this process itself, refer: EmbeddedWriter
+    # journal: appends the events to a local journal, which can be ingested later, refer: JournalWriter
+    mode: str = "server"
+    journal: Optional[str] = None
+    writer: Optional[Union[EmbeddedWriter, JournalWriter]] = None
+    # processes reporting to the same run share this namespace, so that they generate the same ids for an entity
+    namespace: Optional[str] = None
+    # run-app writes this file once it is ready, so we wait for it instead of polling the server
+    ready_file: Optional[Path] = None
+    ready_timeout: float = 60
+    # batches wait for the write lock on the server, for as long as its busy_timeout, refer: sqlite_profiles
+    response_timeout: float = 30
+    # request bodies larger than compress_above bytes are compressed with this encoding, refer: decode_body
+    # compress_above <= 0 does not compress them
+    compression: str = "gzip"
+    compress_above: int = 64 << 10
+    # run-app responds before writing the results, refer: WriteBehind
+    write_behind: bool = True
+    # max. number of entities registered in a single request, refer: register_test_entities
+    register_chunk: int = 5000
 
     def __init__(self, path: str = "TestResults", port: Union[str, int] = 6969):
         self.note = dict()
@@ -38,7 +116,15 @@ class CommonReporter:
         self.lock_attachments = Lock()
         self.connection_established = False
         self.waiting = Lock()
-        self.attachments: List[Dict] = []
+        self.attachments: List[Tuple[Dict, int]] = []
+        self.attachments_noted = 0  # bytes of the attachments yet to be flushed
+        self.attachments_held = 0  # bytes of the attachments yet to be sent
+        self.attachments_space = Condition()
+        self.attachments_timer: Optional[Timer] = None
+        self.lock_batch = Lock()
+        self.batch: Dict[Optional[str], List[Dict]] = dict()
+        self.batch_timer: Optional[Timer] = None
+        self.overhead = Overhead()
 
     def postfix(self, fix: str):
         return f"{self.url}/{fix}"
@@ -50,8 +136,17 @@ class CommonReporter:
         return self.postfix(f"save/{fix}")
 
     def ensure_mails(
-        self, postman, url, note: Optional[Union[str, False]] = False, **kwargs
+        self,
+        postman,
+        url,
+        note: Optional[Union[str, False]] = False,
+        raise_for: Tuple[int, ...] = (),
+        **kwargs,
     ):
+        # failed requests are only logged, unless they are responded with one of raise_for status
+        started = perf_counter()
+        sent = 0
+        failed = True
         try:
             if kwargs.get("json", False) and kwargs.get("append", False):
                 kwargs["json"] = {
@@ -70,7 +165,9 @@ class CommonReporter:
             for to_pop in ("append", "map_value"):
                 kwargs.pop(to_pop) if to_pop in kwargs else ...
 
-            response: Response = postman(url, **kwargs)
+            started = perf_counter()
+            response: Response = postman(url, **self.encode(kwargs))
+            sent = len(response.request.content)
             if response.status_code // 200 != 1:
                 logger.warning(
                     "Request failed: {}, status: {}. response: {}",
@@ -80,6 +177,7 @@ class CommonReporter:
                 )
 
             response.raise_for_status()
+            failed = False
             if note:
                 self.note[note] = response.text
             return response
@@ -90,25 +188,169 @@ class CommonReporter:
                 kwargs,
                 repr(error),
             )
+            if (
+                isinstance(error, HTTPStatusError)
+                and error.response.status_code in raise_for
+            ):
+                raise
             return False
+        finally:
+            self.overhead.note_request(perf_counter() - started, sent, failed)
+
+    def encode(self, kwargs: Dict) -> Dict:
+        if self.compress_above <= 0:
+            return kwargs
+
+        encoded = dict(kwargs)
+        headers = dict(encoded.get("headers") or {})
+        if "json" in encoded:
+            encoded["content"] = dumps(encoded.pop("json")).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        content = encoded.get("content")
+        if not content or len(content) < self.compress_above:
+            return kwargs
+
+        content = content.encode("utf-8") if isinstance(content, str) else content
+        encoded["content"] = encoders[self.compression](content)
+        headers["Content-Encoding"] = self.compression
+        encoded["headers"] = headers
+        return encoded
+
+    def ensure_batch(self, events: List[Dict]):
+        lines = []
+        for event in events:
+            refer = {}
+            payload = event["payload"]
+            # references that are not yet noted, are expected to be created in this batch itself
+            for refer_as, refer_to in (event.get("append") or {}).items():
+                if refer_to in self.note:
+                    payload[refer_as] = self.note[refer_to]
+                else:
+                    refer[refer_as] = refer_to
+
+            if event.get("map_value"):
+                for change_for in payload:
+                    before = change_for[event["map_value"]]
+                    change_for[event["map_value"]] = self.note.get(before, before)
+
+            lines.append(
+                dumps(
+                    dict(
+                        event=event["event"],
+                        payload=payload,
+                        save_as=event.get("save_as"),
+                        refer=refer,
+                        map_value=event.get("map_value"),
+                    )
+                )
+            )
+
+        try:
+            response = self.ensure_mails(
+                self.client.post,
+                self.create_postfix("Batch"),
+                content="\n".join(lines),
+                headers={"Content-Type": "application/x-ndjson"},
+                # whole batch is rolled back if any of its events is not valid
+                raise_for=(400,) if len(events) > 1 else (),
+            )
+            if response:
+                self.note.update(response.json()["refs"])
+            return response
+        except HTTPStatusError:
+            # sending them one by one, so that we only miss the faulty one
+            logger.warning(
+                "Batch was rejected, sending its {} events one by one", len(events)
+            )
+            for event in events:
+                self.ensure_batch([dict(event, on_sent=None)])
+            return False
+        finally:
+            for event in events:
+                event.get("on_sent") and event["on_sent"]()
+
+    def lane_key(self, note_key: str) -> str:
+        # requests for the entities sharing the lane key are sent in order
+        # override this to keep the related entities (like parent and its children) in a single lane
+        return note_key
+
+    def flush_batch(self, lane: Optional[str] = None):
+        with self.lock_batch:
+            if lane is None and self.batch_timer:
+                self.batch_timer.cancel()
+                self.batch_timer = None
+
+            for to_flush in [lane] if lane else list(self.batch.keys()):
+                events = self.batch.pop(to_flush, None)
+                events and self.postman.submit(self.ensure_batch, events, key=to_flush)
 
     def parse_config(self, session: Session):
-        unregister = session.config.inicfg.get("disable_handshakes")
-        if unregister:
+        unregister = session.config.getini("disable_handshakes")
+        if is_enabled(unregister):
             handshake_plugin = session.config.pluginmanager.get_plugin("handshakes")
             session.config.pluginmanager.unregister(handshake_plugin)
             return True
 
-        rel_path = session.config.inicfg.get("save_results_in")
-        port = session.config.inicfg.get("handshake_port")
-        config_path = session.config.inicfg.get("save_handshake_config_dir")
+        rel_path = session.config.getini("save_results_in")
+        port = session.config.getini("handshake_port")
+        config_path = session.config.getini("save_handshake_config_dir")
+        batch_size = session.config.getini("handshake_batch_size")
+        batch_linger = session.config.getini("handshake_batch_linger")
+        attachments_batch = session.config.getini("handshake_attachments_batch")
+        attachments_bytes = session.config.getini("handshake_attachments_bytes")
+        attachments_linger = session.config.getini("handshake_attachments_linger")
+        attachments_cap = session.config.getini("handshake_attachments_cap")
+        lanes = session.config.getini("handshake_lanes")
+        socket = session.config.getini("handshake_socket")
+        mode = session.config.getini("handshake_mode")
+        journal = session.config.getini("handshake_journal")
+        ready_timeout = session.config.getini("handshake_ready_timeout")
+        compression = session.config.getini("handshake_compression")
+        compress_above = session.config.getini("handshake_compress_above")
+        write_behind = session.config.getini("handshake_write_behind")
         rel_to = Path(session.config.inipath.parent)
 
+        self.batch_size = int(batch_size) if batch_size else self.batch_size
+        self.batch_linger = float(batch_linger) if batch_linger else self.batch_linger
+        self.lanes = int(lanes) if lanes else self.lanes
+        self.attachments_batch = (
+            int(attachments_batch) if attachments_batch else self.attachments_batch
+        )
+        self.attachments_bytes = (
+            int(attachments_bytes) if attachments_bytes else self.attachments_bytes
+        )
+        self.attachments_linger = (
+            float(attachments_linger) if attachments_linger else self.attachments_linger
+        )
+        self.attachments_cap = (
+            int(attachments_cap) if attachments_cap else self.attachments_cap
+        )
+        self.ready_timeout = (
+            float(ready_timeout) if ready_timeout else self.ready_timeout
+        )
+        self.compress_above = (
+            int(compress_above) if compress_above else self.compress_above
+        )
+        self.compression = compression if compression else self.compression
+        self.write_behind = (
+            is_enabled(write_behind) if write_behind else self.write_behind
+        )
+        if self.compression not in encoders:
+            logger.warning(
+                "{} compression is not supported (zstd needs zstandard), using gzip instead",
+                self.compression,
+            )
+            self.compression = "gzip"
+        self.mode = mode if mode else self.mode
+        self.journal = (rel_to / journal).resolve() if journal else None
+
         self.set_context(
             True,
             (rel_to / rel_path).resolve() if rel_path else self.results,
             port if port else self.port,
             (rel_to / config_path).resolve() if config_path else None,
+            (rel_to / socket).resolve() if socket else None,
         )
 
     def set_context(
@@ -117,38 +359,103 @@ class CommonReporter:
         path: str,
         port: Union[str, int],
         config_path: Optional[str] = None,
+        socket: Optional[str] = None,
     ):
         self.results = path
         self.port = str(port)
-        self.client = Client() if set_client else ...
-
-        self.postman = (
-            ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-")
+        self.socket = str(socket) if socket else None
+        self.client = (
+            Client(
+                transport=HTTPTransport(uds=self.socket) if self.socket else None,
+                timeout=Timeout(5, read=self.response_timeout),
+            )
             if set_client
             else ...
         )
-        self.url = f"http://127.0.0.1:{port}"
+
+        self.postman = Dispatcher(self.lanes) if set_client else ...
+        # host is not used by the unix socket transport, but httpx still needs a valid url
+        self.url = "http://localhost" if self.socket else f"http://127.0.0.1:{port}"
         self.config_path = config_path
 
     def start_collection(self, session: Session):
-        project_name = session.config.inicfg.get("projectName") or session.path.name
+        project_name = session.config.getini("projectName") or session.path.name
+        match self.mode:
+            case "embedded":
+                self.writer = EmbeddedWriter(
+                    project_name, self.results, self.config_path, self.batch_size
+                )
+                logger.info("Writing results into {}", self.results)
+                return self.writer.start()
+            case "journal":
+                journal = self.journal or Path(self.results) / "handshake.journal"
+                self.writer = JournalWriter(journal, project_name)
+                logger.info(
+                    "Writing events into {}, please ingest it with: handshake ingest {} {}",
+                    journal,
+                    journal,
+                    self.results,
+                )
+                return
+
         command = (
             f'handshake run-app {project_name} "{self.results}" "{self.config_path}" -p {self.port}'
             if self.config_path
             else f'handshake run-app {project_name} "{self.results}" -p {self.port}'
         )
+        if self.socket:
+            command += f' -u "{self.socket}"'
+        command += f' -r "{self.ready_at()}"'
+        if not self.write_behind:
+            command += " --no-write-behind"
         self.collector = Popen(command, shell=True, stdout=stdout, stderr=stderr)
         logger.info("Starting handshake-server, {}", command)
+        self.connect()
+
+    def ready_at(self) -> Path:
+        self.ready_file = self.ready_file or (
+            Path(gettempdir()) / f"handshake-{uuid4().hex}.ready"
+        )
+        return self.ready_file
+
+    def connect(self):
+        # used directly by the processes which report to a server started by other process
         self.started = self.postman.submit(self.wait_for_connection)
 
     def health_connection(self) -> bool:
-        return self.collector.poll() is None
+        if self.writer:
+            return not self.writer.failed
+        return self.collector is None or self.collector.poll() is None
 
     def set_skip(self, error):
         # logger.error("Skipping Handshake reports, because {}", error)
         self.skip = True
 
+    def wait_for_ready(self, force_call: bool = False):
+        waited_till = perf_counter() + self.ready_timeout
+        with self.waiting:
+            while not self.ready_file.exists():
+                if self.skip and not force_call:
+                    return
+                if not self.health_connection():
+                    return not force_call and self.set_skip(
+                        "Handshake server has closed."
+                    )
+                if perf_counter() > waited_till:
+                    return not force_call and self.set_skip(
+                        f"Handshake server was not ready in {self.ready_timeout} seconds, cancelling reports to send."
+                    )
+                sleep(0.01)
+
+            self.connection_established = True
+            not force_call and logger.debug(
+                "Connection established with handshake server."
+            )
+
     def wait_for_connection(self, retried: int = 1, force_call: bool = False):
+        if self.ready_file:
+            return self.wait_for_ready(force_call)
+
         stack = [retried]
         with self.waiting:
             while stack:
@@ -187,25 +494,105 @@ class CommonReporter:
         save_it: Optional[str] = None,
         map_value: str = None,
         append: Optional[Dict[str, str]] = None,
+        key: Optional[str] = None,
+        on_sent: Optional[Callable[[], None]] = None,
     ):
+        """
+        sends the request through the lane of the provided key (entity's note key),
+        requests without key are sent only after all the requests before them and vice versa.
+        on_sent is called once the request was sent (even if it failed).
+        """
         logger.debug(reason)
-        self.postman.submit(
-            self.ensure_mails,
-            self.client.post if post_it else self.client.put,
-            (self.create_postfix if post_it else self.update_postfix)(postfix),
-            save_it if save_it else False,
-            json=payload,
+        if self.writer:
+            self.writer.put(
+                dict(
+                    event=f"{'create' if post_it else 'save'}/{postfix}",
+                    payload=self.resolve(payload, map_value, append),
+                )
+            )
+            return on_sent and on_sent()
+
+        lane = self.lane_key(key) if key else None
+        if self.batch_size <= 1:
+            future = self.postman.submit(
+                self.ensure_mails,
+                self.client.post if post_it else self.client.put,
+                (self.create_postfix if post_it else self.update_postfix)(postfix),
+                save_it if save_it else False,
+                json=payload,
+                append=append,
+                map_value=map_value,
+                key=lane,
+            )
+            on_sent and future.add_done_callback(lambda _: on_sent())
+            return
+
+        event = dict(
+            event=f"{'create' if post_it else 'save'}/{postfix}",
+            payload=payload,
+            save_as=save_it,
             append=append,
             map_value=map_value,
+            on_sent=on_sent,
         )
 
+        if lane is None:
+            # events queued before must be sent before this
+            self.flush_batch()
+            self.postman.submit(self.ensure_batch, [event])
+            return
+
+        with self.lock_batch:
+            events = self.batch.setdefault(lane, [])
+            events.append(event)
+            flush_now = len(events) >= self.batch_size
+            if not flush_now and not self.batch_timer:
+                self.batch_timer = Timer(self.batch_linger, self.flush_batch)
+                self.batch_timer.daemon = True
+                self.batch_timer.start()
+
+        flush_now and self.flush_batch(lane)
+
+    def resolve(
+        self,
+        payload: Union[Dict, List],
+        map_value: Optional[str] = None,
+        append: Optional[Dict[str, str]] = None,
+    ):
+        # ids are generated by us, so we can refer them right away
+        if append:
+            payload = {
+                **payload,
+                **{
+                    refer_as: self.note.get(refer_to, "")
+                    for refer_as, refer_to in append.items()
+                },
+            }
+        if map_value:
+            for change_for in payload:
+                before = change_for[map_value]
+                change_for[map_value] = self.note.get(before, before)
+        return payload
+
+    def generate_id(self, note_as: str, shared: bool = False) -> str:
+        # ids are generated here, so the requests referring them need not wait for the server's response
+        # shared ids are the same across the processes of the namespace
+        self.note[note_as] = str(
+            uuid5(UUID(self.namespace), note_as)
+            if shared and self.namespace
+            else uuid4()
+        )
+        return self.note[note_as]
+
     def create_session(self, started: datetime):
         return self.call(
             "Creating test session",
             True,
             "Session",
-            dict(started=to_acceptable_date_format(started)),
-            "Session",
+            dict(
+                started=to_acceptable_date_format(started),
+                sessionID=self.generate_id("Session"),
+            ),
         )
 
     @property
@@ -227,40 +614,104 @@ class CommonReporter:
         if parent:
             to_append["parent"] = parent
 
+        payload["suiteID"] = self.generate_id(save_in, shared=True)
         return self.call(
             f"Registering a Test Entity: {payload['title']}",
             True,
             "Suite",
             payload,
-            save_in,
             append=to_append,
+            key=save_in,
         )
 
+    def register_test_entities(self, entities: List[Dict]):
+        # entities (with their ids and references resolved) are registered in chunks, parents first
+        for index in range(0, len(entities), self.register_chunk):
+            chunk = entities[index : index + self.register_chunk]
+            self.call(f"Registering {len(chunk)} Test Entities", True, "Suites", chunk)
+
     def update_test_entity(
         self, payload, node_id: str, punch_in: Optional[bool] = False
     ):
-        self.send_chunk_of_attachments()
         return self.call(
             f"Updating Test Entity: {node_id}",
             False,
             "PunchInSuite" if punch_in else "Suite",
             payload,
             append=dict(suiteID=node_id),
+            key=node_id,
         )
 
+    def add_attachment(self, attachment: Dict):
+        size = len(dumps(attachment, default=str))
+        self.hold_attachments(size)
+
+        with self.lock_attachments:
+            self.attachments.append((attachment, size))
+            self.attachments_noted += size
+            flush_now = (
+                len(self.attachments) >= self.attachments_batch
+                or self.attachments_noted >= self.attachments_bytes
+            )
+            if not flush_now and not self.attachments_timer:
+                self.attachments_timer = Timer(
+                    self.attachments_linger, self.send_chunk_of_attachments
+                )
+                self.attachments_timer.daemon = True
+                self.attachments_timer.start()
+
+        flush_now and self.send_chunk_of_attachments()
+
+    def hold_attachments(self, size: int):
+        with self.attachments_space:
+            if self.attachments_held + size > self.attachments_cap:
+                # sending what we have, so that we can make space for the new ones
+                self.send_chunk_of_attachments()
+                self.flush_batch()
+                if not self.attachments_space.wait_for(
+                    lambda: not self.attachments_held
+                    or self.attachments_held + size <= self.attachments_cap,
+                    self.attachments_block,
+                ):
+                    logger.warning(
+                        "Attachments were not sent for the last {} seconds, not waiting for them anymore",
+                        self.attachments_block,
+                    )
+            self.attachments_held += size
+
+    def release_attachments(self, size: int):
+        with self.attachments_space:
+            self.attachments_held -= size
+            self.attachments_space.notify_all()
+
     def send_chunk_of_attachments(self):
         with self.lock_attachments:
+            if self.attachments_timer:
+                self.attachments_timer.cancel()
+                self.attachments_timer = None
             if not self.attachments:
                 return
 
+            # attachments are sent in the lane of their entity, so they are added only after the entity
+            per_lane: Dict[str, List[Dict]] = dict()
+            held: Dict[str, int] = dict()
+            for attachment, size in self.attachments:
+                lane = self.lane_key(attachment["entity_id"])
+                per_lane.setdefault(lane, []).append(attachment)
+                held[lane] = held.get(lane, 0) + size
+            self.attachments.clear()
+            self.attachments_noted = 0
+
+        for lane, attachments in per_lane.items():
             self.call(
                 "Sending chunk of attachments",
                 True,
                 "Attachments",
-                [*self.attachments],
+                attachments,
                 map_value="entity_id",
+                key=attachments[0]["entity_id"],
+                on_sent=partial(self.release_attachments, held[lane]),
             )
-            self.attachments.clear()
 
     def update_test_session(self, payload: Dict):
         return self.call(
@@ -272,7 +723,7 @@ class CommonReporter:
         )
 
     def update_test_run(self, payload: MarkTestRun, force_call=False):
-        if force_call:
+        if force_call and not self.writer:
             return self.client.put(
                 self.update_postfix("Run"), json=payload.model_dump()
             )
@@ -286,21 +737,52 @@ class CommonReporter:
         )
 
     def force_wait(self):
-        if not self.health_connection():
+        if self.writer or not self.health_connection():
             return
 
         return self.wait_for_connection(1, True)
 
-    def close_resources(self, force_call=False):
-        with self.waiting:
-            if force_call:
-                return self.client.post(self.postfix("bye"))
-            else:
-                self.send_chunk_of_attachments()
-            self.postman.submit(
-                self.ensure_mails, self.client.post, self.postfix("bye"), False
-            )
-        self.postman.shutdown(wait=True, cancel_futures=False)
+    def save_overhead(self):
+        self.overhead.note_queue(self.postman.max_pending)
+        return self.call(
+            "Saving the reporter's overhead",
+            True,
+            "RunLog",
+            dict(
+                type=LogType.INFO,
+                title="Overhead of the Handshake reporter",
+                message=self.overhead.describe(),
+                feed=self.overhead.summary(),
+                generatedBy="handshake-reporter",
+            ),
+        )
+
+    def close_resources(self, force_call=False, bye: bool = True):
+        started = perf_counter()
+        if self.writer:
+            self.send_chunk_of_attachments()
+            # NOTE: saved overhead would not include the time taken to write the pending events
+            self.save_overhead()
+            self.writer.close()
+        else:
+            with self.waiting:
+                if force_call:
+                    return self.client.post(self.postfix("bye"))
+                else:
+                    self.send_chunk_of_attachments()
+                self.flush_batch()
+                # waiting for the queued requests, so that we can note the time taken for them
+                self.postman.submit(perf_counter).result()
+                self.overhead.closing = (perf_counter() - started) * 1e3
+                self.save_overhead()
+                self.flush_batch()
+                bye and self.postman.submit(
+                    self.ensure_mails, self.client.post, self.postfix("bye"), False
+                )
+            self.postman.shutdown(wait=True, cancel_futures=False)
+
+        self.overhead.closing = (perf_counter() - started) * 1e3
+        logger.info(self.overhead.describe())
         logger.complete()
 
         if not self.skip:
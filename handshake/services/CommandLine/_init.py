@@ -1,6 +1,6 @@
 import pprint
 import sqlite3
-from sqlite3 import connect, sqlite_version_info
+from sqlite3 import sqlite_version_info
 from click import (
     group,
     argument,
@@ -10,6 +10,8 @@ from click import (
     Context,
     Path as C_Path,
     confirm,
+    IntRange,
+    FloatRange,
 )
 from shutil import make_archive, move, unpack_archive
 from tortoise import run_async
@@ -23,7 +25,11 @@ from handshake.services.DBService.migrator import (
 )
 from handshake.services.SchedularService.start import Scheduler
 from loguru import logger
-from handshake.services.DBService.lifecycle import close_connection, init_tortoise_orm
+from handshake.services.DBService.lifecycle import (
+    close_connection,
+    init_tortoise_orm,
+    connect_with_profile,
+)
 from handshake.services.DBService.merge import Merger
 from click import option
 from pathlib import Path
@@ -197,6 +203,26 @@ def step_back(collection_path: str):
     default=False,
     show_default=False,
 )
+@option(
+    "-j",
+    "--jobs",
+    default=1,
+    show_default=True,
+    help="Number of processes to patch the independent test runs with",
+    type=int,
+)
+@option(
+    "--max-tasks",
+    required=False,
+    help="Patches at most these many tasks, rest of them are picked in the next patch",
+    type=IntRange(min=1),
+)
+@option(
+    "--time-budget",
+    required=False,
+    help="Stops picking tasks after these many seconds, rest of them are picked in the next patch",
+    type=FloatRange(min=0),
+)
 def patch(
     collection_path,
     log_file: str,
@@ -207,6 +233,9 @@ def patch(
     inside=False,
     export_mode: str = "json",
     xlsx: bool = False,
+    jobs: int = 1,
+    max_tasks: Optional[int] = None,
+    time_budget: Optional[float] = None,
 ):
     if log_file:
         logger.add(
@@ -219,7 +248,16 @@ def patch(
         raise NotADirectoryError(collection_path)
 
     scheduler = Scheduler(
-        collection_path, out, reset, inside, dev, export_mode.lower(), xlsx
+        collection_path,
+        out,
+        reset,
+        inside,
+        dev,
+        export_mode.lower(),
+        xlsx,
+        jobs,
+        max_tasks,
+        time_budget,
     )
     try:
         run(scheduler.start(config_path))
@@ -381,7 +419,7 @@ def db(collection_path: str):
 @pass_context
 def latest_run(ctx: Context, allow_pending: bool):
     db_file = db_path(Path(ctx.parent.params["collection_path"]))
-    pipe = connect(db_file)
+    pipe = connect_with_profile(db_file)
     result = pipe.execute(
         "SELECT PROJECTNAME, STRFTIME('%d/%m/%Y, %H:%M', STARTED, 'localtime') as STARTED, "
         "STRFTIME('%d/%m/%Y, %H:%M', ENDED, 'localtime') as ENDED, TESTID"
@@ -425,7 +463,7 @@ def query(ctx: Context, q: str):
             "we do not support & recommend modifying the values through this command, only select commands are allowed"
         )
 
-    with connect(db_file) as pipe:
+    with connect_with_profile(db_file) as pipe:
         try:
             rows = pipe.execute(q)
         except sqlite3.OperationalError:
@@ -458,7 +496,7 @@ def query(ctx: Context, q: str):
 @pass_context
 def yet_to_process(ctx: Context):
     db_file = db_path(Path(ctx.parent.params["collection_path"]))
-    pipe = connect(db_file)
+    pipe = connect_with_profile(db_file)
     result = pipe.execute(
         "SELECT ticketID, type, STRFTIME('%d/%m/%Y, %H:%M', dropped, 'localtime'), picked, test_id FROM TASKBASE WHERE "
         "PROCESSED = 0"
@@ -17,6 +17,7 @@ from handshake.services.DBService.shared import set_test_id
 from click import argument, option, Path
 from pathlib import Path as P_Path
 from multiprocessing.sharedctypes import Array
+from multiprocessing import get_context
 from sanic.worker.loader import AppLoader
 from sanic import Sanic
 from typing import Tuple, Optional
@@ -24,6 +25,9 @@ from functools import partial
 from loguru import logger
 from handshake.services.Endpoints.static_server import static_provider
 from gc import set_debug, DEBUG_LEAK
+from handshake.reporters.journal import read_journal, JOURNAL_VERSION
+from handshake.reporters.embedded import EmbeddedWriter
+from handshake.services.Endpoints.write_behind import write_events
 
 
 def feed_app() -> Sanic:
@@ -50,20 +54,61 @@ def setup_app(
     workers: int = 2,
     dev: bool = False,
     config_path: Optional[str] = None,
+    unix: Optional[str] = None,
+    ready_file: Optional[str] = None,
+    write_behind: bool = True,
 ):
     @service_provider.main_process_start
     async def get_me_started(app, loop):
         service_provider.shared_ctx.ROOT = Array("c", str.encode(path))
         if dev:
             service_provider.shared_ctx.DEV = Array("c", str.encode("1"))
-        await init_tortoise_orm(migrate=True, config_path=config_path)
+        if ready_file:
+            # workers write it once they are ready, refer: signal_readiness
+            service_provider.shared_ctx.READY = Array("c", str.encode(ready_file))
+            service_provider.shared_ctx.ADDRESS = Array(
+                "c", str.encode(unix or f"http://127.0.0.1:{port}")
+            )
+        if write_behind:
+            # workers queue the events for the writer, refer: WriteBehind
+            context = get_context("spawn")
+            service_provider.shared_ctx.EVENTS = context.SimpleQueue()
+            service_provider.shared_ctx.WRITTEN = context.Event()
+            # workers which are yet to close, refer: WriteBehind.close
+            service_provider.shared_ctx.WORKERS = context.Value("i", 0)
+            # writer replies to the events of each worker on its own queue, refer: WriteBehind.apply
+            service_provider.shared_ctx.REPLIES = tuple(
+                context.SimpleQueue() for _ in range(max(2, workers))
+            )
+            service_provider.shared_ctx.SLOTS = context.Value("i", 0)
+        await init_tortoise_orm(
+            migrate=True, config_path=config_path, profile="fast-ingest"
+        )
         test_id = await create_run(projectname)
         service_provider.shared_ctx.TEST_ID = Array("c", str.encode(test_id))
         set_test_id()
 
+    @service_provider.main_process_ready
+    async def start_writer(app, loop):
+        if not write_behind:
+            return
+        app.manager.manage(
+            "HandshakeWriter",
+            write_events,
+            dict(
+                queue=app.shared_ctx.EVENTS,
+                written=app.shared_ctx.WRITTEN,
+                replies=app.shared_ctx.REPLIES,
+                results=path,
+                test_id=app.shared_ctx.TEST_ID.value.decode("utf-8"),
+                config_path=config_path,
+            ),
+        )
+
     @service_provider.main_process_stop
     async def close_things(app, loop):
         await close_connection()
+        ready_file and P_Path(ready_file).unlink(missing_ok=True)
 
     if dev:
         set_debug(DEBUG_LEAK)
@@ -75,8 +120,12 @@ def setup_app(
         host="127.0.0.1",
         motd_display=dict(version=__version__),
         dev=dev,
+        unix=unix,
     )
-    logger.debug("Serving at port: {}", port)
+    if unix:
+        logger.debug("Serving at unix socket: {}", unix)
+    else:
+        logger.debug("Serving at port: {}", port)
     Sanic.serve(primary=_app, app_loader=loader)
 
 
@@ -117,6 +166,29 @@ ports.
     type=bool,
     is_flag=True,
 )
+@option(
+    "-u",
+    "--unix",
+    default=None,
+    help="Listens at this unix socket path instead of the port, so that multiple runs sharing a machine"
+    " need not look for free ports",
+    type=str,
+)
+@option(
+    "-r",
+    "--ready-file",
+    default=None,
+    help="Writes the address it serves at into this file once it is ready to accept the requests,"
+    " so that the clients need not poll for it",
+    type=str,
+)
+@option(
+    "--write-behind/--no-write-behind",
+    default=True,
+    show_default=True,
+    help="Responds as soon as the results are validated, workers queue them for a single writer process"
+    " which writes them in grouped transactions. with --no-write-behind, workers write them themselves",
+)
 def run_app(
     collection_path: str,
     project_name: str,
@@ -125,6 +197,9 @@ def run_app(
     workers: int,
     dev: bool,
     config_path: Optional[str] = None,
+    unix: Optional[str] = None,
+    ready_file: Optional[str] = None,
+    write_behind: bool = True,
 ):
     break_if_mismatch(version)
     if workers < 2:
@@ -134,7 +209,71 @@ def run_app(
 
     P_Path(collection_path).mkdir(exist_ok=True)
     setup_app(
-        project_name, collection_path, port, workers, dev, config_path=config_path
+        project_name,
+        collection_path,
+        port,
+        workers,
+        dev,
+        config_path=config_path,
+        unix=unix,
+        ready_file=ready_file,
+        write_behind=write_behind,
+    )
+
+
+@handle_cli.command(
+    short_help="loads the journal written by the reporter into the TestResults",
+    help="""
+Loads the events recorded in the journal (written by the reporters with handshake_mode=journal) into the TestResults,
+as a new test run. Events are written in large transactions, so it's much faster than sending them to the server.
+""",
+)
+@argument(
+    "JOURNAL",
+    nargs=1,
+    type=Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+@general_but_optionally_present
+@config_optional_path
+@option(
+    "-b",
+    "--batch-size",
+    default=5000,
+    show_default=True,
+    help="Number of events written in a single transaction",
+    type=int,
+)
+def ingest(
+    journal: str,
+    collection_path: str,
+    batch_size: int,
+    config_path: Optional[str] = None,
+):
+    records = read_journal(journal)
+    header = next(records, None)
+    if not header:
+        raise ValueError(f"{journal} is empty")
+    if header.get("version") != JOURNAL_VERSION:
+        raise ValueError(
+            f"{journal} was written in v{header.get('version')} format,"
+            f" but we can only read v{JOURNAL_VERSION}"
+        )
+
+    P_Path(collection_path).mkdir(exist_ok=True)
+    writer = EmbeddedWriter(
+        header["projectName"], collection_path, config_path, batch_size
+    )
+    writer.start()
+    written = 0
+    for written, event in enumerate(records, 1):
+        writer.put(event)
+    writer.close()
+
+    if writer.failed:
+        raise SystemExit(1)
+    logger.info(
+        "Ingested {} events from {} as test run: {}", written, journal, writer.test_id
     )
 
 
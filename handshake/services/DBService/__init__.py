@@ -1,2 +1,2 @@
-DB_VERSION = 14
+DB_VERSION = 17
 OLDEST_VERSION = 5
@@ -0,0 +1,711 @@
+from enum import StrEnum
+from typing import Dict, List, Optional, Tuple, Any, Union
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from pydantic import ValidationError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from tortoise.exceptions import IntegrityError
+from uuid import uuid4
+from handshake.services.DBService.models.result_base import (
+    SessionBase,
+    SuiteBase,
+    RunBase,
+    RollupBase,
+)
+from handshake.services.DBService.models.attachmentBase import (
+    AssertBase,
+    EntityLogBase,
+    TestLogBase,
+    LogGeneratedBy,
+)
+from handshake.services.DBService.models.static_base import AttachmentBase, StaticBase
+from handshake.services.DBService.models.config_base import TestConfigBase
+from handshake.services.DBService.models.enums import (
+    Status,
+    SuiteType,
+    AttachmentType,
+)
+from handshake.services.DBService.models.types import (
+    RegisterSession,
+    CreatePickedSuiteOrTest,
+    CreatePickedSuitesOrTests,
+    PunchInSuite,
+    UpdateSuite,
+    UpdateSession,
+    AddAttachmentForEntity,
+    WrittenAttachmentForEntity,
+    PydanticModalForCreatingTestRunConfigBase,
+    MarkTestRun,
+    AddLogForTestRun,
+    RegisterSuite,
+    PydanticModalForTestRunConfigBase,
+    PydanticModalForTestRunUpdate,
+)
+from handshake.services.SchedularService.register import (
+    register_patch_suite,
+    register_patch_test_run,
+    register_bulk_patch_suites,
+)
+
+# helpers here are free of sanic, so that they can be shared by the endpoints and by anything
+# that wants to write the reporter's events directly into the TestResults
+
+# values of the tests that are summed up in the rollup of their ancestors
+rolled_up_values = ("passed", "failed", "skipped", "tests", "xfailed", "xpassed")
+# status of the children that are counted by their parent
+counted_status = ("passed", "failed", "skipped", "xfailed", "xpassed", "retried")
+
+
+class Lineage:
+    """
+    entity's id -> (its parent, its type, whether results are rolled up into it as they arrive)
+    entities are never moved to another parent, so we read them once and keep the recently used ones,
+    at max: limit of them.
+    ones read inside a transaction are noted only if it is committed, refer: ingest_transaction
+    """
+
+    def __init__(self, limit: int = 50_000):
+        self.limit = limit
+        self.known: OrderedDict[str, Tuple[str, str, bool]] = OrderedDict()
+
+    def get(self, entity_id: str) -> Optional[Tuple[str, str, bool]]:
+        if entity_id in self.known:
+            self.known.move_to_end(entity_id)
+            return self.known[entity_id]
+        noted = uncommitted.get()
+        return noted.get(entity_id) if noted is not None else None
+
+    def note(self, entity_id: str, found: Tuple[str, str, bool]):
+        noted = uncommitted.get()
+        if noted is None:
+            self.update({entity_id: found})
+        else:
+            noted[entity_id] = found
+
+    def update(self, noted: Dict[str, Tuple[str, str, bool]]):
+        for entity_id, found in noted.items():
+            self.known[entity_id] = found
+            self.known.move_to_end(entity_id)
+        while len(self.known) > self.limit:
+            self.known.popitem(last=False)
+
+
+# lineage read inside the current transaction, refer: ingest_transaction
+uncommitted: ContextVar[Optional[Dict[str, Tuple[str, str, bool]]]] = ContextVar(
+    "uncommitted", default=None
+)
+lineage = Lineage()
+
+
+@asynccontextmanager
+async def ingest_transaction():
+    """
+    transaction to write the events in, lineage read inside it is forgotten if it is rolled back.
+    """
+    noted = {}
+    token = uncommitted.set(noted)
+    try:
+        async with in_transaction("default") as connection:
+            yield connection
+    finally:
+        uncommitted.reset(token)
+    lineage.update(noted)
+
+
+class IngestEvent(StrEnum):
+    CREATE_SESSION = "create/Session"
+    CREATE_RUN_CONFIG = "create/RunConfig"
+    CREATE_SUITE = "create/Suite"
+    CREATE_SUITES = "create/Suites"
+    SCHEDULE_SUITES = "create/ScheduleSuites"
+    ADD_ATTACHMENTS = "create/Attachments"
+    ADD_RUN_LOG = "create/RunLog"
+    PUNCH_IN_SUITE = "save/PunchInSuite"
+    UPDATE_SUITE = "save/Suite"
+    UPDATE_SESSION = "save/Session"
+    UPDATE_RUN = "save/Run"
+    # logs of the API calls noted by the workers, refer: AuditSink
+    ADD_API_LOGS = "create/ApiLogs"
+    WRITE_ATTACHMENT = "write/Attachment"
+    # endpoints of the older reporters, which respond with the records they wrote
+    REGISTER_PARENT_ENTITIES = "save/registerParentEntities"
+    SAVE_RUN_CONFIG = "save/currentRun"
+    UPDATE_TEST_RUN = "save/updateTestRun"
+    REGISTER_WRITTEN_ATTACHMENT = "save/registerAWrittenAttachment"
+
+
+def prune_nones(payload: Dict[Any, Optional[Any]]):
+    return {_: payload[_] for _ in payload.keys() if payload[_] is not None}
+
+
+async def register_session(
+    payload: Dict, test_id: str, connection=None
+) -> Tuple[SessionBase, bool]:
+    """
+    registers a session, if the session was already registered with the provided sessionID
+    we return that instead. returns the record and whether it was created or not.
+    """
+    session = RegisterSession.model_validate(payload)
+    to_load = session.model_dump(exclude_none=True)
+    if session.sessionID:
+        existing = (
+            await SessionBase.filter(sessionID=session.sessionID)
+            .using_db(connection)
+            .first()
+        )
+        if existing:
+            return existing, False
+
+    return (
+        await SessionBase.create(**to_load, test_id=test_id, using_db=connection),
+        True,
+    )
+
+
+async def register_run_config(payload: Dict, test_id: str, connection=None) -> bool:
+    run_config = PydanticModalForCreatingTestRunConfigBase.model_validate(payload)
+    _, created = await TestConfigBase.get_or_create(
+        test_id=test_id,
+        **run_config.model_dump(),
+        using_db=connection,
+    )
+    return created
+
+
+async def register_suite(payload: Dict, connection=None) -> Tuple[SuiteBase, bool]:
+    """
+    registers a suite/test, if the entity was already registered with the provided suiteID
+    we return that instead. returns the record and whether it was created or not.
+    suites are registered along with their rollup, refer: roll_up_test
+    """
+    suite = CreatePickedSuiteOrTest.model_validate(payload)
+    to_load = suite.model_dump()
+    if to_load.pop("is_processing"):
+        to_load["standing"] = Status.PROCESSING
+    else:
+        to_load["standing"] = Status.PENDING
+
+    if not suite.suiteID:
+        to_load.pop("suiteID")
+    else:
+        existing = (
+            await SuiteBase.filter(suiteID=suite.suiteID).using_db(connection).first()
+        )
+        if existing:
+            return existing, False
+
+    try:
+        record = await SuiteBase.create(**to_load, using_db=connection)
+    except IntegrityError:
+        # workers sharing the suite's id (refer: generate_id) might register it at the same time
+        existing = suite.suiteID and (
+            await SuiteBase.filter(suiteID=suite.suiteID).using_db(connection).first()
+        )
+        if not existing:
+            raise
+        return existing, False
+
+    if record.suiteType == SuiteType.SUITE:
+        await RollupBase.create(suite_id=record.suiteID, using_db=connection)
+    return record, True
+
+
+async def register_suites(payload: List[Dict], connection=None) -> List[str]:
+    """
+    registers the suites/tests (in the order provided, parents first) in a single insert,
+    entities that were already registered with the provided suiteID are skipped.
+    returns the ids of the provided entities.
+    """
+    suites = CreatePickedSuitesOrTests.model_validate(payload).root
+    provided = [str(suite.suiteID) for suite in suites if suite.suiteID]
+    registered = set()
+    for index in range(0, len(provided), 500):
+        registered.update(
+            map(
+                str,
+                await SuiteBase.filter(suiteID__in=provided[index : index + 500])
+                .using_db(connection)
+                .values_list("suiteID", flat=True),
+            )
+        )
+
+    ids = []
+    records = []
+    for suite in suites:
+        to_load = suite.model_dump()
+        to_load["standing"] = (
+            Status.PROCESSING if to_load.pop("is_processing") else Status.PENDING
+        )
+        to_load["suiteID"] = to_load["suiteID"] or uuid4()
+        ids.append(str(to_load["suiteID"]))
+        if ids[-1] not in registered:
+            records.append(SuiteBase(**to_load))
+
+    records and await SuiteBase.bulk_create(
+        records, 500, ignore_conflicts=True, using_db=connection
+    )
+    rollups = [
+        RollupBase(suite_id=record.suiteID)
+        for record in records
+        if record.suiteType == SuiteType.SUITE
+    ]
+    rollups and await RollupBase.bulk_create(rollups, 500, using_db=connection)
+    return ids
+
+
+async def schedule_suites(test_id: str, connection=None) -> List[str]:
+    suites_to_register = await SuiteBase.filter(
+        session__test_id=test_id,
+        suiteType=SuiteType.SUITE,
+        started=None,
+        ended=None,
+    ).using_db(connection)
+
+    suites = []
+    for suite in suites_to_register:
+        suite.standing = str(Status.YET_TO_CALCULATE)
+        suites.append(suite.suiteID)
+
+    suites_to_register and await SuiteBase.bulk_update(
+        suites_to_register, ("standing",), 100, using_db=connection
+    )
+    await register_bulk_patch_suites(test_id, suites, connection=connection)
+    return suites
+
+
+async def add_attachments(
+    payload: List[Dict], connection=None
+) -> List[Tuple[Dict, ValidationError]]:
+    """
+    adds the provided attachments in their respective tables.
+    returns the attachments that were rejected along with the reason.
+    """
+    attachments = []
+    rejected = []
+    logs = []
+    assertions = []
+
+    for _ in payload:
+        try:
+            if _["type"] == AttachmentType.ASSERT:
+                value = _.get("value", dict())
+                value["wait"] = value.get("wait", -1)
+                value["interval"] = value.get("interval", -1)
+
+            attachment = AddAttachmentForEntity.model_validate(_)
+        except ValidationError as error:
+            rejected.append((_, error))
+            continue
+
+        match attachment.type:
+            case AttachmentType.ASSERT:
+                assertions.append(
+                    AssertBase(
+                        entity_id=attachment.entity_id,
+                        title=attachment.title,
+                        message=attachment.description,
+                        passed=attachment.value["passed"],
+                        interval=attachment.value["interval"],
+                        wait=attachment.value["wait"],
+                    )
+                )
+
+            case AttachmentType.LOG:
+                logs.append(
+                    EntityLogBase(
+                        entity_id=attachment.entity_id,
+                        title=attachment.title,
+                        message=attachment.description,
+                        type=attachment.value["type"],
+                        tags=attachment.tags,
+                        feed=attachment.extraValues,
+                        generatedByGroup=LogGeneratedBy.USER,
+                        generatedBy="User",
+                    )
+                )
+
+            case _:
+                attachments.append(AttachmentBase(**attachment.model_dump()))
+
+    if attachments:
+        await AttachmentBase.bulk_create(attachments, using_db=connection)
+    if logs:
+        await EntityLogBase.bulk_create(logs, using_db=connection)
+    if assertions:
+        await AssertBase.bulk_create(assertions, using_db=connection)
+    return rejected
+
+
+async def add_run_log(payload: Dict, test_id: str, connection=None) -> TestLogBase:
+    log = AddLogForTestRun.model_validate(payload)
+    return await TestLogBase.create(
+        **log.model_dump(),
+        test_id=test_id,
+        generatedByGroup=LogGeneratedBy.USER,
+        using_db=connection,
+    )
+
+
+async def add_api_logs(payload: List[Dict], connection=None):
+    await TestLogBase.bulk_create(
+        [TestLogBase(**log) for log in payload], 100, using_db=connection
+    )
+
+
+async def add_written_attachment(
+    payload: Dict, connection=None
+) -> Optional[StaticBase]:
+    """
+    notes the file streamed into the Attachments folder (refer: streamAttachment),
+    returns None if its entity was not found.
+    """
+    attachment = WrittenAttachmentForEntity.model_validate(payload)
+    if (
+        not await SuiteBase.filter(suiteID=attachment.entity_id)
+        .using_db(connection)
+        .exists()
+    ):
+        return None
+    return await StaticBase.create(
+        **attachment.model_dump(),
+        attachmentID=payload["attachmentID"],
+        value=payload["value"],
+        size=payload["size"],
+        hash=payload["hash"],
+        using_db=connection,
+    )
+
+
+async def punch_in_suite(payload: Dict, connection=None) -> Optional[SuiteBase]:
+    suite = PunchInSuite.model_validate(payload)
+    suite_record = (
+        await SuiteBase.filter(suiteID=suite.suiteID).using_db(connection).first()
+    )
+    if not suite_record:
+        return
+
+    to_update = suite.model_dump()
+    to_update["standing"] = Status.PROCESSING
+    suite_record.update_from_dict(to_update)
+    await suite_record.save(using_db=connection)
+    return suite_record
+
+
+async def lineage_of(
+    entity_id: str, connection=None
+) -> Optional[Tuple[str, str, bool]]:
+    if not entity_id:
+        return None
+    if known := lineage.get(entity_id):
+        return known
+
+    found = (
+        await SuiteBase.filter(suiteID=entity_id)
+        .using_db(connection)
+        .first()
+        .values_list("parent", "suiteType")
+    )
+    if not found:
+        return None
+    parent, suite_type = found
+    known = (
+        parent,
+        suite_type,
+        suite_type == SuiteType.SUITE
+        and await RollupBase.filter(suite_id=entity_id).using_db(connection).exists(),
+    )
+    lineage.note(entity_id, known)
+    return known
+
+
+async def rolled_up_ancestors(entity_id: str, connection=None) -> List[str]:
+    """
+    returns the suite and its ancestors (nearest first) which roll up the results as they arrive
+    """
+    ancestors = []
+    while (found := await lineage_of(entity_id, connection)) and found[2]:
+        ancestors.append(entity_id)
+        entity_id = found[0]
+    return ancestors
+
+
+async def roll_up_test(
+    test: SuiteBase, standing: str, before: Dict[str, int], connection=None
+):
+    """
+    rolls up the result of the test into the counters of its parent and the rollup of its
+    ancestors, so patching them later is only about finalizing their status.
+    standing and before are the status and values the test had before this result.
+    """
+    ancestors = await rolled_up_ancestors(test.parent, connection)
+    if not ancestors:
+        return
+
+    # parent counts its children by their latest status, refer: PatchTestSuite.patch_status
+    counted = dict(tests=1)
+    if standing not in (Status.PENDING, Status.PROCESSING):
+        counted = {standing.lower(): -1}
+    counted[test.standing.lower()] = counted.get(test.standing.lower(), 0) + 1
+    counted = {
+        key: F(key) + value
+        for key, value in counted.items()
+        if value and (key == "tests" or key in counted_status)
+    }
+    counted and await SuiteBase.filter(suiteID=ancestors[0]).using_db(
+        connection
+    ).update(**counted)
+
+    summed = {
+        key: F(key) + (getattr(test, key) - before[key])
+        for key in rolled_up_values
+        if getattr(test, key) != before[key]
+    }
+    summed and await RollupBase.filter(suite_id__in=ancestors).using_db(
+        connection
+    ).update(**summed)
+
+
+async def update_suite(
+    payload: Dict, test_id: str, connection=None
+) -> Tuple[Optional[SuiteBase], bool]:
+    """
+    updates the suite/test with its result,
+    returns the updated record (None if not found) and whether a patch task was added for it.
+    """
+    suite = UpdateSuite.model_validate(prune_nones(payload))
+    suite_record = (
+        await SuiteBase.filter(suiteID=suite.suiteID).using_db(connection).first()
+    )
+    if not suite_record:
+        return None, False
+
+    # first, we save the details that were provided
+    before_duration = suite_record.duration or 0
+    before_standing = suite_record.standing
+    before = {key: getattr(suite_record, key) for key in rolled_up_values}
+    note = {}
+
+    if suite_record.suiteType == SuiteType.SUITE:
+        suite.standing = Status.YET_TO_CALCULATE
+    else:
+        note = {
+            suite.standing.lower(): 1,
+            "tests": 1,
+        }
+
+        if (
+            suite_record.suiteType == SuiteType.TEARDOWN
+            or suite_record.suiteType == SuiteType.SETUP
+        ):
+            note[f"{suite_record.suiteType.lower()}_duration"] = suite.duration
+        suite_record.update_from_dict(note)
+
+    provided = prune_nones(suite.model_dump())
+    suite_record.update_from_dict(provided)
+    # only the provided fields, as the counters could be rolled up in the meantime
+    await suite_record.save(
+        using_db=connection,
+        update_fields=[
+            key
+            for key in (*note, *provided, "modified")
+            if key in SuiteBase._meta.db_fields and key != "suiteID"
+        ],
+    )
+
+    # now we calculate certain data
+    added_task = False
+    parents = [suite_record.parent]
+
+    match suite_record.suiteType:
+        case SuiteType.SUITE:
+            added_task = bool(
+                await register_patch_suite(
+                    suite_record.suiteID, test_id, connection=connection
+                )
+            )
+        case SuiteType.TEST:
+            await roll_up_test(suite_record, before_standing, before, connection)
+        # we can't have combined expression with duration and int at the same time, so we update twice
+        case SuiteType.SETUP | SuiteType.TEARDOWN:
+            # hooks of the test are also rolled up into the suite of the test
+            test = await lineage_of(suite_record.parent, connection)
+            if test and test[1] == SuiteType.TEST:
+                suite = await lineage_of(test[0], connection)
+                suite and suite[2] and parents.append(test[0])
+
+            # note here suite_record.duration means hook's duration
+            key = f"{suite_record.suiteType.lower()}_duration"
+            parent = SuiteBase.filter(suiteID__in=parents).using_db(connection)
+            await parent.update(**{key: F(key) + suite_record.duration})
+            await parent.update(**{key: F(key) - before_duration})
+
+    return suite_record, added_task
+
+
+async def update_session(payload: Dict, connection=None) -> Optional[SessionBase]:
+    session = UpdateSession.model_validate(payload)
+    test_session = (
+        await SessionBase.filter(sessionID=session.sessionID)
+        .using_db(connection)
+        .first()
+    )
+    if not test_session:
+        return
+
+    test_session.update_from_dict(session.model_dump())
+    await test_session.save(using_db=connection)
+    return test_session
+
+
+async def mark_test_run(payload: Dict, test_id: str, connection=None) -> RunBase:
+    to_update = MarkTestRun.model_validate(payload)
+
+    await register_patch_test_run(test_id, connection=connection)
+    record = await RunBase.filter(testID=test_id).using_db(connection).first()
+
+    record.update_from_dict(to_update.model_dump())
+    await record.save(using_db=connection)
+    return record
+
+
+async def register_parent_entities(
+    payload: List[Union[str, Dict]], connection=None
+) -> List[str]:
+    """
+    registers a chain of parent suites starting from the root, ids in between are taken as the parent
+    of the suites that follow them. returns the ids of the chain.
+    """
+    prev_parent = ""
+    store = []
+    for _suite in payload:
+        if isinstance(_suite, str):
+            prev_parent = _suite
+            store.append(prev_parent)
+            continue
+
+        values = RegisterSuite.model_validate(_suite).model_dump()
+        values["parent"] = prev_parent
+        suite_record = await SuiteBase.create(**values, using_db=connection)
+        prev_parent = str(suite_record.suiteID)
+        store.append(prev_parent)
+    return store
+
+
+async def save_run_config(
+    payload: Dict, test_id: str, connection=None
+) -> TestConfigBase:
+    run_config = PydanticModalForTestRunConfigBase.model_validate(payload)
+    config = await TestConfigBase.create(
+        test_id=test_id,
+        platform=run_config.platformName,
+        framework=run_config.framework,
+        maxInstances=run_config.maxInstances,
+        fileRetries=run_config.fileRetries,
+        avoidParentSuitesInCount=run_config.avoidParentSuitesInCount,
+        bail=run_config.bail,
+        tags=run_config.tags,
+        using_db=connection,
+    )
+    await RunBase.filter(testID=test_id).using_db(connection).update(
+        exitCode=run_config.exitCode
+    )
+    return config
+
+
+async def update_test_run(
+    payload: Dict, test_id: str, connection=None
+) -> Optional[RunBase]:
+    about_run = PydanticModalForTestRunUpdate.model_validate(payload)
+    await register_patch_test_run(test_id, connection=connection)
+    if not about_run:
+        return
+
+    record = await RunBase.filter(testID=test_id).using_db(connection).first()
+    record.update_from_dict(about_run.model_dump())
+    await record.save(using_db=connection)
+    return record
+
+
+async def register_written_attachment(payload: Dict, connection=None) -> StaticBase:
+    """
+    notes the attachment which the reporter writes itself, returns the record with the name of its file.
+    """
+    attachment = WrittenAttachmentForEntity.model_validate(payload)
+    attachment_id = payload.get("attachmentID") or str(uuid4())
+    return await StaticBase.create(
+        **attachment.model_dump(),
+        attachmentID=attachment_id,
+        value=f"{attachment_id}.{attachment.type.lower()}",
+        using_db=connection,
+    )
+
+
+async def apply_event(
+    event: Union[IngestEvent, str],
+    payload: Union[Dict, List],
+    test_id: str,
+    connection=None,
+) -> Tuple[int, Union[str, List[Tuple[Dict, ValidationError]]]]:
+    """
+    applies a single event sent by the reporter,
+    returns the status code and the text that the respective endpoint would have responded with.
+    NOTE: for attachments, it returns the rejected attachments instead of the text
+    """
+    match IngestEvent(event):
+        case IngestEvent.CREATE_SESSION:
+            record, created = await register_session(payload, test_id, connection)
+            return 201 if created else 200, str(record.sessionID)
+        case IngestEvent.CREATE_RUN_CONFIG:
+            created = await register_run_config(payload, test_id, connection)
+            return (201, "") if created else (406, "config cannot be updated")
+        case IngestEvent.CREATE_SUITE:
+            record, created = await register_suite(payload, connection)
+            return 201 if created else 200, str(record.suiteID)
+        case IngestEvent.CREATE_SUITES:
+            registered = await register_suites(payload, connection)
+            return 201, ",".join(registered)
+        case IngestEvent.SCHEDULE_SUITES:
+            await schedule_suites(test_id, connection)
+            return 202, "Done"
+        case IngestEvent.ADD_ATTACHMENTS:
+            rejected = await add_attachments(payload, connection)
+            return 201 if not rejected else 206, rejected
+        case IngestEvent.ADD_RUN_LOG:
+            await add_run_log(payload, test_id, connection)
+            return 201, ""
+        case IngestEvent.PUNCH_IN_SUITE:
+            record = await punch_in_suite(payload, connection)
+            return (200, str(record.suiteID)) if record else (404, "")
+        case IngestEvent.UPDATE_SUITE:
+            record, added_task = await update_suite(payload, test_id, connection)
+            if not record:
+                return 404, ""
+            return 201 if added_task else 200, str(record.suiteID)
+        case IngestEvent.UPDATE_SESSION:
+            record = await update_session(payload, connection)
+            return (200, str(record.sessionID)) if record else (404, "")
+        case IngestEvent.ADD_API_LOGS:
+            await add_api_logs(payload, connection)
+            return 201, ""
+        case IngestEvent.WRITE_ATTACHMENT:
+            record = await add_written_attachment(payload, connection)
+            if not record:
+                return 404, f"entity: {payload['entity_id']} was not found"
+            return 201, str(record.attachmentID)
+        case IngestEvent.UPDATE_RUN:
+            await mark_test_run(payload, test_id, connection)
+            return 200, ""
+        case IngestEvent.REGISTER_PARENT_ENTITIES:
+            registered = await register_parent_entities(payload, connection)
+            return 201, ",".join(registered)
+        case IngestEvent.SAVE_RUN_CONFIG:
+            await save_run_config(payload, test_id, connection)
+            return 200, ""
+        case IngestEvent.UPDATE_TEST_RUN:
+            record = await update_test_run(payload, test_id, connection)
+            return (200, "") if record else (400, "No changes were made.")
+        case IngestEvent.REGISTER_WRITTEN_ATTACHMENT:
+            record = await register_written_attachment(payload, connection)
+            return 201, record.value
@@ -1,5 +1,6 @@
 from json import loads, dumps
 from handshake.services.DBService.models.config_base import ConfigBase
+from handshake.services.DBService.models.enums import ConfigKeys
 from handshake.services.DBService import DB_VERSION
 from handshake.services.DBService.models.result_base import RunBase
 from handshake.services.DBService.migrator import migration
@@ -7,6 +8,9 @@ from tortoise import Tortoise, connections
 from handshake.services.DBService.shared import db_path
 from pathlib import Path
 from typing import Optional, Union, TypedDict, Dict
+from sqlite3 import connect, Connection, OperationalError
+from contextlib import closing
+from urllib.parse import urlencode
 from loguru import logger
 from handshake.services.SchedularService.constants import (
     writtenAttachmentFolderName,
@@ -14,6 +18,31 @@ from handshake.services.SchedularService.constants import (
 
 models = ["handshake.services.DBService.models"]
 
+# pragmas applied on every new connection, chosen with SQLITE_PROFILE in handshake.json
+sqlite_profiles: Dict[str, Dict[str, Union[str, int]]] = {
+    # sqlite's defaults (besides WAL), every commit is synced to the disk
+    "safe": dict(journal_mode="WAL", synchronous="FULL", busy_timeout=5000),
+    # commits are synced only at the checkpoints, last few of them can be lost on power loss (not on crash)
+    "fast-ingest": dict(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64000,
+        temp_store="MEMORY",
+        busy_timeout=30000,
+    ),
+    # for the reports and queries, pages are read through the memory map
+    "read-mostly": dict(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64000,
+        mmap_size=256 << 20,
+        temp_store="MEMORY",
+        busy_timeout=5000,
+    ),
+}
+# leaves the choice to the command, ex: run-app uses fast-ingest
+AUTO_PROFILE = "auto"
+
 
 class VersionFile(TypedDict):
     browser_download_url: str
@@ -49,6 +78,51 @@ def attachment_folder(provided_db_path: Path, *args):
     return to_path
 
 
+def pick_profile(
+    db: Path, config_file: Optional[Path] = None, fallback: str = "safe"
+) -> str:
+    """
+    returns the sqlite profile set for SQLITE_PROFILE, either in handshake.json (if provided) or in the configbase.
+    fallback is returned if it is left to the command (auto).
+    it is read before connecting to the db, as its pragmas are applied on connect.
+    """
+    chosen = ""
+    if config_file and config_file.exists():
+        chosen = loads(config_file.read_text()).get(ConfigKeys.sqliteProfile, "")
+
+    if not chosen and db.exists():
+        with closing(connect(db)) as connection:
+            try:
+                row = connection.execute(
+                    "select value from configbase where key = ?",
+                    (ConfigKeys.sqliteProfile,),
+                ).fetchone()
+            except OperationalError:
+                # configbase is not yet created
+                row = None
+        chosen = row[0] if row else ""
+
+    if not chosen or chosen == AUTO_PROFILE:
+        return fallback
+    if chosen not in sqlite_profiles:
+        logger.warning(
+            "{} is not a sqlite profile, expected one of: {}, hence using {}",
+            chosen,
+            ", ".join((AUTO_PROFILE, *sqlite_profiles)),
+            fallback,
+        )
+        return fallback
+    return chosen
+
+
+def connect_with_profile(db: Path, fallback: str = "read-mostly") -> Connection:
+    # for the commands that query the db without the ORM
+    connection = connect(db)
+    for pragma, value in sqlite_profiles[pick_profile(db, fallback=fallback)].items():
+        connection.execute(f"PRAGMA {pragma}={value}")
+    return connection
+
+
 async def close_connection():
     await connections.close_all()
     # waiting for the logs to be sent or saved
@@ -62,24 +136,37 @@ async def init_tortoise_orm(
     init_script: bool = False,
     config_path: Optional[Union[Path, str]] = None,
     avoid_config: Optional[bool] = False,
+    profile: str = "safe",
 ):
+    """
+    profile is the sqlite profile preferred by the caller,
+    used unless a different one was set for SQLITE_PROFILE (refer: pick_profile)
+    """
     chosen = force_db_path if force_db_path else db_path()
     force_init_scripts = not chosen.exists()
     # migrator is called here
     if migrate:
         migration(chosen)
 
+    test = TestConfigManager(chosen, config_path)
+    profile = pick_profile(chosen, None if avoid_config else test.path, profile)
+
     # creating a connection
     await Tortoise.init(
-        db_url=r"{}".format(f"sqlite://{chosen}"),
+        db_url=r"{}".format(f"sqlite://{chosen}?{urlencode(sqlite_profiles[profile])}"),
         modules={"models": models},
     )
+    logger.debug("connected to {} with {} profile", chosen, profile)
     # generating schemas
     await Tortoise.generate_schemas()
 
-    test = TestConfigManager(chosen, config_path)
     # we run the init scripts for the newly created db
     await test.sync(init_script or force_init_scripts, avoid_config)
+    if not avoid_config:
+        await ConfigBase.update_or_create(
+            defaults=dict(value=profile, readonly=True),
+            key=ConfigKeys.sqliteProfileUsed,
+        )
 
     if close_it:
         await close_connection()
@@ -112,6 +199,7 @@ class TestConfigManager:
             INSERT OR IGNORE INTO configbase("key", "value", "readonly") VALUES('RESET_FIX_TEST_RUN', '', '1');
             INSERT OR IGNORE INTO configbase("key", "value", "readonly") VALUES('VERSION', '{DB_VERSION}', '1');
             INSERT OR IGNORE INTO configbase("key", "value", "readonly") VALUES('RECENTLY_DELETED', '0', '1');
+            INSERT OR IGNORE INTO configbase("key", "value", "readonly") VALUES('SQLITE_PROFILE', '{AUTO_PROFILE}', '0');
             """,
             )
         if avoid_config:
@@ -7,6 +7,7 @@ from tortoise.fields import (
     ForeignKeyField,
     ForeignKeyRelation,
     BooleanField,
+    IntField,
 )
 from handshake.services.SchedularService.constants import JobType
 from handshake.services.DBService.models.result_base import RunBase
@@ -37,3 +38,27 @@ class TaskBase(Model):
         default=False,
         description="True if the task is processed or completed",
     )
+    leased_till = DatetimeField(
+        null=True,
+        description="picked task is leased till then, after which it can be picked again",
+    )
+    leased_by = CharField(
+        max_length=80,
+        null=True,
+        description="host:pid of the patch which leased the task, refer: task_queue",
+    )
+    attempts = IntField(
+        default=0,
+        null=False,
+        description="number of times its lease expired before it was processed",
+    )
+    priority = IntField(
+        default=0, null=False, description="tasks with higher priority are picked first"
+    )
+
+    class Meta:
+        indexes = (
+            # queue of pending or leased tasks of a type, refer: task_queue
+            ("processed", "picked", "type", "priority", "dropped"),
+            ("test_id", "processed"),
+        )
@@ -79,3 +79,7 @@ class ConfigKeys(StrEnum):
     version = "VERSION"
     recentlyDeleted = "RECENTLY_DELETED"
     reset_test_run = "RESET_FIX_TEST_RUN"
+    sqliteProfile = "SQLITE_PROFILE"
+    # profile resolved by the last command that synced the config, as SQLITE_PROFILE can leave it to the command
+    sqliteProfileUsed = "SQLITE_PROFILE_USED"
+    patchWatermark = "PATCH_WATERMARK"
@@ -7,6 +7,7 @@ from tortoise.fields import (
     CharField,
     ForeignKeyField,
     ForeignKeyRelation,
+    IntField,
     TextField,
     UUIDField,
 )
@@ -49,3 +50,11 @@ class StaticBase(AttachmentFields):
     entity: ForeignKeyRelation[SuiteBase] = ForeignKeyField(
         "models.SuiteBase", related_name="staticAttachments", to_field="suiteID"
     )
+    size = IntField(
+        default=0, description="Size of the written file in bytes, if uploaded"
+    )
+    hash = CharField(
+        max_length=64,
+        default="",
+        description="SHA-256 hash of the written file, if uploaded",
+    )
@@ -7,7 +7,7 @@ from handshake.services.DBService.models.enums import (
     RunStatus,
     LogType,
 )
-from pydantic import BaseModel
+from pydantic import BaseModel, RootModel
 from datetime import datetime
 from typing_extensions import TypedDict
 
@@ -24,7 +24,9 @@ class Tag(TypedDict):
     desc: str
 
 
-class RegisterSession(CommonRegisterCols): ...
+class RegisterSession(CommonRegisterCols):
+    # reporters can generate the id themselves, so they need not wait for our response
+    sessionID: Optional[uuid.UUID] = None
 
 
 class RegisterSuite(CommonRegisterCols):
@@ -40,6 +42,7 @@ class RegisterSuite(CommonRegisterCols):
 
 
 class CreatePickedSuiteOrTest(BaseModel):
+    suiteID: Optional[uuid.UUID] = None
     title: str
     retried: Optional[int] = 0
     started: Optional[datetime] = None
@@ -52,6 +55,10 @@ class CreatePickedSuiteOrTest(BaseModel):
     is_processing: Optional[bool] = True
 
 
+class CreatePickedSuitesOrTests(RootModel[List[CreatePickedSuiteOrTest]]):
+    pass
+
+
 class MarkSession(BaseModel):
     duration: float
     skipped: int
@@ -129,6 +136,15 @@ class AddAttachmentForEntity(BaseModel):
     tags: Optional[List[Tag]] = []
 
 
+class AddLogForTestRun(BaseModel):
+    type: LogType
+    title: str
+    message: Optional[str] = ""
+    feed: Optional[Dict[Any, Any]] = {}
+    tags: Optional[List[Tag]] = []
+    generatedBy: Optional[str] = "reporter"
+
+
 class WrittenAttachmentForEntity(BaseModel):
     entity_id: uuid.UUID
     type: AttachmentType
@@ -0,0 +1,5 @@
+alter table staticbase add column size int not null default 0;
+alter table staticbase add column hash varchar(64) not null default '';
+
+-- Version Migration
+UPDATE ConfigBase SET value = 15 WHERE key = 'VERSION';
@@ -0,0 +1,4 @@
+INSERT OR IGNORE INTO configbase("key", "value", "readonly") VALUES('SQLITE_PROFILE', 'auto', '0');
+
+-- Version Migration
+UPDATE ConfigBase SET value = 16 WHERE key = 'VERSION';
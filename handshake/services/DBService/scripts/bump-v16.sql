@@ -0,0 +1,10 @@
+alter table taskbase add column leased_till TIMESTAMP;
+alter table taskbase add column leased_by VARCHAR(80);
+alter table taskbase add column attempts INT NOT NULL DEFAULT 0;
+alter table taskbase add column priority INT NOT NULL DEFAULT 0;
+
+create index if not exists "idx_taskbase_process_48532e" on taskbase ("processed", "picked", "type", "priority", "dropped");
+create index if not exists "idx_taskbase_test_id_da3f5a" on taskbase ("test_id", "processed");
+
+-- Version Migration
+UPDATE ConfigBase SET value = 17 WHERE key = 'VERSION';
@@ -0,0 +1,5 @@
+alter table staticbase drop column size;
+alter table staticbase drop column hash;
+
+-- Version Migration
+UPDATE ConfigBase SET value = 14 WHERE key = 'VERSION';
@@ -0,0 +1,4 @@
+delete from configbase where key = 'SQLITE_PROFILE';
+
+-- Version Migration
+UPDATE ConfigBase SET value = 15 WHERE key = 'VERSION';
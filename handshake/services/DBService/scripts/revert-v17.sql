@@ -0,0 +1,10 @@
+drop index if exists "idx_taskbase_process_48532e";
+drop index if exists "idx_taskbase_test_id_da3f5a";
+
+alter table taskbase drop column leased_till;
+alter table taskbase drop column leased_by;
+alter table taskbase drop column attempts;
+alter table taskbase drop column priority;
+
+-- Version Migration
+UPDATE ConfigBase SET value = 16 WHERE key = 'VERSION';
@@ -0,0 +1,126 @@
+from handshake.services.DBService.models.attachmentBase import TestLogBase
+from handshake.services.DBService.models.enums import LogType, LogGeneratedBy
+from handshake.services.DBService.shared import APP_NAME
+from handshake.services.DBService.ingest import IngestEvent
+from handshake.services.Endpoints.write_behind import write_behind
+from asyncio import Task, CancelledError, sleep, wait, get_running_loop
+from typing import Dict, Optional, Tuple
+from loguru import logger
+from sanic import Sanic
+
+
+class AuditSink:
+    """
+    logs of the API calls (refer: attachLog) are noted here and are written in bulk by a short-lived task,
+    so the requests need not wait for them.
+
+    logs are grouped per window (in seconds): similar logs (same type, url, status and reason) are written once
+    with the payload of the first of them and the number of times they were repeated.
+    at max: limit logs are written per window, rest of them are counted and noted in a single log.
+    with write-behind, they are queued for the writer instead, refer: WriteBehind
+    """
+
+    def __init__(self, window: float = 1.0, limit: int = 100):
+        self.window = window
+        self.limit = limit
+        self.pending: Dict[Tuple, Dict] = {}
+        self.repeated: Dict[Tuple, int] = {}
+        self.dropped: Dict[str, int] = {}
+        self.task: Optional[Task] = None
+        self.flushing = False
+
+    def note(self, test_id: str, payload: Dict, log_type: LogType, description: str):
+        key = (
+            test_id,
+            log_type,
+            payload.get("url"),
+            payload.get("status"),
+            payload.get("reason"),
+        )
+        if key in self.pending:
+            self.repeated[key] += 1
+        elif len(self.pending) >= self.limit:
+            self.dropped[test_id] = self.dropped.get(test_id, 0) + 1
+        else:
+            self.pending[key] = dict(
+                test_id=test_id,
+                type=log_type,
+                feed=payload,
+                title=f"caught {LogType} while responding to an API call",
+                message=description,
+                generatedByGroup=LogGeneratedBy.API,
+                # urls with their query can be longer than what the column holds
+                generatedBy=(payload.get("url", False) or "api-service")[
+                    : TestLogBase._meta.fields_map["generatedBy"].max_length
+                ],
+            )
+            self.repeated[key] = 1
+
+        if not self.writing():
+            self.task = get_running_loop().create_task(self.write_later())
+
+    def writing(self) -> bool:
+        return bool(
+            self.task
+            and not self.task.done()
+            and self.task.get_loop() is get_running_loop()
+        )
+
+    async def write_later(self):
+        try:
+            await sleep(self.window)
+        except CancelledError:
+            # asked to write right away, refer: close
+            pass
+        self.flushing = True
+        try:
+            await self.flush()
+        finally:
+            self.flushing = False
+
+    async def flush(self):
+        pending, repeated, dropped = self.pending, self.repeated, self.dropped
+        self.pending, self.repeated, self.dropped = {}, {}, {}
+
+        logs = []
+        for key, log in pending.items():
+            if repeated[key] > 1:
+                log["feed"] = dict(log["feed"], repeated=repeated[key])
+            logs.append(log)
+        for test_id, count in dropped.items():
+            logs.append(
+                dict(
+                    test_id=test_id,
+                    type=LogType.WARN,
+                    feed=dict(dropped=count, limit=self.limit, window=self.window),
+                    title="API logs were rate limited",
+                    message=f"skipped {count} logs of the API calls, as more than {self.limit} were noted in"
+                    f" {self.window}s",
+                    generatedByGroup=LogGeneratedBy.API,
+                    generatedBy="api-service",
+                )
+            )
+        if not logs:
+            return
+
+        if queue := write_behind():
+            return queue.put(IngestEvent.ADD_API_LOGS, logs)
+        try:
+            await TestLogBase.bulk_create([TestLogBase(**log) for log in logs], 100)
+        except Exception:
+            logger.exception("Failed to write {} logs of the API calls", len(logs))
+
+    async def close(self):
+        # writes the logs noted so far, before the connection is closed
+        if self.writing():
+            # task that is yet to start is cancelled too, its logs are written below
+            self.flushing or self.task.cancel()
+            await wait([self.task])
+        await self.flush()
+
+
+def audit_sink() -> AuditSink:
+    ctx = Sanic.get_app(APP_NAME).ctx
+    if not hasattr(ctx, "audit"):
+        ctx.audit = AuditSink()
+    return ctx.audit
@@ -1,68 +1,68 @@
-from handshake.services.DBService.models.result_base import SessionBase, SuiteBase
-from handshake.services.DBService.models.attachmentBase import (
-    AssertBase,
-    EntityLogBase,
-    LogGeneratedBy,
-)
-from handshake.services.DBService.models.static_base import (
-    AttachmentBase,
-    AttachmentType,
-)
 from handshake.services.DBService.models.types import (
     AddAttachmentForEntity,
+    AddLogForTestRun,
     RegisterSession,
-    CreatePickedSuiteOrTest,
-    PydanticModalForCreatingTestRunConfigBase,
-    Status,
-    SuiteType,
+    CreatePickedSuitesOrTests,
+)
+from handshake.services.DBService.ingest import (
+    ingest_transaction,
+    register_session,
+    register_run_config,
+    register_suite,
+    register_suites,
+    schedule_suites,
+    add_attachments,
+    add_run_log,
+    apply_event,
+    IngestEvent,
 )
+from handshake.services.DBService.models.config_base import ConfigBase
 from pydantic import ValidationError
 from handshake.services.Endpoints.define_api import definition
-from handshake.services.DBService.models.config_base import TestConfigBase
 from sanic.blueprints import Blueprint
-from sanic.response import text, HTTPResponse
+from sanic.response import text, json, HTTPResponse
 from loguru import logger
 from sanic.request import Request
 from handshake.services.DBService.shared import get_test_id
-from handshake.services.SchedularService.register import register_bulk_patch_suites
-from typing import List
+from typing import List, Dict
+from json import loads
+from tortoise.exceptions import OperationalError
+from asyncio import sleep
 from handshake.services.Endpoints.blueprints.utils import (
     attachWarn,
     extractPydanticErrors,
 )
+from handshake.services.Endpoints.write_behind import write_behind, prepare_event
 
 create_service = Blueprint("CreateService", url_prefix="/create")
+BATCH_ATTEMPTS = 5
 
 
 @create_service.post("/Session")
 @definition(
     summary="Registers a Session",
     description="Registers a session with datetime on the currently running Test Run. Please take a note of the "
-    "sessionID sent",
+    "sessionID sent. sessionID can also be generated by the reporter, registering it again returns the same session",
     tag="create",
     body={"application/json": RegisterSession.model_json_schema()},
 )
 async def register_test_session(request: Request) -> HTTPResponse:
     try:
-        session = RegisterSession.model_validate(request.json)
-        session_record = await SessionBase.create(
-            **session.model_dump(), test_id=get_test_id()
-        )
-        await session_record.save()
+        if queue := write_behind():
+            return queue.accept(IngestEvent.CREATE_SESSION, request.json)
+        session_record, created = await register_session(request.json, get_test_id())
     except Exception as error:
         logger.error("Failed to create a session due to exception: {}", str(error))
         return text(str(error), status=400)
 
-    return text(str(session_record.sessionID), status=201)
+    return text(str(session_record.sessionID), status=201 if created else 200)
 
 
 @create_service.post("/RunConfig")
 async def create_test_run_config(request: Request) -> HTTPResponse:
-    run_config = PydanticModalForCreatingTestRunConfigBase.model_validate(request.json)
-    _, created = await TestConfigBase.get_or_create(
-        test_id=get_test_id(),
-        **run_config.model_dump(),
-    )
+    if queue := write_behind():
+        return queue.accept(IngestEvent.CREATE_RUN_CONFIG, request.json)
+    created = await register_run_config(request.json, get_test_id())
 
     return text(
         (
@@ -76,40 +76,32 @@ async def create_test_run_config(request: Request) -> HTTPResponse:
 
 @create_service.post("/Suite")
 async def create_suite(request: Request) -> HTTPResponse:
-    suite = CreatePickedSuiteOrTest.model_validate(request.json)
-    to_load = suite.model_dump()
-    if to_load.pop("is_processing"):
-        to_load["standing"] = Status.PROCESSING
-    else:
-        to_load["standing"] = Status.PENDING
+    if queue := write_behind():
+        return queue.accept(IngestEvent.CREATE_SUITE, request.json)
+    suite_record, created = await register_suite(request.json)
+    return text(str(suite_record.suiteID), status=201 if created else 200)
 
-    suite_record = await SuiteBase.create(**to_load)
-    await suite_record.save()
 
-    return text(str(suite_record.suiteID), status=201)
+@create_service.post("/Suites")
+@definition(
+    summary="Registers multiple suites/tests at once",
+    description="registers the provided suites/tests in a single insert, please provide them in the order of their"
+    " parents first. suiteIDs can be generated by the reporter, already registered ones are skipped."
+    " responds with the list of suiteIDs",
+    tag="create",
+    body={"application/json": CreatePickedSuitesOrTests.model_json_schema()},
+)
+async def create_suites(request: Request) -> HTTPResponse:
+    if queue := write_behind():
+        return queue.accept(IngestEvent.CREATE_SUITES, request.json)
+    return json(await register_suites(request.json), status=201)
 
 
 @create_service.post("/ScheduleSuites")
 async def register_modify_suites(request: Request) -> HTTPResponse:
-    test_id = get_test_id()
-
-    suites_to_register = await SuiteBase.filter(
-        session__test_id=test_id,
-        suiteType=SuiteType.SUITE,
-        started=None,
-        ended=None,
-    )
-
-    suites = []
-    for suite in suites_to_register:
-        suite.standing = str(Status.YET_TO_CALCULATE)
-        suites.append(suite.suiteID)
-
-    suites_to_register and await SuiteBase.bulk_update(
-        suites_to_register, ("standing",), 100
-    )
-    await register_bulk_patch_suites(test_id, suites)
-
+    if queue := write_behind():
+        return queue.accept(IngestEvent.SCHEDULE_SUITES, {})
+    await schedule_suites(get_test_id())
     return text("Done", status=202)
 
 
@@ -122,64 +114,139 @@ async def register_modify_suites(request: Request) -> HTTPResponse:
     body={"application/json": List[AddAttachmentForEntity]},
 )
 async def addAttachmentForEntity(request: Request) -> HTTPResponse:
-    attachments = []
-    note = []
-    logs = []
-    assertions = []
+    if queue := write_behind():
+        return queue.accept(IngestEvent.ADD_ATTACHMENTS, request.json)
+    rejected = await add_attachments(request.json)
+    for attachment, error in rejected:
+        await attachWarn(
+            extractPydanticErrors(request.url, attachment, error), request.url
+        )
 
-    for _ in request.json:
-        try:
-            if _["type"] == AttachmentType.ASSERT:
-                value = _.get("value", dict())
-                value["wait"] = value.get("wait", -1)
-                value["interval"] = value.get("interval", -1)
+    return text(
+        "Attachments was added successfully", status=201 if not rejected else 206
+    )
 
-            attachment = AddAttachmentForEntity.model_validate(_)
+
+@create_service.post("/RunLog")
+@definition(
+    summary="adds a log to the current test run",
+    description="logs that are not related to any entity, like a summary from the reporter, can be attached"
+    " to the test run itself",
+    tag="add",
+    body={"application/json": AddLogForTestRun.model_json_schema()},
+)
+async def addLogForTestRun(request: Request) -> HTTPResponse:
+    try:
+        if queue := write_behind():
+            return queue.accept(IngestEvent.ADD_RUN_LOG, request.json)
+        await add_run_log(request.json, get_test_id())
+    except ValidationError as error:
+        return text(error.json(), status=400)
+    return text("Log was added to the test run", status=201)
+
+
+def resolve_references(event: Dict, refs: Dict[str, str]):
+    payload = event.get("payload", {})
+    for refer_as, refer_to in (event.get("refer") or {}).items():
+        if refer_to in refs:
+            payload[refer_as] = refs[refer_to]
+
+    map_value = event.get("map_value")
+    if map_value:
+        for item in payload:
+            item[map_value] = refs.get(item[map_value], item[map_value])
+    return payload
+
+
+def accept_batch(queue, events: List[Dict]) -> HTTPResponse:
+    # ids are generated before queueing the events, so we can still respond with the references
+    refs: Dict[str, str] = {}
+    prepared = []
+    for index, event in enumerate(events):
+        payload = resolve_references(event, refs)
+        try:
+            created = prepare_event(IngestEvent(event["event"]), payload)
         except ValidationError as error:
-            note.append(_.get("entityID", False))
-            await attachWarn(extractPydanticErrors(request.url, _, error), request.url)
-            continue
-
-        match attachment.type:
-            case AttachmentType.ASSERT:
-                assertions.append(
-                    await AssertBase(
-                        **dict(
-                            entity_id=attachment.entity_id,
-                            title=attachment.title,
-                            message=attachment.description,
-                            passed=attachment.value["passed"],
-                            interval=attachment.value["interval"],
-                            wait=attachment.value["wait"],
-                        )
+            logger.error("Batch was not queued, as event: {} was not valid", index)
+            return json(
+                dict(index=index, errors=error.errors(include_context=False)),
+                status=400,
+            )
+        if created and event.get("save_as"):
+            refs[event["save_as"]] = created
+        prepared.append((IngestEvent(event["event"]), payload))
+
+    for event, payload in prepared:
+        queue.put(event, payload)
+    return json(dict(refs=refs, results=[202] * len(prepared)), status=201)
+
+
+@create_service.post("/Batch")
+@definition(
+    summary="applies an ordered batch of events in a single transaction",
+    description="body is a NDJSON stream, each line is an event of form: {event, payload, save_as, refer, map_value}."
+    " event is the path of the endpoint that it replaces, for example: create/Suite or save/Suite."
+    " IDs of the records created for the events with save_as are noted and can be referred"
+    " through refer (field -> save_as) or map_value (for the list payloads) by the events that follow in the batch.",
+    tag="create",
+)
+async def register_batch(request: Request) -> HTTPResponse:
+    test_id = get_test_id()
+    index = 0
+
+    try:
+        events = [
+            loads(line)
+            for line in request.body.decode("utf-8").splitlines()
+            if line.strip()
+        ]
+        if queue := write_behind():
+            return accept_batch(queue, events)
+        for attempt in range(1, BATCH_ATTEMPTS + 1):
+            refs: Dict[str, str] = {}
+            results = []
+            rejected = []
+            try:
+                async with ingest_transaction() as connection:
+                    # sqlite fails a transaction at its first write (without waiting for the busy_timeout)
+                    # if another worker had written after its first read, so we take the write lock first
+                    await connection.execute_query(
+                        f"UPDATE {ConfigBase._meta.db_table} SET value = value WHERE 0"
                     )
-                )
-
-            case AttachmentType.LOG:
-                logs.append(
-                    await EntityLogBase(
-                        **dict(
-                            entity_id=attachment.entity_id,
-                            title=attachment.title,
-                            message=attachment.description,
-                            type=attachment.value["type"],
-                            tags=attachment.tags,
-                            feed=attachment.extraValues,
-                            generatedByGroup=LogGeneratedBy.USER,
-                            generatedBy="User",
+                    for index, event in enumerate(events):
+                        payload = resolve_references(event, refs)
+                        status, note = await apply_event(
+                            IngestEvent(event["event"]), payload, test_id, connection
                         )
-                    )
-                )
 
-            case _:
-                attachments.append(AttachmentBase(**attachment.model_dump()))
+                        if event["event"] == IngestEvent.ADD_ATTACHMENTS:
+                            rejected.extend(note)
+                            note = ""
+                        elif event.get("save_as") and status // 100 == 2:
+                            refs[event["save_as"]] = note
+                        results.append(status)
+                break
+            except OperationalError as error:
+                # other workers might be writing their batches at the same time (run-app --no-write-behind)
+                if "locked" not in str(error) or attempt == BATCH_ATTEMPTS:
+                    raise
+                logger.warning("Batch was rolled back as db was locked, retrying")
+                await sleep(0.05 * attempt)
+    except ValidationError as error:
+        logger.error("Batch was rolled back, as event: {} was not valid", index)
+        return json(
+            dict(index=index, errors=error.errors(include_context=False)), status=400
+        )
+    except (ValueError, KeyError) as error:
+        logger.error(
+            "Batch was rolled back, due to {} at event: {}", repr(error), index
+        )
+        return json(dict(index=index, errors=[repr(error)]), status=400)
+
+    for attachment, error in rejected:
+        await attachWarn(
+            extractPydanticErrors(request.url, attachment, error),
+            request.url,
+        )
 
-    if attachments:
-        await AttachmentBase.bulk_create(attachments)
-    if logs:
-        await EntityLogBase.bulk_create(logs)
-    if assertions:
-        await AssertBase.bulk_create(assertions)
-    return text(
-        "Attachments was added successfully", status=201 if not len(note) else 206
-    )
+    return json(dict(refs=refs, results=results), status=201)
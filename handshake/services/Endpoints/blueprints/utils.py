@@ -1,19 +1,23 @@
-from handshake.services.DBService.models.attachmentBase import (
-    LogType,
-    TestLogBase,
-    LogGeneratedBy,
-)
+from handshake.services.DBService.models.attachmentBase import LogType
+from handshake.services.Endpoints.audit import audit_sink
 from handshake.services.DBService.shared import get_test_id
 from sanic.request import Request
 from sanic.response import JSONResponse
 from pydantic import ValidationError
-from typing import Dict, Any, Optional
+
+
+def request_payload(request: Request):
+    # batches are not json, but NDJSON
+    try:
+        return request.json
+    except Exception:
+        return request.body.decode("utf-8", errors="replace")
 
 
 def extractPayload(request: Request, response: JSONResponse):
     payload = dict(
         url=request.url,
-        payload=request.json,
+        payload=request_payload(request),
         status=response.status,
         reason=response.body.decode(),
     )
@@ -31,15 +35,8 @@ def extractPydanticErrors(url, payload, error: ValidationError):
 
 
 async def attachLog(payload, attachmentType: LogType, description: str):
-    await TestLogBase.create(
-        test_id=get_test_id(),
-        type=attachmentType,
-        feed=payload,
-        title=f"caught {LogType} while responding to an API call",
-        message=description,
-        generatedByGroup=LogGeneratedBy.API,
-        generatedBy=(payload.get("url", False) if payload else False) or "api-service",
-    )
+    # written in the background, refer: AuditSink
+    audit_sink().note(get_test_id(), payload or {}, attachmentType, description)
 
 
 async def attachError(payload, url: str):
@@ -64,7 +61,3 @@ async def attachWarn(payload, url: str):
         LogType.WARN,
         f"Failed to process the request at: {url}, we will miss this attachment",
     )
-
-
-def prune_nones(payload: Dict[Any, Optional[Any]]):
-    return {_: payload[_] for _ in payload.keys() if payload[_] is not None}
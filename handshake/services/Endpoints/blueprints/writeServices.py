@@ -1,17 +1,25 @@
 import base64
+from hashlib import sha256
+from uuid import UUID, uuid4
+from aiofiles import open as a_open
 from sanic.blueprints import Blueprint
 from sanic.response import text, HTTPResponse
 from loguru import logger
 from sanic.request import Request
 from handshake.services.DBService.models.types import (
     AddAttachmentForEntity,
+    WrittenAttachmentForEntity,
 )
-from handshake.services.DBService.shared import root_dir
+from handshake.services.DBService.shared import root_dir, get_test_id
+from handshake.services.DBService.lifecycle import attachment_folder, db_path
+from handshake.services.DBService.ingest import IngestEvent, add_written_attachment
+from handshake.services.DBService.models.result_base import SuiteBase
 from handshake.services.DBService.models.static_base import (
     StaticBase,
 )
 from handshake.services.SchedularService.constants import writtenAttachmentFolderName
 from handshake.services.Endpoints.define_api import definition
+from handshake.services.Endpoints.write_behind import write_behind, WriteBehind
 
 writeServices = Blueprint("WriteService", url_prefix="/write")
 
@@ -26,9 +34,11 @@ writeServices = Blueprint("WriteService", url_prefix="/write")
 )
 async def saveImage(request: Request) -> HTTPResponse:
     attachment = AddAttachmentForEntity.model_validate(request.json)
+    if queue := write_behind():
+        return await write_attachment_behind(queue, attachment)
 
     record = await StaticBase.create(
-        entity_id=attachment.entityID,
+        entity_id=attachment.entity_id,
         description=attachment.description,
         type=attachment.type,
         title=attachment.title,
@@ -46,3 +56,100 @@ async def saveImage(request: Request) -> HTTPResponse:
     record.value = file_name
     await record.save()
     return text(str(record.attachmentID), status=201)
+
+
+async def write_attachment_behind(
+    queue: WriteBehind, attachment: AddAttachmentForEntity
+) -> HTTPResponse:
+    # file is written once the writer has noted it, so an attachment of a missing entity is never written
+    content = base64.b64decode(attachment.value)
+    attachment_id = uuid4()
+    file_name = f"{attachment_id}.{attachment.type.lower()}"
+    status, note = await queue.apply(
+        IngestEvent.WRITE_ATTACHMENT,
+        dict(
+            entity_id=str(attachment.entity_id),
+            type=attachment.type,
+            title=attachment.title,
+            description=attachment.description,
+            attachmentID=str(attachment_id),
+            value=file_name,
+            size=len(content),
+            hash=sha256(content).hexdigest(),
+        ),
+    )
+    if status != 201:
+        return text(note, status=status)
+
+    logger.info("Received a file from user, saving it as {}", file_name)
+    test_root = root_dir() / writtenAttachmentFolderName / get_test_id()
+    test_root.mkdir(parents=True, exist_ok=True)
+    (test_root / file_name).write_bytes(content)
+    return text(note, status=201)
+
+
+@writeServices.put("/Attachment/<entity_id:uuid>", stream=True, error_format="json")
+@definition(
+    summary="streams a file (screenshot, video, trace, etc.) for the specified entity",
+    description="writes the raw bytes of the request body into our Attachments folder as they are received, "
+    "so the file is never held in memory. type, title and description are passed as query parameters. "
+    "files of at most ATTACHMENT_MAX_SIZE bytes are accepted, set SANIC_ATTACHMENT_MAX_SIZE to change it.",
+    tag="add",
+)
+async def streamAttachment(request: Request, entity_id: UUID) -> HTTPResponse:
+    # bodies of the other requests are limited by REQUEST_MAX_SIZE
+    request.stream.request_max_size = request.app.config.ATTACHMENT_MAX_SIZE
+    attachment = WrittenAttachmentForEntity.model_validate(
+        dict(
+            entity_id=entity_id, **{key: request.args.get(key) for key in request.args}
+        )
+    )
+    # with write-behind, its entity might be yet to be written, so the writer looks for it instead
+    queue = write_behind()
+    if not (queue or await SuiteBase.exists(suiteID=attachment.entity_id)):
+        return text(f"entity: {attachment.entity_id} was not found", status=404)
+
+    attachment_id = uuid4()
+    file_name = f"{attachment_id}.{attachment.type.lower()}"
+    folder = attachment_folder(db_path()) / get_test_id() / str(attachment.entity_id)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    file = folder / file_name
+    # written as part, so that an interrupted upload is never taken as the attachment
+    writing = folder / f"{file_name}.part"
+    digest = sha256()
+    size = 0
+    try:
+        async with a_open(writing, "wb") as to_write:
+            while (chunk := await request.stream.read()) is not None:
+                digest.update(chunk)
+                size += len(chunk)
+                await to_write.write(chunk)
+        writing.replace(file)
+    except Exception:
+        writing.unlink(missing_ok=True)
+        raise
+
+    logger.debug("Received a file of {} bytes, saved it as {}", size, file)
+    payload = dict(
+        **attachment.model_dump(mode="json"),
+        attachmentID=str(attachment_id),
+        value=file_name,
+        size=size,
+        hash=digest.hexdigest(),
+    )
+    if queue:
+        status, note = await queue.apply(IngestEvent.WRITE_ATTACHMENT, payload)
+    else:
+        record = await add_written_attachment(payload)
+        status, note = (
+            (201, str(record.attachmentID))
+            if record
+            else (404, f"entity: {attachment.entity_id} was not found")
+        )
+
+    if status != 201:
+        # file of an attachment that was not noted, would never be removed
+        file.unlink(missing_ok=True)
+        not any(folder.iterdir()) and folder.rmdir()
+    return text(note, status=status)
@@ -1,14 +1,42 @@
 from handshake.services.Endpoints.core import service_provider
 from handshake.services.DBService.lifecycle import init_tortoise_orm, close_connection
 from handshake.services.DBService.shared import set_test_id
+from handshake.services.Endpoints.write_behind import WriteBehind, write_behind
+from handshake.services.Endpoints.audit import audit_sink
+from pathlib import Path
+from os import getpid
 
 
 @service_provider.before_server_start
 async def before_start_of_day(*args):
     set_test_id()
-    await init_tortoise_orm(avoid_config=True)
+    await init_tortoise_orm(avoid_config=True, profile="fast-ingest")
+    if hasattr(service_provider.shared_ctx, "EVENTS"):
+        service_provider.ctx.write_behind = WriteBehind(
+            service_provider.shared_ctx.EVENTS,
+            service_provider.shared_ctx.WRITTEN,
+            service_provider.shared_ctx.WORKERS,
+            service_provider.shared_ctx.REPLIES,
+            service_provider.shared_ctx.SLOTS,
+        )
+        service_provider.ctx.write_behind.open()
+
+
+@service_provider.after_server_start
+async def signal_readiness(app, *args):
+    if not hasattr(app.shared_ctx, "READY"):
+        return
+    # written atomically, so the clients never read a partial address
+    ready = Path(app.shared_ctx.READY.value.decode("utf-8"))
+    writing = ready.with_name(f"{ready.name}.{getpid()}")
+    writing.write_text(app.shared_ctx.ADDRESS.value.decode("utf-8"))
+    writing.replace(ready)
 
 
 @service_provider.after_server_stop
 async def close_app(*args):
+    # logs of the API calls are queued too, refer: AuditSink.flush
+    await audit_sink().close()
+    if queue := write_behind():
+        await queue.close()
     await close_connection()
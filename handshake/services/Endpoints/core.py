@@ -10,8 +10,9 @@ from handshake.services.Endpoints.blueprints.utils import (
     attachError,
     attachWarn,
 )
+from handshake.services.Endpoints.encoding import decoders
 from sanic import Sanic, Request
-from sanic.response import JSONResponse
+from sanic.response import JSONResponse, text
 from pydantic import ValidationError
 from sanic.blueprints import Blueprint
 from dotenv import load_dotenv
@@ -27,12 +28,31 @@ service_provider = Sanic(APP_NAME)
 
 
 service_provider.config.TOUCHUP = False
+# largest file that can be streamed as an attachment (4 GB), refer: streamAttachment
+if "ATTACHMENT_MAX_SIZE" not in service_provider.config:
+    service_provider.config.ATTACHMENT_MAX_SIZE = 4 * 1024**3
 service_provider.blueprint(one_liners)
 service_provider.blueprint(listeners)
 
 service_provider.error_handler.add(ValidationError, handle_validation_error)
 
 
+@service_provider.on_request
+async def decode_body(request: Request):
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding == "identity" or not request.body:
+        return
+
+    if encoding not in decoders:
+        return text(f"Content-Encoding: {encoding} is not supported", status=415)
+    try:
+        request.body = decoders[encoding](
+            request.body, service_provider.config.REQUEST_MAX_SIZE
+        )
+    except Exception as error:
+        return text(f"Failed to decode the {encoding} body: {error}", status=400)
+
+
 @service_provider.on_response
 async def handle_response(request: Request, response: JSONResponse):
     if 200 <= response.status < 300:
@@ -0,0 +1,46 @@
+from importlib.util import find_spec
+from zlib import compress, decompressobj, MAX_WBITS
+from io import BytesIO
+from typing import Callable, Dict
+
+# request bodies can be compressed with any of these (as Content-Encoding),
+# zstd is available only if zstandard is installed (on both, the reporter and the server)
+zstd_supported = bool(find_spec("zstandard"))
+
+if zstd_supported:
+    from zstandard import ZstdCompressor, ZstdDecompressor
+
+
+def gzip_encode(body: bytes) -> bytes:
+    # lower levels are enough for JSON and are much faster than the default (9)
+    return compress(body, 5, wbits=16 + MAX_WBITS)
+
+
+def gzip_decode(body: bytes, limit: int) -> bytes:
+    decoder = decompressobj(16 + MAX_WBITS)
+    decoded = decoder.decompress(body, limit)
+    if decoder.unconsumed_tail:
+        raise ValueError(f"decompressed body is larger than {limit} bytes")
+    if not decoder.eof:
+        raise ValueError("incomplete gzip body")
+    return decoded
+
+
+def zstd_encode(body: bytes) -> bytes:
+    return ZstdCompressor(level=3).compress(body)
+
+
+def zstd_decode(body: bytes, limit: int) -> bytes:
+    with ZstdDecompressor().stream_reader(BytesIO(body)) as reader:
+        decoded = reader.read(limit + 1)
+    if len(decoded) > limit:
+        raise ValueError(f"decompressed body is larger than {limit} bytes")
+    return decoded
+
+
+encoders: Dict[str, Callable[[bytes], bytes]] = dict(gzip=gzip_encode)
+decoders: Dict[str, Callable[[bytes, int], bytes]] = dict(gzip=gzip_decode)
+
+if zstd_supported:
+    encoders["zstd"] = zstd_encode
+    decoders["zstd"] = zstd_decode
@@ -1,4 +1,5 @@
 from handshake.services.DBService.lifecycle import close_connection
+from handshake.services.Endpoints.audit import audit_sink
 from sanic.blueprints import Blueprint
 from sanic.response import HTTPResponse, text
 from sanic.request import Request
@@ -17,6 +18,8 @@ async def health_status(request: Request) -> HTTPResponse:
 # bye is core request, so make sure to handle it carefully
 @one_liners.post("/bye")
 async def bye(request: Request) -> HTTPResponse:
+    # events accepted so far are written before the server stops, refer: WriteBehind.close
+    await audit_sink().close()
     await close_connection()
     request.app.m.terminate()
 
@@ -0,0 +1,210 @@
+from handshake.services.DBService.ingest import IngestEvent, prune_nones
+from handshake.services.DBService.models.types import (
+    RegisterSession,
+    CreatePickedSuiteOrTest,
+    CreatePickedSuitesOrTests,
+    PunchInSuite,
+    UpdateSuite,
+    UpdateSession,
+    PydanticModalForCreatingTestRunConfigBase,
+    MarkTestRun,
+    AddLogForTestRun,
+    WrittenAttachmentForEntity,
+    PydanticModalForTestRunConfigBase,
+    PydanticModalForTestRunUpdate,
+)
+from handshake.services.DBService.shared import APP_NAME
+from handshake.reporters.embedded import EmbeddedWriter
+from multiprocessing.queues import SimpleQueue
+from multiprocessing.sharedctypes import Synchronized
+from multiprocessing.synchronize import Event
+from asyncio import get_running_loop, wait_for, Future
+from itertools import count
+from threading import Thread
+from signal import signal, SIGINT, SIGTERM, SIG_IGN
+from typing import Dict, List, Union, Optional, Type, Tuple
+from pydantic import BaseModel
+from sanic import Sanic
+from sanic.response import text, HTTPResponse
+from uuid import uuid4
+
+# events are validated before they are queued, so that we can still respond with their errors
+validators: Dict[IngestEvent, Type[BaseModel]] = {
+    IngestEvent.CREATE_SESSION: RegisterSession,
+    IngestEvent.CREATE_RUN_CONFIG: PydanticModalForCreatingTestRunConfigBase,
+    IngestEvent.CREATE_SUITE: CreatePickedSuiteOrTest,
+    IngestEvent.CREATE_SUITES: CreatePickedSuitesOrTests,
+    IngestEvent.ADD_RUN_LOG: AddLogForTestRun,
+    IngestEvent.PUNCH_IN_SUITE: PunchInSuite,
+    IngestEvent.UPDATE_SUITE: UpdateSuite,
+    IngestEvent.UPDATE_SESSION: UpdateSession,
+    IngestEvent.UPDATE_RUN: MarkTestRun,
+    IngestEvent.WRITE_ATTACHMENT: WrittenAttachmentForEntity,
+    IngestEvent.SAVE_RUN_CONFIG: PydanticModalForTestRunConfigBase,
+    IngestEvent.UPDATE_TEST_RUN: PydanticModalForTestRunUpdate,
+    IngestEvent.REGISTER_WRITTEN_ATTACHMENT: WrittenAttachmentForEntity,
+}
+# ids of the records are generated before they are written, so that we can respond with them
+generated_ids: Dict[IngestEvent, str] = {
+    IngestEvent.CREATE_SESSION: "sessionID",
+    IngestEvent.CREATE_SUITE: "suiteID",
+    IngestEvent.WRITE_ATTACHMENT: "attachmentID",
+    IngestEvent.REGISTER_WRITTEN_ATTACHMENT: "attachmentID",
+}
+
+
+def prepare_event(event: IngestEvent, payload: Union[Dict, List]) -> Optional[str]:
+    """
+    validates the payload of the event and fills the id of the record it creates (if not provided).
+    returns the id of the record it creates, if any.
+    """
+    validator = validators.get(event)
+    validator and validator.model_validate(
+        prune_nones(payload) if event == IngestEvent.UPDATE_SUITE else payload
+    )
+
+    id_field = generated_ids.get(event)
+    if not id_field:
+        return
+    payload[id_field] = str(payload.get(id_field) or uuid4())
+    return payload[id_field]
+
+
+class WriteBehind:
+    """
+    events accepted by the endpoints are validated and queued here by the workers, and are written in grouped
+    transactions by a single writer process (refer: write_events). so the requests need not wait for their commits
+    and the workers never contend for the lock of the database.
+
+    queue is written synchronously, so the events are written in the order they were accepted, across the workers.
+    enabled by default, run-app --no-write-behind lets the workers write them instead.
+
+    endpoints that respond with what they wrote, wait for the writer to reply (refer: apply), each worker reads
+    the replies from its own queue (slot).
+    writer is asked to stop by the last worker that closes, so the events accepted by the rest are not missed.
+    """
+
+    def __init__(
+        self,
+        queue: SimpleQueue,
+        written: Event,
+        workers: Synchronized,
+        replies: Tuple[SimpleQueue, ...] = (),
+        slots: Optional[Synchronized] = None,
+    ):
+        self.queue = queue
+        self.written = written
+        self.workers = workers
+        self.replies = replies
+        self.slots = slots
+        self.slot: Optional[int] = None
+        self.waiting: Dict[int, Future] = {}
+        self.tickets = count()
+        self.closed = False
+
+    def open(self):
+        with self.workers.get_lock():
+            self.workers.value += 1
+        if not self.replies:
+            return
+
+        with self.slots.get_lock():
+            # restarted workers take the slots of the ones they replaced
+            self.slot = self.slots.value % len(self.replies)
+            self.slots.value += 1
+        loop = get_running_loop()
+        Thread(
+            target=self.read_replies,
+            args=(loop,),
+            name="handshake-replies",
+            daemon=True,
+        ).start()
+
+    def read_replies(self, loop):
+        replies = self.replies[self.slot]
+        while (reply := replies.get()) is not None:
+            loop.call_soon_threadsafe(self.resolve, *reply)
+
+    def resolve(self, ticket: int, status: int, note: str):
+        waiting = self.waiting.pop(ticket, None)
+        waiting and not waiting.done() and waiting.set_result((status, note))
+
+    def put(self, event: IngestEvent, payload: Union[Dict, List]):
+        self.queue.put(dict(event=event, payload=payload))
+
+    def accept(self, event: IngestEvent, payload: Union[Dict, List]) -> HTTPResponse:
+        created = prepare_event(event, payload)
+        self.put(event, payload)
+        return text(created or "queued", status=202)
+
+    async def apply(
+        self, event: IngestEvent, payload: Union[Dict, List], timeout: float = 60
+    ) -> Tuple[int, str]:
+        """
+        queues the event and waits until the writer has written it,
+        returns the status code and the text that the respective endpoint would have responded with.
+        """
+        prepare_event(event, payload)
+        ticket = next(self.tickets)
+        self.waiting[ticket] = waiting = get_running_loop().create_future()
+        self.queue.put(dict(event=event, payload=payload, reply=(self.slot, ticket)))
+        try:
+            return await wait_for(waiting, timeout)
+        finally:
+            self.waiting.pop(ticket, None)
+
+    async def close(self, timeout: float = 60):
+        # last worker asks the writer to write the pending events and waits for it
+        if self.closed:
+            return
+        self.closed = True
+        self.replies and self.replies[self.slot].put(None)
+        with self.workers.get_lock():
+            self.workers.value -= 1
+            if self.workers.value > 0:
+                return
+        self.queue.put(None)
+        await get_running_loop().run_in_executor(None, self.written.wait, timeout)
+
+
+def write_events(
+    queue: SimpleQueue,
+    written: Event,
+    results: str,
+    test_id: str,
+    config_path: Optional[str] = None,
+    batch_size: int = 500,
+    replies: Tuple[SimpleQueue, ...] = (),
+):
+    """
+    runs as a process managed by sanic, writes the events queued by the workers until it is asked to stop.
+    events that expect a reply, are replied to (once written) on the queue of the worker that sent them.
+    """
+
+    def reply(to: Tuple[int, int], status: int, note: str):
+        slot, ticket = to
+        replies[slot].put((ticket, status, note))
+
+    writer = EmbeddedWriter(
+        "",
+        results,
+        config_path,
+        batch_size=batch_size,
+        test_id=test_id,
+        on_written=reply,
+    )
+    # it stops once the workers are closed, refer: WriteBehind.close
+    for to_handle in (SIGINT, SIGTERM):
+        signal(to_handle, SIG_IGN)
+
+    writer.start()
+    try:
+        while (event := queue.get()) is not None:
+            writer.put(event)
+    finally:
+        writer.close()
+        written.set()
+
+
+def write_behind() -> Optional[WriteBehind]:
+    return getattr(Sanic.get_app(APP_NAME).ctx, "write_behind", None)
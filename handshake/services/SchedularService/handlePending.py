@@ -1,14 +1,26 @@
 from handshake.services.DBService.models.dynamic_base import TaskBase
-from handshake.services.DBService.models.result_base import SuiteBase, Status, SuiteType
+from handshake.services.DBService.models.result_base import (
+    SuiteBase,
+    SessionBase,
+    Status,
+    SuiteType,
+)
 from handshake.services.SchedularService.modifySuites import patchTestSuite
+from handshake.services.SchedularService.patchTestRunSuites import patchSuitesOfTestRuns
 from handshake.services.SchedularService.constants import JobType
 from handshake.services.SchedularService.completeTestRun import patchTestRun
 from handshake.services.SchedularService.flag_tasks import pruneTasks
+from handshake.services.SchedularService.task_queue import (
+    Budget,
+    pending_tasks,
+    claim_task,
+)
 from loguru import logger
 from tortoise.expressions import Q, Subquery
-from tortoise.functions import Min
+from tortoise.functions import Min, Max
 from asyncio import TaskGroup
 from pathlib import Path
+from typing import Optional
 from handshake.services.SchedularService.register import cancel_patch_for_test_run
 from handshake.Exporters.excel_exporter import excel_export, ExcelExporter
 
@@ -19,22 +31,34 @@ async def safety_checks():
         await pruneTasks(prune_task.ticketID)
 
 
-async def patch_jobs(include_excel_export: bool = False, db_path: Path = None):
-    while True:
+async def patch_jobs(
+    include_excel_export: bool = False,
+    db_path: Path = None,
+    jobs: int = 1,
+    budget: Optional[Budget] = None,
+):
+    budget = budget or Budget()
+    await safety_checks()
+
+    # suites of each test run are patched at once, the loop below is for the ones left out
+    # newest test run first
+    await patchSuitesOfTestRuns(
+        await pending_tasks(JobType.MODIFY_SUITE)
+        .annotate(newest=Max("dropped"))
+        .group_by("test_id")
+        .order_by("-newest")
+        .values_list("test_id", flat=True),
+        jobs,
+        budget,
+    )
+
+    while not budget.exhausted:
         await safety_checks()
 
         async with TaskGroup() as patcher:
             # list of tasks which were not picked and processed and are specific to MODIFY_SUITE
-            tasks = (
-                await TaskBase.filter(
-                    Q(picked=False)
-                    & Q(processed=False)
-                    & Q(processed=False)
-                    & Q(type=JobType.MODIFY_SUITE)
-                )
-                .order_by("dropped")  # old is on top
-                .only("ticketID")
-                .values_list("ticketID", flat=True)
+            tasks = await pending_tasks(JobType.MODIFY_SUITE).values_list(
+                "ticketID", flat=True
             )
 
             if not tasks:
@@ -75,15 +99,46 @@ async def patch_jobs(include_excel_export: bool = False, db_path: Path = None):
 
             # so we process the suites whose child suites are all processed and their previous retries were processed
 
-            # if there are no such tasks to process, then check if the tasks are there for the child suites
-            if not (
-                to_process
-                or await TaskBase.filter(
-                    Q(ticketID=Subquery(providers.values("suiteID")))
-                ).exists()
-            ):
+            # if there are no such tasks to process, then the child suites are either picked by another patch
+            # or are not registered yet, the latter is given up only if its test run is over,
+            # rest of them are left for the next patch
+            if not to_process:
+                unregistered = providers.filter(
+                    ~Q(
+                        suiteID__in=Subquery(
+                            TaskBase.filter(type=JobType.MODIFY_SUITE).values(
+                                "ticketID"
+                            )
+                        )
+                    )
+                )
+                over = await TaskBase.filter(
+                    Q(ticketID__in=tasks)
+                    & Q(
+                        test_id__in=Subquery(
+                            SessionBase.filter(
+                                sessionID__in=Subquery(
+                                    unregistered.values("session_id")
+                                )
+                            ).values("test_id")
+                        )
+                    )
+                    & (
+                        Q(test__ended__isnull=False)
+                        | Q(
+                            test_id__in=Subquery(
+                                TaskBase.filter(type=JobType.MODIFY_TEST_RUN).values(
+                                    "test_id"
+                                )
+                            )
+                        )
+                    )
+                ).all()
+                if not over:
+                    break
+
                 # if so, mark each of the tests runs as banned.
-                for task in await TaskBase.filter(Q(ticketID__in=tasks)).all():
+                for task in over:
                     await cancel_patch_for_test_run(
                         task.test_id,
                         "Failed to find a way to process a parent suite, as the child suite was not registered.",
@@ -93,8 +148,9 @@ async def patch_jobs(include_excel_export: bool = False, db_path: Path = None):
                     )
 
             for task in to_process:
-                task.picked = True
-                await task.save()
+                if budget.exhausted or not await claim_task(task):
+                    continue
+                budget.spend()
 
                 patcher.create_task(
                     patchTestSuite(task.ticketID, task.test_id),
@@ -103,13 +159,30 @@ async def patch_jobs(include_excel_export: bool = False, db_path: Path = None):
 
             # NOTE: make sure to pick the task before adding a new task
 
+    if budget.exhausted:
+        # test runs are not patched, as some of their suites could be left for the next patch
+        logger.warning(
+            "Budget of this patch is exhausted after {} tasks,"
+            " rest of them would be picked in the next patch",
+            budget.spent,
+        )
+        return
+
     logger.debug("Processing Test Runs")
     async with TaskGroup() as patcher:
-        for job in await TaskBase.filter(
-            Q(type=JobType.MODIFY_TEST_RUN) & Q(picked=False) & Q(processed=False)
-        ).all():
-            job.picked = True
-            await job.save()
+        # test runs whose suites were left for the next patch are patched along with them
+        for job in await pending_tasks(JobType.MODIFY_TEST_RUN).filter(
+            ~Q(
+                test_id__in=Subquery(
+                    TaskBase.filter(type=JobType.MODIFY_SUITE, processed=False).values(
+                        "test_id"
+                    )
+                )
+            )
+        ):
+            if budget.exhausted or not await claim_task(job):
+                continue
+            budget.spend()
             patcher.create_task(patchTestRun(job.ticketID), name=job.ticketID)
 
     if not (db_path and include_excel_export and excel_export):
@@ -118,15 +191,13 @@ async def patch_jobs(include_excel_export: bool = False, db_path: Path = None):
 
     logger.debug("Exporting Test Runs")
     async with TaskGroup() as patcher:
-        for job in await TaskBase.filter(
-            Q(type=JobType.EXPORT_EXCEL)
-            & Q(picked=False)
-            & Q(processed=False)
-            & ~Q(test__standing=Status.PENDING)
-        ).all():
+        for job in await pending_tasks(JobType.EXPORT_EXCEL).filter(
+            ~Q(test__standing=Status.PENDING)
+        ):
+            if budget.exhausted or not await claim_task(job):
+                continue
+            budget.spend()
             exporter = ExcelExporter(db_path)
-            job.picked = True
-            await job.save()
             patcher.create_task(
                 exporter.start_exporting(job.test_id), name=job.ticketID
             )
@@ -8,7 +8,9 @@ from handshake.services.DBService.models.result_base import (
 from handshake.services.DBService.models.config_base import TestConfigBase
 from handshake.services.DBService.models.dynamic_base import TaskBase
 from handshake.services.DBService.models.enums import Status, SuiteType
-from tortoise.expressions import Q
+from tortoise.expressions import Q, F
+from tortoise.transactions import in_transaction
+from tortoise import connections
 from tortoise.functions import Count, Lower, Sum, Min, Max
 from loguru import logger
 from handshake.services.SchedularService.register import (
@@ -18,6 +20,20 @@ from handshake.services.SchedularService.register import (
 from itertools import chain
 from asyncio import gather
 
+# non-suite descendants of a suite, walked in a single recursive query
+MARK_RETRIED_LATER = """
+UPDATE suitebase SET retried_later = 1 WHERE suiteID IN (
+    WITH RECURSIVE descendants(suiteID) AS (
+        SELECT suiteID FROM suitebase WHERE parent = ?1 AND suiteType <> ?2
+        UNION ALL
+        SELECT child.suiteID FROM suitebase child
+        JOIN descendants ON child.parent = descendants.suiteID
+        WHERE child.suiteType <> ?2
+    )
+    SELECT suiteID FROM descendants
+);
+"""
+
 
 def fetch_key_from_status(passed, failed, skipped, xfailed=0, xpassed=0):
     if failed > 0:
@@ -43,14 +59,16 @@ class PatchTestSuite:
         self.suite: Optional[SuiteBase] = None
         self.related_task: Optional[TaskBase] = None
         self.test_config: Optional[TestConfigBase] = None
+        self.rollup: Optional[RollupBase] = None
         self.suite_id = str(suite_id)
         self.test_id = str(test_id)
 
     async def fetch_records(self):
-        self.suite, self.related_task, self.test_config = await gather(
+        self.suite, self.related_task, self.test_config, self.rollup = await gather(
             SuiteBase.filter(suiteID=self.suite_id).first(),
             TaskBase.filter(ticketID=self.suite_id).first(),
             TestConfigBase.filter(test_id=self.test_id).first(),
+            RollupBase.filter(suite_id=self.suite_id).first(),
         )
 
     async def do_we_need_to_patch(self):
@@ -95,9 +113,35 @@ class PatchTestSuite:
         self.related_task.picked = False
         await self.related_task.save()
 
-    async def mark_processed(self):
+    async def mark_processed(self, connection=None):
         self.related_task.processed = True
-        await self.related_task.save()
+        await self.related_task.save(using_db=connection)
+
+    async def is_rolled_up(self) -> bool:
+        """
+        returns true if the results of its children were rolled up as they arrived,
+        refer: ingest.roll_up_test, and if those counters add up to its children.
+        """
+        if not self.rollup:
+            return False
+
+        counted = [
+            getattr(self.suite, key)
+            for key in ("passed", "failed", "skipped", "xfailed", "xpassed")
+        ]
+        # tests whose results were not rolled up are missed in both, so we count them again
+        if (
+            min(counted) >= 0
+            and sum(counted) <= self.suite.tests
+            and self.suite.tests == await self.test_entities.count()
+        ):
+            return True
+
+        logger.warning(
+            "Counters of the suite: {} do not add up, so calculating them again",
+            self.suite_id,
+        )
+        return False
 
     @property
     def test_entities(self):
@@ -137,18 +181,65 @@ class PatchTestSuite:
             self.suite.duration = (ended - started).total_seconds() * 1000
             await self.suite.save()
 
-        await gather(
-            self.patch_status(),
-            self.patch_rollup_value_for_errors(),
-            self.patch_rollup_table(),
-            self.patch_retried_records(),
-            self.update_duration_drill_down(),
-        )
+        if await self.is_rolled_up():
+            await gather(
+                self.finalize_status(),
+                self.patch_rollup_value_for_errors(),
+                self.patch_retried_records(),
+            )
+        else:
+            await gather(
+                self.patch_status(),
+                self.patch_rollup_value_for_errors(),
+                self.patch_rollup_table(),
+                self.patch_retried_records(),
+                self.update_duration_drill_down(),
+            )
 
         logger.info("Successfully processed suite: {}", self.suite.suiteID)
-        await self.mark_processed()
+        async with in_transaction("default") as connection:
+            await self.roll_up_to_parent(connection)
+            await self.mark_processed(connection)
         return True
 
+    async def finalize_status(self):
+        self.suite.standing = fetch_key_from_status(
+            self.suite.passed,
+            self.suite.failed,
+            self.suite.skipped,
+            self.suite.xfailed,
+            self.suite.xpassed,
+        )
+        await self.suite.save()
+
+    async def is_parent_rolled_up(self, suite: SuiteBase, connection=None) -> bool:
+        # patched ones could have their rollup from patch_rollup_table, so we only consider the pending ones
+        return bool(suite.parent) and (
+            await RollupBase.filter(
+                suite_id=suite.parent,
+                suite__standing__in=(
+                    Status.PENDING,
+                    Status.PROCESSING,
+                    Status.YET_TO_CALCULATE,
+                ),
+            )
+            .using_db(connection)
+            .exists()
+        )
+
+    async def roll_up_to_parent(self, connection=None):
+        # parent is patched only after all of its children were, refer: do_we_need_to_patch
+        if not (self.rollup and await self.is_parent_rolled_up(self.suite, connection)):
+            return
+
+        key = self.suite.standing.lower()
+        parent = SuiteBase.filter(suiteID=self.suite.parent).using_db(connection)
+        await parent.update(**{key: F(key) + 1, "tests": F("tests") + 1})
+        await parent.update(
+            setup_duration=F("setup_duration") + self.suite.setup_duration,
+            teardown_duration=F("teardown_duration") + self.suite.teardown_duration,
+        )
+
     async def patch_status(self):
         results = dict(
             await (
@@ -230,13 +321,14 @@ class PatchTestSuite:
             else None
         ) or {}
 
-        await RollupBase.create(
-            suite_id=self.suite_id,
-            **{
-                key: direct_entities.get(key, 0) + indirect_entities.get(key, 0)
-                for key in required
-            },
-        )
+        values = {
+            key: direct_entities.get(key, 0) + indirect_entities.get(key, 0)
+            for key in required
+        }
+        if self.rollup:
+            await self.rollup.update_from_dict(values)
+            return await self.rollup.save()
+        await RollupBase.create(suite_id=self.suite_id, **values)
 
     async def patch_retried_records(self):
         if not (self.test_config and self.test_config.fileRetries > 0):
@@ -249,30 +341,31 @@ class PatchTestSuite:
                 tests=[self.suite_id], suite_id=self.suite_id, length=1
             )
 
-        matching_previous_suites = (
-            await SuiteBase.filter(
-                Q(title=suite.title)
-                & Q(session__test_id=self.test_id)
-                & Q(file=suite.file)
-                & Q(tags=suite.tags)
-                & Q(retried=suite.retried - 1)
-                & Q(suiteType=suite.suiteType)
-                & ~Q(suiteID=suite.suiteID)
-                & Q(ended__lte=suite.started)
-            )
-            .order_by("started")
-            .values_list("suiteID", flat=True)
-        )
-
+        # previous retry of this suite along with its retry record, in a single query
         previous = (
             await RetriedBase.filter(
-                Q(length=suite.retried) & Q(suite_id__in=matching_previous_suites)
+                Q(length=suite.retried)
+                & Q(suite__title=suite.title)
+                & Q(suite__session__test_id=self.test_id)
+                & Q(suite__file=suite.file)
+                & Q(suite__tags=suite.tags)
+                & Q(suite__retried=suite.retried - 1)
+                & Q(suite__suiteType=suite.suiteType)
+                & ~Q(suite_id=suite.suiteID)
+                & Q(suite__ended__lte=suite.started)
             )
+            .select_related("suite")
             .order_by("modified")
             .first()
         )
 
-        previous_suite = await SuiteBase.filter(suiteID=previous.suite_id).first()
+        previous_suite = previous.suite
+        if await self.is_parent_rolled_up(previous_suite):
+            # parent would count it as retried, refer: patch_status
+            key = previous_suite.standing.lower()
+            await SuiteBase.filter(suiteID=previous_suite.parent).update(
+                **{key: F(key) - 1, "retried": F("retried") + 1}
+            )
         await previous_suite.update_from_dict(
             dict(standing=Status.RETRIED, retried_later=True)
         )
@@ -286,36 +379,9 @@ class PatchTestSuite:
             )
         )
 
-        child_entities = []
-        current_loop = (
-            await SuiteBase.filter(
-                Q(parent=previous_suite.suiteID) & ~Q(suiteType=SuiteType.SUITE)
-            )
-            .only("suiteID")
-            .values_list("suiteID", flat=True)
-        )
-
-        while current_loop:
-            child_entities.extend(current_loop)
-            temp = (
-                await SuiteBase.filter(
-                    Q(parent__in=current_loop) & ~Q(suiteType=SuiteType.SUITE)
-                )
-                .only("suiteID")
-                .values_list("suiteID", flat=True)
-            )
-
-            current_loop.clear()
-            current_loop.extend(temp)
-
-        entities = []
-        for entity in await SuiteBase.filter(suiteID__in=child_entities):
-            entity.retried_later = True
-            entities.append(entity)
-
-        entities and await SuiteBase.bulk_update(
-            entities,
-            ("retried_later",),
+        # all of its tests and hooks, at any depth, are marked at once
+        await connections.get("default").execute_query(
+            MARK_RETRIED_LATER, [str(previous_suite.suiteID), SuiteType.SUITE]
         )
 
         await previous.save()
@@ -0,0 +1,547 @@
+from handshake.services.DBService.models.result_base import (
+    SuiteBase,
+    RollupBase,
+    RetriedBase,
+)
+from handshake.services.DBService.models.config_base import TestConfigBase
+from handshake.services.DBService.models.dynamic_base import TaskBase
+from handshake.services.DBService.models.enums import Status, SuiteType
+from handshake.services.SchedularService.constants import JobType
+from handshake.services.SchedularService.modifySuites import fetch_key_from_status
+from handshake.services.SchedularService.register import cancel_patch_for_test_run
+from handshake.services.SchedularService.refer_types import RunTree, PatchedTree
+from handshake.services.SchedularService.task_queue import (
+    Budget,
+    claim_tasks_of_run,
+    release_tasks,
+)
+from tortoise.transactions import in_transaction
+from collections import defaultdict, Counter
+from itertools import count
+from operator import itemgetter
+from json import dumps
+from traceback import format_exc
+from typing import Dict, List, Optional
+from loguru import logger
+from asyncio import gather, get_running_loop, as_completed, Semaphore
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import get_context
+
+# values of the tests which are summed up in the rollup of their suites
+rolled_up = ("passed", "failed", "skipped", "tests", "xfailed", "xpassed")
+counted_status = ("passed", "failed", "skipped", "xfailed", "xpassed")
+
+patched_fields = (
+    "standing",
+    *rolled_up,
+    "retried",
+    "errors",
+    "started",
+    "ended",
+    "duration",
+    "setup_duration",
+    "teardown_duration",
+    "retried_later",
+    "modified",
+)
+read_fields = (
+    "suiteID",
+    "parent",
+    "suiteType",
+    "title",
+    "file",
+    "tags",
+    *(_ for _ in patched_fields if _ != "modified"),
+)
+
+
+class TreeOfTestRun:
+    """
+    patches the suites of a test run in memory, same as PatchTestSuite would have patched them one after
+    the other, but here we have all the entities of the test run at hand, so it is free of any queries.
+    """
+
+    def __init__(self, tree: RunTree):
+        self.tree = tree
+        self.entities: Dict[str, Dict] = {}
+        self.children: Dict[str, List[Dict]] = defaultdict(list)
+        self.similar: Dict[tuple, List[Dict]] = defaultdict(list)
+
+        for row in tree["entities"]:
+            row["suiteID"] = str(row["suiteID"])
+            self.entities[row["suiteID"]] = row
+            self.children[row["parent"]].append(row)
+            if row["suiteType"] == SuiteType.SUITE:
+                self.similar[self.similar_key(row)].append(row)
+
+        self.rollups = dict(tree["rollups"])
+        # retry records are looked up by their last suite, refer: patch_retried_records
+        self.modified = count()
+        self.retries: List[Dict] = []
+        self.retry_of: Dict[str, Dict] = {}
+        for record in tree["retries"]:
+            self.note_retry(dict(record))
+        self.changed: Dict[str, Dict] = {}
+        self.patched = PatchedTree(
+            suites=[],
+            rollups={},
+            retries=[],
+            retried_later=[],
+            processed=[],
+            left=[],
+            cancelled=[],
+        )
+
+    @staticmethod
+    def similar_key(row: Dict, retried: Optional[int] = None):
+        return (
+            row["file"],
+            row["title"],
+            dumps(row["tags"], sort_keys=True),
+            row["suiteType"],
+            row["retried"] if retried is None else retried,
+        )
+
+    def note_retry(self, record: Dict):
+        # records are picked by their modified timestamp, so the ones noted later are picked last
+        record["order"] = next(self.modified)
+        self.retries.append(record)
+        self.retry_of.setdefault(record["suite_id"], record)
+
+    def is_blocked(self, suite_id: str) -> bool:
+        # its child suites must be patched first, refer: handlePending.patch_jobs
+        return any(
+            child["suiteType"] == SuiteType.SUITE
+            and child["standing"] in (Status.YET_TO_CALCULATE, Status.PROCESSING)
+            for child in self.children[suite_id]
+        )
+
+    def rolled_up_parent(self, suite: Dict) -> Optional[Dict]:
+        # patched ones have their counts from patch_suite, so only the pending ones are considered
+        parent = self.entities.get(suite["parent"])
+        if (
+            parent
+            and parent["suiteID"] in self.tree["rollups"]
+            and parent["standing"]
+            in (Status.PENDING, Status.PROCESSING, Status.YET_TO_CALCULATE)
+        ):
+            return parent
+
+    def roll_up_to_parent(self, suite: Dict):
+        # refer: PatchTestSuite.roll_up_to_parent
+        parent = suite["suiteID"] in self.tree["rollups"] and self.rolled_up_parent(
+            suite
+        )
+        if not parent:
+            return
+        parent[suite["standing"].lower()] += 1
+        parent["tests"] += 1
+        parent["setup_duration"] += suite["setup_duration"]
+        parent["teardown_duration"] += suite["teardown_duration"]
+        self.changed[parent["suiteID"]] = parent
+
+    def cancel(self, reason: str, generated_by: str, **feed):
+        self.patched["cancelled"].append(
+            dict(reason=reason, generated_by=generated_by, feed=feed)
+        )
+
+    def result(self) -> PatchedTree:
+        processed = set(self.patched["processed"])
+        self.patched["left"] = [_ for _ in self.tree["tasks"] if _ not in processed]
+        self.patched["suites"] = list(self.changed.values())
+        self.patched["retries"] = [
+            record for record in self.retries if record.get("changed")
+        ]
+        return self.patched
+
+    def patch(self) -> PatchedTree:
+        pending = []
+        for suite_id in self.tree["tasks"]:
+            row = self.entities.get(suite_id)
+            if not row:
+                # not a part of this test run, PatchTestSuite would take care of it
+                continue
+            if row["standing"] != Status.YET_TO_CALCULATE:
+                logger.warning(
+                    "Suite: {} was not scheduled to be calculated, its status is {}",
+                    suite_id,
+                    row["standing"],
+                )
+                self.patched["processed"].append(suite_id)
+                continue
+            pending.append(suite_id)
+
+        while pending:
+            required = [_ for _ in pending if not self.is_blocked(_)]
+            if not required:
+                # their child suites are either picked by another patch or not registered yet,
+                # so they are left for the later pass, refer: handlePending.patch_jobs
+                logger.warning(
+                    "{} suites of the test run: {} are left for the later pass",
+                    len(pending),
+                    self.tree["test_id"],
+                )
+                break
+
+            # previous retries are patched first
+            retried = min(self.entities[_]["retried"] for _ in required)
+            cancelled = False
+            for suite_id in required:
+                if self.entities[suite_id]["retried"] != retried:
+                    continue
+                try:
+                    reason = self.patch_suite(self.entities[suite_id])
+                except Exception:
+                    reason = f"Failed to patch the test suite, found an error in calculation: {format_exc()}"
+                if reason:
+                    self.cancel(
+                        reason,
+                        JobType.MODIFY_SUITE,
+                        suiteID=suite_id,
+                        job=JobType.MODIFY_SUITE,
+                    )
+                    cancelled = True
+                    continue
+                pending.remove(suite_id)
+                self.patched["processed"].append(suite_id)
+
+            # rest of the suites in this round are patched, the same as the
+            # tasks running in parallel before the test run is pruned
+            if cancelled:
+                break
+
+        return self.result()
+
+    def patch_suite(self, suite: Dict) -> Optional[str]:
+        suite_id = suite["suiteID"]
+        children = self.children[suite_id]
+
+        if any(
+            child["standing"] in (Status.PENDING, Status.PROCESSING)
+            for child in children
+        ):
+            return (
+                f"There are some child suites/tests for suite: {suite_id}; Which are not yet updated,"
+                " which is not ideal case, as we are trying to patch suite before updating its child entities"
+            )
+
+        if not suite["started"] or not suite["ended"]:
+            if not suite["started"]:
+                suite["started"] = min(
+                    (_["started"] for _ in children if _["started"]), default=None
+                )
+            if not suite["ended"]:
+                suite["ended"] = max(
+                    (_["ended"] for _ in children if _["ended"]), default=None
+                )
+            suite["duration"] = (
+                suite["ended"] - suite["started"]
+            ).total_seconds() * 1000
+
+        # before we count the retried child suites
+        self.tree["file_retries"] > 0 and self.patch_retried_records(suite)
+
+        tests = [
+            child
+            for child in children
+            if child["suiteType"] not in (SuiteType.SETUP, SuiteType.TEARDOWN)
+        ]
+        counted = Counter(child["standing"].lower() for child in tests)
+        suite.update({key: counted.get(key, 0) for key in counted_status})
+        if counted.get("retried"):
+            suite["retried"] = counted["retried"]
+        suite["tests"] = len(tests)
+        suite["standing"] = fetch_key_from_status(
+            *(suite[key] for key in counted_status)
+        )
+
+        suite["errors"] = [
+            error | dict(mailedFrom=error.get("mailedFrom", []) + [child["suiteID"]])
+            for child in children
+            if child["errors"]
+            for error in child["errors"]
+        ]
+
+        rollup = dict.fromkeys(rolled_up, 0)
+        for child in children:
+            # we are only considering tests for these values, and the rollup of the child suites
+            match child["suiteType"]:
+                case SuiteType.TEST:
+                    values = child
+                case SuiteType.SUITE:
+                    values = self.rollups.get(child["suiteID"], {})
+                case _:
+                    continue
+            if values:
+                for key in rolled_up:
+                    rollup[key] += values[key]
+        self.rollups[suite_id] = self.patched["rollups"][suite_id] = rollup
+
+        if children:
+            suite["setup_duration"] = sum(_["setup_duration"] for _ in children)
+            suite["teardown_duration"] = sum(_["teardown_duration"] for _ in children)
+
+        self.changed[suite_id] = suite
+        self.roll_up_to_parent(suite)
+
+    def patch_retried_records(self, suite: Dict):
+        suite_id = suite["suiteID"]
+        if suite["retried"] == 0:
+            self.note_retry(
+                dict(
+                    id=None, tests=[suite_id], suite_id=suite_id, length=1, changed=True
+                )
+            )
+            return
+
+        candidates = [
+            self.retry_of[previous["suiteID"]]
+            for previous in self.similar[self.similar_key(suite, suite["retried"] - 1)]
+            if previous["suiteID"] != suite_id
+            and previous["suiteID"] in self.retry_of
+            and previous["ended"]
+            and suite["started"]
+            and previous["ended"] <= suite["started"]
+        ]
+        previous = min(
+            (record for record in candidates if record["length"] == suite["retried"]),
+            key=itemgetter("order"),
+            default=None,
+        )
+        if not previous:
+            raise LookupError(f"Could not find the previous retry of suite: {suite_id}")
+
+        previous_suite = self.entities[previous["suite_id"]]
+        parent = self.rolled_up_parent(previous_suite)
+        if parent:
+            # parent would count it as retried, refer: patch_suite
+            parent[previous_suite["standing"].lower()] -= 1
+            parent["retried"] += 1
+            self.changed[parent["suiteID"]] = parent
+        previous_suite.update(standing=Status.RETRIED, retried_later=True)
+        self.changed[previous_suite["suiteID"]] = previous_suite
+
+        # records are picked by their modified timestamp, so it is picked last now
+        self.retry_of.pop(previous["suite_id"])
+        previous.update(
+            length=previous["length"] + 1,
+            tests=previous["tests"] + [suite_id],
+            suite_id=suite_id,
+            changed=True,
+            order=next(self.modified),
+        )
+        self.retry_of.setdefault(suite_id, previous)
+
+        current_loop = [previous_suite["suiteID"]]
+        while current_loop:
+            current_loop = [
+                child["suiteID"]
+                for parent in current_loop
+                for child in self.children[parent]
+                if child["suiteType"] != SuiteType.SUITE
+            ]
+            self.patched["retried_later"].extend(current_loop)
+
+
+def patch_tree(tree: RunTree) -> PatchedTree:
+    return TreeOfTestRun(tree).patch()
+
+
+async def fetch_tree(
+    test_id: str, budget: Optional[Budget] = None
+) -> Optional[RunTree]:
+    """
+    picks the pending tasks of the test run before reading it, so no other patch picks them.
+    returns None if there were none, or if there were more than the budget allows.
+    """
+    tasks = await claim_tasks_of_run(
+        test_id, JobType.MODIFY_SUITE, budget.remaining if budget else None
+    )
+    if not tasks:
+        return None
+    budget and budget.spend(len(tasks))
+
+    entities, rollups, retries, test_config = await gather(
+        SuiteBase.filter(session__test_id=test_id).values(*read_fields),
+        RollupBase.filter(suite__session__test_id=test_id).values(
+            "suite_id", *rolled_up
+        ),
+        RetriedBase.filter(suite__session__test_id=test_id)
+        .order_by("modified")
+        .values("id", "suite_id", "tests", "length"),
+        TestConfigBase.filter(test_id=test_id).first(),
+    )
+
+    summed: Dict[str, Dict[str, int]] = {}
+    for rollup in rollups:
+        suite_id = str(rollup.pop("suite_id"))
+        previous = summed.setdefault(suite_id, dict.fromkeys(rolled_up, 0))
+        for key in rolled_up:
+            previous[key] += rollup[key]
+
+    for record in retries:
+        record["suite_id"] = str(record["suite_id"])
+
+    return RunTree(
+        test_id=test_id,
+        entities=entities,
+        tasks=tasks,
+        rollups=summed,
+        retries=retries,
+        file_retries=test_config.fileRetries if test_config else 0,
+    )
+
+
+async def save_tree(test_id: str, patched: PatchedTree):
+    async with in_transaction("default") as connection:
+        suites = []
+        for row in patched["suites"]:
+            suite = SuiteBase(
+                suiteID=row["suiteID"],
+                **{key: row[key] for key in patched_fields if key != "modified"},
+            )
+            suite._saved_in_db = True
+            suites.append(suite)
+        suites and await SuiteBase.bulk_update(
+            suites, patched_fields, 100, using_db=connection
+        )
+
+        # rollups were summed up if there were many, refer: fetch_tree
+        # so the first one is updated with the sum and the rest are removed
+        existing, duplicates = {}, []
+        for suite_id, rollup_id in (
+            await RollupBase.filter(suite_id__in=list(patched["rollups"]))
+            .using_db(connection)
+            .order_by("id")
+            .values_list("suite_id", "id")
+        ):
+            if str(suite_id) in existing:
+                duplicates.append(rollup_id)
+            else:
+                existing[str(suite_id)] = rollup_id
+        for chunk in range(0, len(duplicates), 500):
+            await RollupBase.filter(id__in=duplicates[chunk : chunk + 500]).using_db(
+                connection
+            ).delete()
+
+        to_create, to_update = [], []
+        for suite_id, values in patched["rollups"].items():
+            if rollup_id := existing.get(suite_id):
+                rollup = RollupBase(id=rollup_id, suite_id=suite_id, **values)
+                rollup._saved_in_db = True
+                to_update.append(rollup)
+            else:
+                to_create.append(RollupBase(suite_id=suite_id, **values))
+        to_update and await RollupBase.bulk_update(
+            to_update, rolled_up, 100, using_db=connection
+        )
+        to_create and await RollupBase.bulk_create(to_create, 100, using_db=connection)
+
+        for record in patched["retries"]:
+            values = dict(
+                tests=record["tests"],
+                suite_id=record["suite_id"],
+                length=record["length"],
+            )
+            if record["id"] is None:
+                await RetriedBase.create(**values, using_db=connection)
+            else:
+                await RetriedBase.filter(id=record["id"]).using_db(connection).update(
+                    **values
+                )
+
+        for chunk in range(0, len(patched["retried_later"]), 500):
+            await SuiteBase.filter(
+                suiteID__in=patched["retried_later"][chunk : chunk + 500]
+            ).using_db(connection).update(retried_later=True)
+
+        for chunk in range(0, len(patched["processed"]), 500):
+            await TaskBase.filter(
+                ticketID__in=patched["processed"][chunk : chunk + 500]
+            ).using_db(connection).update(picked=True, processed=True)
+
+        await release_tasks(test_id, JobType.MODIFY_SUITE, patched["left"], connection)
+
+    for cancelled in patched["cancelled"]:
+        await cancel_patch_for_test_run(
+            test_id, cancelled["reason"], cancelled["generated_by"], **cancelled["feed"]
+        )
+
+
+async def compute_suites(
+    test_id: str, pool: Optional[Executor] = None, budget: Optional[Budget] = None
+) -> Optional[PatchedTree]:
+    """
+    returns None if none of its tasks were picked, or if it failed to patch them
+    """
+    tree = None
+    try:
+        tree = await fetch_tree(test_id, budget)
+        if tree is None:
+            return None
+        if pool is None:
+            return patch_tree(tree)
+        return await get_running_loop().run_in_executor(pool, patch_tree, tree)
+    except Exception:
+        logger.exception("Failed to patch the suites of the test run: {}", test_id)
+        tree and await release_tasks(test_id, JobType.MODIFY_SUITE, tree["tasks"])
+
+
+async def save_suites(test_id: str, patched: PatchedTree) -> bool:
+    try:
+        await save_tree(test_id, patched)
+    except Exception:
+        logger.exception("Failed to save the suites of the test run: {}", test_id)
+        await release_tasks(
+            test_id, JobType.MODIFY_SUITE, patched["processed"] + patched["left"]
+        )
+        return False
+
+    logger.info(
+        "Patched {} suites of the test run: {}", len(patched["processed"]), test_id
+    )
+    return not patched["cancelled"]
+
+
+async def patchSuitesOfTestRun(test_id: str) -> bool:
+    """
+    patches all the suites of the test run at once, returns true if none of them were cancelled
+    """
+    test_id = str(test_id)
+    patched = await compute_suites(test_id)
+    return patched is not None and await save_suites(test_id, patched)
+
+
+async def patchSuitesOfTestRuns(
+    test_ids: List[str], jobs: int = 1, budget: Optional[Budget] = None
+):
+    """
+    test runs are independent of each other, so their suites are computed in a pool of processes,
+    but they are saved one after the other from here, as sqlite allows only a single writer.
+    test runs are not picked once the budget is exhausted or if they have more tasks than what is left of it,
+    their suites are patched by the later pass or by the next patch.
+    """
+    budget = budget or Budget()
+    test_ids = [str(test_id) for test_id in test_ids]
+    if jobs <= 1 or len(test_ids) <= 1:
+        for test_id in test_ids:
+            if budget.exhausted:
+                break
+            patched = await compute_suites(test_id, budget=budget)
+            patched is not None and await save_suites(test_id, patched)
+        return
+
+    # only a few trees are read ahead of the pool
+    read_ahead = Semaphore(jobs * 2)
+
+    with ProcessPoolExecutor(jobs, mp_context=get_context("spawn")) as pool:
+
+        async def compute(test_id: str):
+            async with read_ahead:
+                if budget.exhausted:
+                    return test_id, None
+                return test_id, await compute_suites(test_id, pool, budget)
+
+        for computed in as_completed([compute(test_id) for test_id in test_ids]):
+            test_id, patched = await computed
+            patched is not None and await save_suites(test_id, patched)
@@ -32,3 +32,29 @@ class SubSetOfRunBaseRequiredForProjectExport(BaseModel):
     suites: int
     duration: float
     projectName: str
+
+
+class RunTree(TypedDict):
+    test_id: str
+    # rows of the suites, tests and hooks of the test run
+    entities: List[Dict]
+    # suites to patch, in the order they were registered
+    tasks: List[str]
+    # rollup of the suites, summed up if there were many
+    rollups: Dict[str, Dict[str, int]]
+    # retried records of the suites (oldest first)
+    retries: List[Dict]
+    file_retries: int
+
+
+class PatchedTree(TypedDict):
+    suites: List[Dict]
+    rollups: Dict[str, Dict[str, int]]
+    # created (without id) and updated retried records
+    retries: List[Dict]
+    retried_later: List[str]
+    processed: List[str]
+    # tasks which were picked but not patched, they are picked again later
+    left: List[str]
+    # reasons (with generatedBy and feed) for cancelling the patch of the test run
+    cancelled: List[Dict]
@@ -7,7 +7,9 @@ from handshake.services.DBService.lifecycle import (
 )
 from shutil import rmtree
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Set
+from json import dumps, loads
+from handshake import __version__
 from loguru import logger
 from tortoise.expressions import Q, Subquery
 from ansitohtml.parser import Parser
@@ -23,6 +25,11 @@ from handshake.services.SchedularService.constants import (
 from handshake.services.SchedularService.register import register_bulk_excel_export
 from handshake.services.DBService.models.dynamic_base import TaskBase, JobType
 from handshake.services.SchedularService.flag_tasks import pruneTasks
+from handshake.services.SchedularService.task_queue import (
+    Budget,
+    reclaim_tasks,
+    RESET_PRIORITY,
+)
 from handshake.services.SchedularService.handlePending import patch_jobs
 from handshake.Exporters.json_exporter import JsonExporter
 from handshake.Exporters.excel_exporter import excel_export
@@ -41,6 +48,9 @@ class Scheduler:
         dev: Optional[bool] = False,
         export_mode: str = "json",
         include_excel_export: Optional[bool] = False,
+        jobs: int = 1,
+        max_tasks: Optional[int] = None,
+        time_budget: Optional[float] = None,
     ):
         self.db_path = db_path(root_dir)
         if not export_mode and export_mode != "json" and export_mode != "html":
@@ -78,6 +88,10 @@ class Scheduler:
         # self.export_dir = Path(out_dir) if out_dir and zipped_build else None
         self.db_path = db_path(root_dir)
         self.reset = manual_reset
+        self.jobs = jobs
+        self.max_tasks = max_tasks
+        self.time_budget = time_budget
+        self.rotated: List[str] = []
         self.connection: Optional[BaseDBAsyncClient] = None
 
     async def rotate_test_run(self, projectName: str, to_delete: int):
@@ -97,6 +111,7 @@ class Scheduler:
             .limit(will_be_deleted)
             .values_list("testID", flat=True)
         )
+        self.rotated.extend(str(test_id) for test_id in to_delete_runs)
         await gather(
             RunBase.filter(Q(testID__in=to_delete_runs)).delete(),
             *(
@@ -147,7 +162,8 @@ class Scheduler:
     async def init_jobs(self):
         await pruneTasks()
 
-        prev_picked_tasks = await TaskBase.filter(processed=False, picked=True).all()
+        # tasks left unfinished by the previous patch, if it was killed mid-way
+        prev_picked_tasks = await reclaim_tasks()
         reset_from_config = await ConfigBase.filter(
             key=ConfigKeys.reset_test_run
         ).first()
@@ -179,9 +195,26 @@ class Scheduler:
                 )
                 task.picked = False
                 task.processed = False
+                task.leased_till = None
+                task.leased_by = None
+
+            for task in to_modify_test_runs:
+                task.priority = RESET_PRIORITY
+                task.attempts = 0
 
             if to_pick:
-                await TaskBase.bulk_update(to_pick, ("picked", "processed"), 100)
+                await TaskBase.bulk_update(
+                    to_pick,
+                    (
+                        "picked",
+                        "processed",
+                        "leased_till",
+                        "leased_by",
+                        "attempts",
+                        "priority",
+                    ),
+                    100,
+                )
                 logger.debug("Done!, Marked {} old tasks for processing", len(to_pick))
 
         async def reset_completed_runs():
@@ -225,13 +258,92 @@ class Scheduler:
         await gather(pick_old_tasks(), reset_completed_runs(), add_export_jobs())
         logger.debug("Pre-Patch Jobs have been initiated")
 
+    @property
+    def export_target(self) -> str:
+        if self.skip_export:
+            return ""
+        return f"{type(self.exporter).__name__}:{self.exporter.save_in}:{self.exporter.dev_run}:{self.excel_export}"
+
+    async def watermark(self) -> str:
+        """
+        results of the test runs are patched through their tasks,
+        so the tasks and the test runs make up the watermark, along with where they are exported.
+        """
+        _, rows = await self.connection.execute_query(
+            "select (select count(*) || ':' || total(processed) || ':' || ifnull(max(dropped), '') from taskbase)"
+            " || '|' || (select count(*) || ':' || ifnull(max(ended), '') from runbase)"
+            " || '|' || ifnull((select value from configbase where key = ?), '') as data",
+            (ConfigKeys.maxRunsPerProject,),
+        )
+        return dumps(
+            dict(data=rows[0]["data"], export=self.export_target, version=__version__)
+        )
+
+    async def is_unchanged(self, previous: Optional[ConfigBase]) -> bool:
+        if not previous or previous.value != await self.watermark() or self.reset:
+            return False
+
+        reset_from_config = await ConfigBase.filter(
+            key=ConfigKeys.reset_test_run
+        ).first()
+        if reset_from_config and reset_from_config.value:
+            return False
+
+        # tasks registered while the previous patch was running
+        to_process = [
+            JobType.MODIFY_SUITE,
+            JobType.MODIFY_TEST_RUN,
+            JobType.PRUNE_TASKS,
+        ]
+        if self.excel_export and excel_export:
+            to_process.append(JobType.EXPORT_EXCEL)
+        return not await TaskBase.filter(processed=False, type__in=to_process).exists()
+
+    async def changed_runs(self, previous: Optional[ConfigBase]) -> Optional[Set[str]]:
+        """
+        returns the test runs to export again, None if all of them are to be exported.
+        """
+        if not previous:
+            return None
+        noted = loads(previous.value)
+        if noted["export"] != self.export_target or noted["version"] != __version__:
+            return None
+
+        return {
+            str(test_id)
+            for test_id in await TaskBase.filter(processed=False)
+            .distinct()
+            .values_list("test_id", flat=True)
+        } | set(self.rotated)
+
     async def start(self, config_path: Optional[str] = None):
-        await init_tortoise_orm(self.db_path, True, config_path=config_path)
+        await init_tortoise_orm(
+            self.db_path, True, config_path=config_path, profile="fast-ingest"
+        )
         self.connection = connections.get("default")
+
+        previous = await ConfigBase.filter(key=ConfigKeys.patchWatermark).first()
+        if await self.is_unchanged(previous):
+            logger.info("Nothing was changed since the previous patch, skipping it")
+            await close_connection()
+            return
+
+        # noted again once it is done, if not, next patch would export all the runs
+        previous and await previous.delete()
+
         await self.rotate_test_runs()
         await self.init_jobs()
-        await patch_jobs(self.excel_export, self.db_path)
+        self.exporter.changed_runs = await self.changed_runs(previous)
+        await patch_jobs(
+            self.excel_export,
+            self.db_path,
+            self.jobs,
+            Budget(self.max_tasks, self.time_budget),
+        )
         if not self.skip_export:
             await self.exporter.start_exporting()
 
+        await ConfigBase.create(
+            key=ConfigKeys.patchWatermark, value=await self.watermark()
+        )
         await close_connection()
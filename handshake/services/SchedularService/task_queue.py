@@ -0,0 +1,184 @@
+from handshake.services.DBService.models.dynamic_base import TaskBase
+from handshake.services.SchedularService.constants import JobType
+from handshake.services.SchedularService.register import cancel_patch_for_test_run
+from tortoise.queryset import QuerySet
+from tortoise import timezone, connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from datetime import datetime, timedelta
+from socket import gethostname
+from os import getpid, kill
+from sys import platform
+from time import monotonic
+from typing import List, Optional
+from loguru import logger
+
+# a picked task is leased till then, if it is not processed by then, it is picked again
+LEASE = timedelta(minutes=2)
+# task is given up if its lease expired these many times, as it might be the reason for it
+MAX_ATTEMPTS = 3
+# tasks of the test runs which were reset are picked after the pending ones
+RESET_PRIORITY = -1
+
+CLAIM_TASKS_OF_RUN = """
+UPDATE taskbase SET picked = 1, leased_till = ?, leased_by = ?
+WHERE test_id = ? AND type = ? AND picked = 0 AND processed = 0
+AND (
+    ? IS NULL OR (
+        SELECT count(*) FROM taskbase
+        WHERE test_id = ? AND type = ? AND picked = 0 AND processed = 0
+    ) <= ?
+)
+RETURNING ticketID, dropped
+"""
+
+
+def lease_owner() -> str:
+    return f"{gethostname()}:{getpid()}"
+
+
+def is_owner_alive(owner: Optional[str]) -> Optional[bool]:
+    """
+    returns true if the patch which leased the task is still running,
+    None if we cannot say, i.e. it was leased from another host or on windows,
+    in which case its lease decides.
+    """
+    host, _, pid = (owner or "").rpartition(":")
+    if host != gethostname() or not pid.isdigit() or platform == "win32":
+        return None
+    if int(pid) == getpid():
+        return True
+    try:
+        kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def pending_tasks(job_type: JobType) -> QuerySet[TaskBase]:
+    # newest first, refer: TaskBase.Meta.indexes
+    return TaskBase.filter(processed=False, picked=False, type=job_type).order_by(
+        "-priority", "-dropped"
+    )
+
+
+async def claim_task(task: TaskBase) -> bool:
+    """
+    picks the task only if it was not picked by someone else, returns true if it was picked.
+    """
+    leased_till = timezone.now() + LEASE
+    claimed = await TaskBase.filter(
+        ticketID=task.ticketID, picked=False, processed=False
+    ).update(picked=True, leased_till=leased_till, leased_by=lease_owner())
+
+    if claimed:
+        task.picked = True
+        task.leased_till = leased_till
+    return bool(claimed)
+
+
+async def claim_tasks_of_run(
+    test_id: str, job_type: JobType, at_most: Optional[int] = None
+) -> List[str]:
+    """
+    picks all the pending tasks of the test run at once, oldest first.
+    none of them are picked if there are more than at_most tasks.
+    """
+    _, rows = await connections.get("default").execute_query(
+        CLAIM_TASKS_OF_RUN,
+        [
+            str(timezone.now() + LEASE),
+            lease_owner(),
+            test_id,
+            job_type,
+            at_most,
+            test_id,
+            job_type,
+            at_most,
+        ],
+    )
+    return [row["ticketID"] for row in sorted(rows, key=lambda row: row["dropped"])]
+
+
+async def release_tasks(
+    test_id: str,
+    job_type: JobType,
+    tasks: List[str],
+    connection: Optional[BaseDBAsyncClient] = None,
+):
+    # tasks left by this patch are picked again, by the next one or by its later pass
+    for chunk in range(0, len(tasks), 500):
+        await TaskBase.filter(
+            ticketID__in=tasks[chunk : chunk + 500],
+            test_id=test_id,
+            type=job_type,
+            processed=False,
+            leased_by=lease_owner(),
+        ).using_db(connection).update(picked=False, leased_till=None, leased_by=None)
+
+
+def is_reclaimable(task: TaskBase, now: datetime) -> bool:
+    alive = is_owner_alive(task.leased_by)
+    if alive is not None:
+        return not alive
+    return task.leased_till is None or task.leased_till < now
+
+
+async def reclaim_tasks() -> List[TaskBase]:
+    """
+    returns the tasks which were picked but not processed, as the patch which picked them
+    was killed mid-way, or its lease expired. they are given up after MAX_ATTEMPTS.
+    caller is expected to mark them as not picked.
+    """
+    now = timezone.now()
+    expired = [
+        task
+        for task in await TaskBase.filter(processed=False, picked=True)
+        if is_reclaimable(task, now)
+    ]
+
+    to_pick = []
+    for task in expired:
+        task.attempts += 1
+        if task.attempts < MAX_ATTEMPTS:
+            to_pick.append(task)
+            continue
+
+        await cancel_patch_for_test_run(
+            task.test_id,
+            f"Gave up on the task: {task.ticketID}, as it was left unfinished {task.attempts} times",
+            "task-queue",
+            task=task.ticketID,
+            job=task.type,
+        )
+
+    logger.debug("Reclaimed {} of {} unfinished tasks", len(to_pick), len(expired))
+    return to_pick
+
+
+class Budget:
+    """
+    bounds the work done by a single patch, refer: handshake patch --max-tasks --time-budget.
+    tasks left are picked in the next patch.
+    """
+
+    def __init__(
+        self, max_tasks: Optional[int] = None, time_budget: Optional[float] = None
+    ):
+        self.max_tasks = max_tasks
+        self.deadline = None if time_budget is None else monotonic() + time_budget
+        self.spent = 0
+
+    def spend(self, tasks: int = 1):
+        self.spent += tasks
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.max_tasks is None else max(self.max_tasks - self.spent, 0)
+
+    @property
+    def exhausted(self) -> bool:
+        return (self.max_tasks is not None and self.spent >= self.max_tasks) or (
+            self.deadline is not None and monotonic() >= self.deadline
+        )